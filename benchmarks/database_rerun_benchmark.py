@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de Reruns de la Web App contra SQLite
+=====================================================
+Mide la latencia de las consultas que web_app.py hace en cada rerun de Streamlit
+(get_statistics y load_entities) con las dos formas de conexión de
+database_connection.py:
+
+- per_call: cada método abre y cierra su conexión, sin PRAGMAs (comportamiento
+  anterior; persistent_connections=False)
+- pooled: conexiones persistentes del pool con WAL, caché de páginas, mmap y
+  caché de sentencias preparadas (por defecto)
+
+La base de datos se construye en --work-dir a partir de los
+*_entity_mapping_complete.csv de results/final/. Cada rerun consulta todos los
+tipos de entidad; el reporte guarda la primera, la mediana, el p95 y la media
+de cada escenario.
+
+Uso:
+    python benchmarks/database_rerun_benchmark.py                  # 50 reruns por escenario
+    python benchmarks/database_rerun_benchmark.py --reruns 200     # Más repeticiones
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).parent
+REPO_DIR = BENCHMARK_DIR.parent
+
+sys.path.insert(0, str(REPO_DIR))
+
+from database_manager import EntityDatabase
+
+ENTITY_TYPES = ['financial', 'non_financial']
+MODES = {'per_call': False, 'pooled': True}
+
+
+def build_database(db_path, final_dir):
+    """Crea la base de datos del benchmark a partir de los mapeos completos."""
+    if db_path.exists():
+        db_path.unlink()
+    db = EntityDatabase(db_path)
+    for entity_type in ENTITY_TYPES:
+        db.import_from_csv(final_dir / f"{entity_type}_entity_mapping_complete.csv", entity_type,
+                           clear_existing=True)
+    db.close()
+
+
+def time_reruns(db, reruns, load):
+    """Tiempos en ms de `reruns` reruns (estadísticas y, si load, carga de entidades)."""
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        for entity_type in ENTITY_TYPES:
+            db.get_statistics(entity_type)
+            if load:
+                db.load_entities(entity_type)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings):
+    """Primera, mediana, p95 y media de una lista de tiempos en ms."""
+    ordered = sorted(timings)
+    return {
+        'first_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        'mean_ms': round(statistics.fmean(timings), 3)
+    }
+
+
+def run_benchmark(work_dir, final_dir, reruns=50):
+    """
+    Ejecuta los escenarios del benchmark.
+
+    Args:
+        work_dir: Directorio donde se crea la base de datos del benchmark
+        final_dir: Directorio con los *_entity_mapping_complete.csv
+        reruns: Reruns por escenario
+
+    Returns:
+        dict: Reporte del benchmark
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    db_path = work_dir / "entities_benchmark.db"
+    build_database(db_path, final_dir)
+
+    scenarios = {}
+    for scenario, load in (('statistics', False), ('statistics_and_load', True)):
+        scenarios[scenario] = {}
+        for mode, persistent in MODES.items():
+            # Cada escenario empieza con un pool vacío: el primer rerun incluye abrir la conexión
+            db = EntityDatabase(db_path, persistent_connections=persistent)
+            db.close()
+            scenarios[scenario][mode] = summarize(time_reruns(db, reruns, load))
+            db.close()
+        before = scenarios[scenario]['per_call']['median_ms']
+        after = scenarios[scenario]['pooled']['median_ms']
+        scenarios[scenario]['median_speedup'] = round(before / after, 2) if after > 0 else None
+
+    return {
+        'benchmark': 'database_rerun',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'reruns': reruns,
+        'entity_types': ENTITY_TYPES,
+        'rows': {entity_type: EntityDatabase(db_path).get_statistics(entity_type)['total_names']
+                 for entity_type in ENTITY_TYPES},
+        'scenarios': scenarios
+    }
+
+
+def print_summary(report):
+    """Imprime la latencia por escenario y modo de conexión."""
+    print("\n" + "=" * 80)
+    print("LATENCIA POR RERUN")
+    print("=" * 80)
+    print(f"   {'Escenario':<22} {'Modo':<10} {'Primera':>10} {'Mediana':>10} {'p95':>10} {'Media':>10}")
+    for scenario, results in report['scenarios'].items():
+        for mode in MODES:
+            metrics = results[mode]
+            print(f"   {scenario:<22} {mode:<10} {metrics['first_ms']:>8.2f}ms {metrics['median_ms']:>8.2f}ms "
+                  f"{metrics['p95_ms']:>8.2f}ms {metrics['mean_ms']:>8.2f}ms")
+        print(f"   {'':<22} {'speedup':<10} {results['median_speedup']}x (mediana)")
+
+
+def main():
+    """Función principal."""
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmark de latencia de reruns de la web app contra SQLite",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  python benchmarks/database_rerun_benchmark.py                  # 50 reruns por escenario
+  python benchmarks/database_rerun_benchmark.py --reruns 200     # Más repeticiones
+        """
+    )
+
+    parser.add_argument(
+        '--reruns',
+        type=int,
+        default=50,
+        help='Reruns por escenario y modo de conexión (por defecto 50)'
+    )
+
+    parser.add_argument(
+        '--final-dir',
+        type=Path,
+        default=REPO_DIR / "results" / "final",
+        help='Directorio con los *_entity_mapping_complete.csv (por defecto results/final)'
+    )
+
+    parser.add_argument(
+        '--work-dir',
+        type=Path,
+        default=REPO_DIR / "results" / "benchmark" / "database",
+        help='Directorio para la base de datos del benchmark'
+    )
+
+    parser.add_argument(
+        '--output',
+        type=Path,
+        default=REPO_DIR / "results" / "benchmark" / "database_rerun.json",
+        help='Archivo JSON del reporte (por defecto results/benchmark/database_rerun.json)'
+    )
+
+    parser.add_argument(
+        '--keep-data',
+        action='store_true',
+        help='Conservar la base de datos del benchmark'
+    )
+
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("MICRO-BENCHMARK DE RERUNS CONTRA SQLITE")
+    print("=" * 80)
+    print(f"Reruns por escenario: {args.reruns}")
+
+    report = run_benchmark(args.work_dir, args.final_dir, reruns=args.reruns)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print_summary(report)
+    print(f"\n✓ Reporte guardado en: {args.output}")
+    print("=" * 80)
+
+    if not args.keep_data:
+        shutil.rmtree(args.work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Harness de Calidad y Rendimiento
+================================
+Compara variantes de blocking y matching contra los clusters curados de
+results/manual_review/*_standardized.csv (entity_id de cada original_name).
+
+Para cada variante (scorer, threshold, blocking, workers) y tipo de entidad:
+1. Normaliza los nombres curados con los pasos de normalization.py
+2. Crea bloques con la estrategia de la variante
+3. Busca matches con matching.find_matches_in_block (en `workers` procesos)
+4. Forma los componentes como run_matching (grafo, validación y fusión)
+5. Compara los componentes con los clusters curados: precisión, recall y F1
+   por pares y B-cubed, junto al tiempo y las comparaciones realizadas
+
+Todas las variantes quedan en una sola tabla (quality_comparison.csv) para
+aceptar o rechazar optimizaciones de velocidad con datos.
+
+Uso:
+    python benchmarks/quality_harness.py                     # Solo la configuración del pipeline
+    python benchmarks/quality_harness.py --entity-types financial non_financial
+    python benchmarks/quality_harness.py --variant base --variant t90 threshold=90
+    python benchmarks/quality_harness.py --variant fast scorer=token_sort_ratio blocking=first_two_words workers=4
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from rapidfuzz import fuzz
+
+BENCHMARK_DIR = Path(__file__).parent
+REPO_DIR = BENCHMARK_DIR.parent
+
+sys.path.insert(0, str(REPO_DIR / "scripts"))
+
+from modules import blocking, matching, normalization
+
+# Scorers de rapidfuzz.fuzz que se pueden usar en una variante
+SCORERS = ['WRatio', 'QRatio', 'ratio', 'partial_ratio', 'token_sort_ratio', 'token_set_ratio']
+
+# Estrategias de blocking: 'first_word' es la del pipeline (con sub-bloqueo de bloques grandes)
+BLOCKING_STRATEGIES = ['first_word', 'first_word_unsplit', 'first_two_words', 'first_word_prefix']
+PREFIX_LENGTH = 4
+
+# Configuración del pipeline (variante por defecto)
+DEFAULT_VARIANT = {
+    'scorer': 'WRatio',
+    'threshold': matching.SIMILARITY_THRESHOLD,
+    'blocking': 'first_word',
+    'workers': 1
+}
+
+
+def parse_variant(tokens):
+    """
+    Convierte ['nombre', 'clave=valor', ...] en una variante.
+
+    Raises:
+        ValueError: Si una clave o un valor no es válido
+    """
+    variant = {'name': tokens[0], **DEFAULT_VARIANT}
+    for token in tokens[1:]:
+        key, sep, value = token.partition('=')
+        if not sep or key not in DEFAULT_VARIANT:
+            raise ValueError(f"Opción inválida '{token}' (claves: {', '.join(DEFAULT_VARIANT)})")
+        if key == 'scorer' and value not in SCORERS:
+            raise ValueError(f"Scorer desconocido '{value}' (disponibles: {', '.join(SCORERS)})")
+        if key == 'blocking' and value not in BLOCKING_STRATEGIES:
+            raise ValueError(f"Blocking desconocido '{value}' (disponibles: {', '.join(BLOCKING_STRATEGIES)})")
+        if key in ('threshold', 'workers'):
+            value = float(value) if key == 'threshold' else int(value)
+        variant[key] = value
+    return variant
+
+
+def load_gold(manual_review_dir):
+    """
+    Carga los clusters curados.
+
+    Returns:
+        dict: entity_type -> DataFrame (original_name, frequency, entity_id)
+    """
+    gold = {}
+    for path in sorted(Path(manual_review_dir).glob("*_standardized.csv")):
+        entity_type = path.name.replace("_entities_standardized.csv", "").replace("_standardized.csv", "")
+        df = pd.read_csv(path, usecols=['entity_id', 'original_name', 'frequency'])
+        df = df.dropna(subset=['original_name']).drop_duplicates('original_name').reset_index(drop=True)
+        gold[entity_type] = df
+    return gold
+
+
+def normalize(gold_df):
+    """Normaliza los nombres curados con los pasos de normalize_names."""
+    names = gold_df['original_name']
+    for step in (normalization.basic_cleaning, normalization.remove_functional_roles,
+                 normalization.normalize_legal_suffixes, normalization.clean_common_elements,
+                 normalization.final_normalization):
+        names = names.apply(step)
+    return pd.DataFrame({
+        'original_name': gold_df['original_name'],
+        'frequency': gold_df['frequency'],
+        'normalized_name': names
+    })
+
+
+def _blocking_key(name, strategy):
+    if strategy == 'first_two_words':
+        return blocking.extract_first_two_words(name) or blocking.extract_first_significant_word(name)
+    key = blocking.extract_first_significant_word(name)
+    if strategy == 'first_word_prefix' and key:
+        return key[:PREFIX_LENGTH]
+    return key
+
+
+def build_blocks(df, strategy):
+    """Crea los bloques de df con una estrategia de BLOCKING_STRATEGIES."""
+    keyed = pd.DataFrame({'blocking_key': df['normalized_name'].apply(lambda n: _blocking_key(n, strategy))})
+    blocks = blocking.create_blocks_dict(keyed, 'blocking_key')
+    if strategy == 'first_word':
+        blocks, _ = blocking.optimize_blocks(df, blocks, 'normalized_name', blocking.LARGE_BLOCK_THRESHOLD)
+    return blocks
+
+
+def _match_blocks(names, block_items, threshold, scorer_name):
+    """Busca matches en una lista de (posición, índices del bloque)."""
+    scorer = getattr(fuzz, scorer_name)
+    return [(position, matching.find_matches_in_block(None, indices, 'normalized_name', threshold,
+                                                      names=names, scorer=scorer))
+            for position, indices in block_items]
+
+
+def match_blocks(df, blocks, threshold, scorer_name, workers=1):
+    """
+    Busca matches en todos los bloques, en `workers` procesos.
+
+    Los bloques se reparten por número de pares (el más cargado primero) y los
+    matches se devuelven en el orden de los bloques, igual que con un proceso.
+    """
+    names = df['normalized_name'].to_dict()
+    items = list(enumerate(blocks.values()))
+    if workers <= 1:
+        results = _match_blocks(names, items, threshold, scorer_name)
+    else:
+        chunks = [[] for _ in range(workers)]
+        loads = [0] * workers
+        for position, indices in sorted(items, key=lambda item: -len(item[1])):
+            target = loads.index(min(loads))
+            chunks[target].append((position, indices))
+            loads[target] += len(indices) * (len(indices) - 1) // 2
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_match_blocks, names, chunk, threshold, scorer_name)
+                       for chunk in chunks if chunk]
+            results = [result for future in futures for result in future.result()]
+        results.sort(key=lambda result: result[0])
+    return [match for _, block_matches in results for match in block_matches]
+
+
+def build_components(df, matches, entity_type):
+    """Componentes como en run_matching: grafo, validación por pares y fusión."""
+    graph = matching.create_match_graph(matches)
+    components = matching.find_connected_components(graph, df)
+    # Los archivos por transacción (p. ej. non_financial_release) usan el umbral de su lado
+    side = 'non_financial' if entity_type.startswith('non_financial') else 'financial'
+    min_sim = matching.MIN_PAIRWISE_SIMILARITY[side]
+    components = matching.validate_and_split_components(
+        components, df, matches, 'normalized_name', min_pairwise_similarity=min_sim
+    )
+    return matching.merge_related_entities_by_first_two_words(
+        components, df, 'normalized_name', similarity_threshold=matching.MERGE_SIMILARITY_THRESHOLD
+    )
+
+
+def component_labels(components, n_rows):
+    """
+    Etiqueta de cluster por fila; las filas que no están en ningún componente
+    quedan como singletons.
+
+    Returns:
+        tuple: (labels, filas sin componente)
+    """
+    labels = [-1] * n_rows
+    for label, component in enumerate(components):
+        for idx in component:
+            labels[idx] = label
+    missing = 0
+    next_label = len(components)
+    for idx in range(n_rows):
+        if labels[idx] == -1:
+            labels[idx] = next_label
+            next_label += 1
+            missing += 1
+    return labels, missing
+
+
+def _pairs(sizes):
+    return int((sizes * (sizes - 1) // 2).sum())
+
+
+def cluster_scores(gold_labels, predicted_labels):
+    """
+    Precisión, recall y F1 por pares y B-cubed entre dos etiquetados.
+
+    Por pares: un par de nombres es positivo si está en el mismo cluster.
+    B-cubed: media por nombre de |pred ∩ gold| / |pred| (precisión) y
+    |pred ∩ gold| / |gold| (recall).
+    """
+    labels = pd.DataFrame({'gold': gold_labels, 'pred': predicted_labels})
+    overlap = labels.groupby(['gold', 'pred']).size()
+    gold_sizes = labels.groupby('gold').size()
+    pred_sizes = labels.groupby('pred').size()
+
+    true_pairs = _pairs(overlap)
+    pred_pairs = _pairs(pred_sizes)
+    gold_pairs = _pairs(gold_sizes)
+    pair_precision = true_pairs / pred_pairs if pred_pairs else 1.0
+    pair_recall = true_pairs / gold_pairs if gold_pairs else 1.0
+
+    n = len(labels)
+    overlap_sq = overlap.astype(float) ** 2
+    bcubed_precision = (overlap_sq / pred_sizes.reindex(overlap.index.get_level_values('pred')).to_numpy()).sum() / n
+    bcubed_recall = (overlap_sq / gold_sizes.reindex(overlap.index.get_level_values('gold')).to_numpy()).sum() / n
+
+    def f1(p, r):
+        return 2 * p * r / (p + r) if p + r else 0.0
+
+    return {
+        'pair_precision': round(pair_precision, 4),
+        'pair_recall': round(pair_recall, 4),
+        'pair_f1': round(f1(pair_precision, pair_recall), 4),
+        'bcubed_precision': round(bcubed_precision, 4),
+        'bcubed_recall': round(bcubed_recall, 4),
+        'bcubed_f1': round(f1(bcubed_precision, bcubed_recall), 4)
+    }
+
+
+def run_variant(variant, entity_type, normalized_df, gold_labels):
+    """Ejecuta una variante sobre un tipo de entidad y la evalúa contra los clusters curados."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        blocks = build_blocks(normalized_df, variant['blocking'])
+        blocking_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matches = match_blocks(normalized_df, blocks, variant['threshold'], variant['scorer'], variant['workers'])
+        matching_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        components = build_components(normalized_df, matches, entity_type)
+        clustering_seconds = time.perf_counter() - start
+
+    labels, missing = component_labels(components, len(normalized_df))
+    return {
+        'variant': variant['name'],
+        'entity_type': entity_type,
+        'scorer': variant['scorer'],
+        'threshold': variant['threshold'],
+        'blocking': variant['blocking'],
+        'workers': variant['workers'],
+        'names': len(normalized_df),
+        'blocks': len(blocks),
+        'comparisons': sum(len(b) * (len(b) - 1) // 2 for b in blocks.values()),
+        'matches': len(matches),
+        'clusters': len(set(labels)),
+        'gold_clusters': len(set(gold_labels)),
+        'names_without_component': missing,
+        **cluster_scores(gold_labels, labels),
+        'blocking_seconds': round(blocking_seconds, 3),
+        'matching_seconds': round(matching_seconds, 3),
+        'clustering_seconds': round(clustering_seconds, 3),
+        'total_seconds': round(blocking_seconds + matching_seconds + clustering_seconds, 3)
+    }
+
+
+def run_harness(variants, manual_review_dir, entity_types=None):
+    """
+    Evalúa todas las variantes sobre los tipos con clusters curados.
+
+    Args:
+        variants: Variantes de parse_variant
+        manual_review_dir: Directorio con los *_standardized.csv
+        entity_types: Tipos a evaluar (None = todos los archivos curados)
+
+    Returns:
+        DataFrame con una fila por variante y tipo de entidad
+    """
+    gold = load_gold(manual_review_dir)
+    if entity_types:
+        gold = {t: df for t, df in gold.items() if t in entity_types}
+    if not gold:
+        raise FileNotFoundError(f"No se encontraron archivos *_standardized.csv en {manual_review_dir}")
+
+    rows = []
+    for entity_type, gold_df in gold.items():
+        print(f"\n{entity_type}: {len(gold_df):,} nombres, {gold_df['entity_id'].nunique():,} entidades curadas")
+        start = time.perf_counter()
+        normalized_df = normalize(gold_df)
+        print(f"   ✓ Normalización: {time.perf_counter() - start:.1f}s")
+        gold_labels = pd.factorize(gold_df['entity_id'])[0].tolist()
+
+        for variant in variants:
+            row = run_variant(variant, entity_type, normalized_df, gold_labels)
+            rows.append(row)
+            print(f"   ✓ {variant['name']}: pair F1 {row['pair_f1']:.4f}, B-cubed F1 {row['bcubed_f1']:.4f}, "
+                  f"{row['comparisons']:,} comparaciones, {row['total_seconds']:.1f}s")
+    return pd.DataFrame(rows)
+
+
+def print_comparison(results):
+    """Imprime la tabla comparativa de variantes."""
+    print("\n" + "=" * 80)
+    print("COMPARACIÓN DE VARIANTES")
+    print("=" * 80)
+    columns = ['variant', 'entity_type', 'pair_precision', 'pair_recall', 'pair_f1', 'bcubed_f1',
+               'comparisons', 'total_seconds']
+    print(results[columns].to_string(index=False))
+
+
+def main():
+    """Función principal."""
+    parser = argparse.ArgumentParser(
+        description="Harness de calidad y rendimiento contra los clusters curados",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+Cada --variant es un nombre seguido de opciones clave=valor:
+  scorer     {', '.join(SCORERS)} (por defecto WRatio)
+  threshold  similitud mínima 0-100 (por defecto {matching.SIMILARITY_THRESHOLD})
+  blocking   {', '.join(BLOCKING_STRATEGIES)} (por defecto first_word)
+  workers    procesos para el matching (por defecto 1)
+
+Ejemplos de uso:
+  python benchmarks/quality_harness.py
+  python benchmarks/quality_harness.py --variant base --variant t90 threshold=90 --variant w4 workers=4
+        """
+    )
+
+    parser.add_argument(
+        '--variant',
+        action='append',
+        nargs='+',
+        metavar='NOMBRE [CLAVE=VALOR ...]',
+        help='Variante a evaluar (se puede repetir); sin --variant se evalúa la configuración del pipeline'
+    )
+
+    parser.add_argument(
+        '--manual-review-dir',
+        type=Path,
+        default=REPO_DIR / "results" / "manual_review",
+        help='Directorio con los *_standardized.csv curados'
+    )
+
+    parser.add_argument(
+        '--entity-types',
+        nargs='+',
+        metavar='TIPO',
+        help='Evaluar solo estos tipos (p. ej. financial non_financial); por defecto todos los curados'
+    )
+
+    parser.add_argument(
+        '--output',
+        type=Path,
+        default=REPO_DIR / "results" / "benchmark" / "quality_comparison.csv",
+        help='CSV de la comparación (por defecto results/benchmark/quality_comparison.csv)'
+    )
+
+    args = parser.parse_args()
+
+    try:
+        variants = [parse_variant(tokens) for tokens in (args.variant or [['pipeline']])]
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("=" * 80)
+    print("HARNESS DE CALIDAD Y RENDIMIENTO")
+    print("=" * 80)
+    print(f"Variantes: {', '.join(v['name'] for v in variants)}")
+
+    results = run_harness(variants, args.manual_review_dir, entity_types=args.entity_types)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(args.output, index=False)
+
+    print_comparison(results)
+    print(f"\n✓ Comparación guardada en: {args.output}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Benchmark de Escalabilidad con Datos Sintéticos
+===============================================
+Genera original-data sintéticos de varios tamaños (synthetic_data.py), ejecuta
+todas las fases de scripts/pipeline.py sobre cada uno y guarda un reporte JSON
+con, por fase y tamaño:
+
+- tiempo real y de CPU, nombres/s y pares/s (matching, con pairs_compared)
+- pico de RSS (y de tracemalloc con --trace-memory) y contadores de la fase
+- exponente de escalado: pendiente de log(tiempo) frente a log(nombres)
+  ajustada por mínimos cuadrados sobre todos los tamaños
+
+Cada tamaño se ejecuta en un proceso nuevo (spawn) para que el pico de RSS sea
+el de ese tamaño. Los datos de cada tamaño se escriben en --work-dir y se
+eliminan al terminar, salvo con --keep-data.
+
+Uso:
+    python benchmarks/run_benchmark.py                          # 10k, 100k y 1M nombres
+    python benchmarks/run_benchmark.py --sizes 10000 50000      # Tamaños concretos
+    python benchmarks/run_benchmark.py --output bench.json      # Reporte en otro archivo
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).parent
+REPO_DIR = BENCHMARK_DIR.parent
+SCRIPTS_DIR = REPO_DIR / "scripts"
+
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+import synthetic_data
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def _run_size(base_dir, log_file, trace_memory=False):
+    """
+    Ejecuta el pipeline completo sobre un original-data sintético (en un proceso propio).
+
+    Returns:
+        dict: run_report de instrumentation (o status 'error' y el mensaje)
+    """
+    # update_database importa database_manager desde el directorio del repositorio
+    sys.path.insert(0, str(REPO_DIR))
+    import pipeline
+    from modules import instrumentation
+
+    instrumentation.start_run('scripts', base_dir / "results", trace_memory=trace_memory)
+    error = None
+    with open(log_file, 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            pipeline.run_full_pipeline(base_dir, force=True)
+        except Exception as e:
+            traceback.print_exc()
+            error = f"{type(e).__name__}: {e}"
+
+    report = instrumentation.stop_run().to_dict()
+    report['status'] = 'error' if error else 'ok'
+    report['error'] = error
+    return report
+
+
+def summarize_phases(run_report, n_names):
+    """Métricas por fase a partir del run_report de un tamaño."""
+    phases = {}
+    for record in run_report['phases']:
+        if record['status'] == 'skipped':
+            continue
+        wall = record['wall_seconds']
+        metrics = {
+            'wall_seconds': wall,
+            'cpu_seconds': record['cpu_seconds'],
+            'peak_rss_mb': record.get('peak_rss_mb'),
+            'names_per_second': round(n_names / wall, 1) if wall > 0 else None,
+            'counters': record['counters']
+        }
+        if 'tracemalloc_peak_mb' in record:
+            metrics['tracemalloc_peak_mb'] = record['tracemalloc_peak_mb']
+        pairs = record['counters'].get('pairs_compared')
+        if pairs is not None:
+            metrics['pairs_per_second'] = round(pairs / wall, 1) if wall > 0 else None
+        phases[record['name']] = metrics
+    return phases
+
+
+def scaling_exponent(sizes, values):
+    """
+    Pendiente de log(valor) frente a log(tamaño) por mínimos cuadrados.
+
+    1.0 es lineal, 2.0 cuadrático. None si hay menos de dos puntos válidos.
+    """
+    points = [(math.log(n), math.log(v)) for n, v in zip(sizes, values) if v is not None and v > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    return round(cov / var_x, 3)
+
+
+def compute_scaling(size_results):
+    """Exponentes de escalado por fase (tiempo) y del total (tiempo y pico de RSS)."""
+    completed = [r for r in size_results if r['status'] == 'ok']
+    sizes = [r['n_names'] for r in completed]
+    phase_names = []
+    for result in completed:
+        phase_names.extend(name for name in result['phases'] if name not in phase_names)
+
+    scaling = {}
+    for name in phase_names:
+        walls = [r['phases'].get(name, {}).get('wall_seconds') for r in completed]
+        scaling[name] = {'time_exponent': scaling_exponent(sizes, walls)}
+        pairs = [r['phases'].get(name, {}).get('counters', {}).get('pairs_compared') for r in completed]
+        if any(p is not None for p in pairs):
+            scaling[name]['pairs_exponent'] = scaling_exponent(sizes, pairs)
+    scaling['total'] = {
+        'time_exponent': scaling_exponent(sizes, [r['wall_seconds'] for r in completed]),
+        'peak_rss_exponent': scaling_exponent(sizes, [r['peak_rss_mb'] for r in completed])
+    }
+    return scaling
+
+
+def run_benchmark(sizes, work_dir, seed=0, trace_memory=False, keep_data=False):
+    """
+    Ejecuta el benchmark para cada tamaño.
+
+    Args:
+        sizes: Números totales de nombres (financial + non_financial)
+        work_dir: Directorio de trabajo para los datos sintéticos y los logs
+        seed: Semilla del generador
+        trace_memory: Si True, mide también el pico de tracemalloc por fase
+        keep_data: Si True, conserva los datos y resultados de cada tamaño
+
+    Returns:
+        dict: Reporte del benchmark
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    started_at = datetime.now()
+    size_results = []
+
+    for n_names in sorted(sizes):
+        base_dir = work_dir / f"n{n_names}"
+        if base_dir.exists():
+            shutil.rmtree(base_dir)
+        log_file = work_dir / f"n{n_names}.log"
+
+        print(f"\n▶ {n_names:,} nombres")
+        start = time.perf_counter()
+        counts = synthetic_data.write_dataset(base_dir, n_names, seed=seed)
+        generation_seconds = round(time.perf_counter() - start, 3)
+        print(f"   ✓ Datos sintéticos generados en {generation_seconds:.1f}s "
+              f"({counts['financial']:,} financial, {counts['non_financial']:,} non-financial)")
+
+        # Proceso nuevo por tamaño: el pico de RSS no arrastra el de tamaños anteriores
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            run_report = executor.submit(_run_size, base_dir, log_file, trace_memory).result()
+
+        result = {
+            'n_names': n_names,
+            'financial_names': counts['financial'],
+            'non_financial_names': counts['non_financial'],
+            'generation_seconds': generation_seconds,
+            'status': run_report['status'],
+            'error': run_report['error'],
+            'wall_seconds': run_report['wall_seconds'],
+            'cpu_seconds': run_report['cpu_seconds'],
+            'peak_rss_mb': run_report['peak_rss_mb'],
+            'log_file': str(log_file),
+            'phases': summarize_phases(run_report, n_names)
+        }
+        size_results.append(result)
+
+        if result['status'] == 'ok':
+            print(f"   ✓ Pipeline: {result['wall_seconds']:.1f}s, pico RSS {result['peak_rss_mb']} MB")
+        else:
+            print(f"   ⚠️ Error: {result['error']} (ver {log_file})")
+
+        if not keep_data:
+            shutil.rmtree(base_dir)
+
+    return {
+        'benchmark': 'synthetic_scalability',
+        'pipeline': 'scripts',
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'trace_memory': trace_memory,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'sizes': size_results,
+        'scaling': compute_scaling(size_results)
+    }
+
+
+def print_summary(report):
+    """Imprime rendimiento por fase y tamaño y los exponentes de escalado."""
+    print("\n" + "=" * 80)
+    print("BENCHMARK DE ESCALABILIDAD")
+    print("=" * 80)
+    print(f"   {'Fase':<16} {'Nombres':>10} {'Real':>9} {'Nombres/s':>11} {'Pares/s':>11} {'RSS MB':>8}")
+    for result in report['sizes']:
+        for name, metrics in result['phases'].items():
+            names_rate = metrics['names_per_second']
+            pairs_rate = metrics.get('pairs_per_second')
+            print(f"   {name:<16} {result['n_names']:>10,} {metrics['wall_seconds']:>8.1f}s "
+                  f"{names_rate if names_rate is not None else '-':>11} "
+                  f"{pairs_rate if pairs_rate is not None else '-':>11} "
+                  f"{metrics['peak_rss_mb'] if metrics['peak_rss_mb'] is not None else '-':>8}")
+
+    print("\n   Exponentes de escalado (1.0 = lineal):")
+    for name, exponents in report['scaling'].items():
+        values = ', '.join(f"{k}={v}" for k, v in exponents.items())
+        print(f"   - {name}: {values}")
+
+
+def main():
+    """Función principal."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark de escalabilidad del pipeline con datos sintéticos",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  python benchmarks/run_benchmark.py                        # 10k, 100k y 1M nombres
+  python benchmarks/run_benchmark.py --sizes 10000 50000    # Tamaños concretos
+  python benchmarks/run_benchmark.py --trace-memory         # Con pico de tracemalloc por fase
+        """
+    )
+
+    parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='+',
+        default=DEFAULT_SIZES,
+        metavar='N',
+        help='Números totales de nombres a generar (por defecto 10000 100000 1000000)'
+    )
+
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Semilla del generador de datos sintéticos (por defecto 0)'
+    )
+
+    parser.add_argument(
+        '--work-dir',
+        type=Path,
+        default=REPO_DIR / "results" / "benchmark" / "work",
+        help='Directorio para los datos sintéticos, resultados y logs de cada tamaño'
+    )
+
+    parser.add_argument(
+        '--output',
+        type=Path,
+        default=REPO_DIR / "results" / "benchmark" / "benchmark_report.json",
+        help='Archivo JSON del reporte (por defecto results/benchmark/benchmark_report.json)'
+    )
+
+    parser.add_argument(
+        '--trace-memory',
+        action='store_true',
+        help='Medir el pico de memoria de Python por fase con tracemalloc (más lento)'
+    )
+
+    parser.add_argument(
+        '--keep-data',
+        action='store_true',
+        help='Conservar los datos sintéticos y resultados de cada tamaño'
+    )
+
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("BENCHMARK DE ESCALABILIDAD CON DATOS SINTÉTICOS")
+    print("=" * 80)
+    print(f"Tamaños: {', '.join(f'{n:,}' for n in sorted(args.sizes))}")
+
+    report = run_benchmark(args.sizes, args.work_dir, seed=args.seed, trace_memory=args.trace_memory,
+                           keep_data=args.keep_data)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print_summary(report)
+    print(f"\n✓ Reporte guardado en: {args.output}")
+    print("=" * 80)
+
+    if any(r['status'] != 'ok' for r in report['sizes']):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
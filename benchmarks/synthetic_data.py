@@ -0,0 +1,234 @@
+"""
+Datos Sintéticos para Benchmarks
+================================
+Genera nombres de entidades sintéticos con el vocabulario del propio proyecto
+para medir el pipeline a volúmenes de producción (10-100× original-data).
+
+- Cada entidad tiene un nombre canónico: una raíz inventada (sílabas) más
+  palabras del sector. La primera raíz sigue una distribución de Zipf, así que
+  hay raíces muy repetidas y bloques grandes, como en los datos reales.
+- Cada entidad aparece con varias variantes (número de Zipf) construidas con
+  LEGAL_SUFFIXES y BRANCH_GEO_TOKENS (grouping.py), los roles funcionales de
+  FUNCTIONAL_ROLE_PATTERNS (normalization.py) y ruido de erratas y compuestos.
+- Las frecuencias siguen una ley de Zipf sobre el rango del nombre.
+
+La generación es determinista para una semilla dada.
+"""
+
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Vocabulario del pipeline principal (scripts/modules)
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from modules.grouping import LEGAL_SUFFIXES, BRANCH_GEO_TOKENS
+from modules.normalization import FUNCTIONAL_ROLE_PATTERNS
+
+# Archivos de original-data que lee scripts/pipeline.py (columna de nombre por tipo)
+DATASET_FILES = {
+    'financial': ('financial_entity_freq_pledge.csv', 'ee_name'),
+    'non_financial': ('non_financial_entity_freq_pledge.csv', 'or_name'),
+}
+
+# Proporción de nombres financieros (similar a original-data)
+FINANCIAL_SHARE = 0.3
+
+# Exponentes de Zipf: popularidad de raíces, variantes por entidad y frecuencias
+ROOT_ZIPF = 1.0
+VARIANTS_ZIPF = 2.0
+FREQ_ZIPF = 1.1
+MAX_VARIANTS = 60
+MAX_FREQ = 400_000
+
+SYLLABLES = [
+    'AL', 'AM', 'AN', 'AR', 'BA', 'BEL', 'BER', 'BO', 'CA', 'CAR', 'CO', 'COR',
+    'DA', 'DEL', 'DO', 'EN', 'ER', 'FA', 'FER', 'GA', 'GEN', 'HA', 'HOL', 'IN',
+    'KA', 'KEN', 'LA', 'LEN', 'LO', 'MA', 'MAR', 'MER', 'MI', 'MON', 'NA', 'NOR',
+    'O', 'PA', 'PER', 'RA', 'RI', 'RO', 'SA', 'SAN', 'SEL', 'SO', 'TA', 'TER',
+    'TO', 'TRA', 'VA', 'VAN', 'VER', 'VI', 'WEL', 'WIN', 'ZA', 'ZEN'
+]
+
+SECTOR_WORDS = {
+    'financial': ['BANK', 'TRUST', 'CAPITAL', 'SECURITIES', 'FINANCIAL', 'CREDIT', 'SAVINGS',
+                  'INVESTMENT', 'FUNDING', 'LENDING', 'BANCORP', 'FINANCE'],
+    'non_financial': ['TECHNOLOGY', 'PRODUCTS', 'HOLDINGS', 'SYSTEMS', 'ENERGY', 'INDUSTRIES',
+                      'PHARMACEUTICALS', 'SEMICONDUCTOR', 'MEDICAL', 'ELECTRONICS', 'SOFTWARE',
+                      'NETWORKS', 'MATERIALS', 'INTERNATIONAL', 'GROUP', 'DEVICES'],
+}
+
+# Sufijos con el formato en que aparecen en los datos originales
+SUFFIX_FORMS = {'NA': ['N.A.', 'NATIONAL ASSOCIATION', 'NA'], 'INC': ['INC.', 'INC'],
+                'CORP': ['CORP.', 'CORPORATION'], 'CO': ['CO.', 'COMPANY'], 'LLC': ['L.L.C.', 'LLC'],
+                'LP': ['L.P.', 'LP'], 'LTD': ['LTD.', 'LIMITED']}
+
+# Tokens geográficos de BRANCH_GEO_TOKENS que son ciudades o regiones
+GEO_TOKENS = sorted(BRANCH_GEO_TOKENS - {'BRANCH', 'TRUST', 'TRUSTEE', 'COMPANY', 'CITY'})
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def _role_phrase(pattern):
+    """Convierte un patrón de FUNCTIONAL_ROLE_PATTERNS en texto ('AS COLLATERAL AGENT')."""
+    text = pattern.replace(r'\s+', ' ').replace(r'\s*', '').replace(r'\.', '.')
+    return text.replace('[^,]*', '').strip()
+
+
+ROLE_PHRASES = [_role_phrase(p) for p in FUNCTIONAL_ROLE_PATTERNS]
+OPEN_ROLE_PHRASES = {_role_phrase(p) for p in FUNCTIONAL_ROLE_PATTERNS if p.endswith('[^,]*')}
+LEGAL_SUFFIX_LIST = sorted(s for s in LEGAL_SUFFIXES if re.fullmatch(r'[A-Z]+', s))
+
+
+def _zipf_cdf(n, s):
+    """Distribución acumulada de Zipf sobre los rangos 1..n."""
+    cdf = np.cumsum(1.0 / np.arange(1, n + 1) ** s)
+    return cdf / cdf[-1]
+
+
+def _make_roots(rng, n_roots):
+    """Raíces inventadas de 2-3 sílabas, únicas."""
+    roots = []
+    seen = set()
+    while len(roots) < n_roots:
+        n_syllables = 2 if rng.random() < 0.6 else 3
+        root = ''.join(SYLLABLES[i] for i in rng.integers(len(SYLLABLES), size=n_syllables))
+        if root not in seen:
+            seen.add(root)
+            roots.append(root)
+    return roots
+
+
+def _typo(rng, token):
+    """Errata en un token: intercambio, omisión o sustitución de un carácter."""
+    if len(token) < 4:
+        return token
+    i = int(rng.integers(1, len(token) - 1))
+    kind = rng.random()
+    if kind < 0.4:
+        return token[:i] + token[i + 1] + token[i] + token[i + 2:]
+    if kind < 0.7:
+        return token[:i] + token[i + 1:]
+    return token[:i] + LETTERS[int(rng.integers(len(LETTERS)))] + token[i + 1:]
+
+
+def _compound(rng, tokens):
+    """Ruido de compuestos: une dos tokens, parte una raíz o alterna AND / &."""
+    tokens = list(tokens)
+    if 'AND' in tokens:
+        tokens[tokens.index('AND')] = '&'
+    elif len(tokens) > 1 and rng.random() < 0.5:
+        i = int(rng.integers(len(tokens) - 1))
+        tokens[i:i + 2] = [tokens[i] + tokens[i + 1]]
+    elif len(tokens[0]) >= 6:
+        cut = len(tokens[0]) // 2
+        tokens[0:1] = [tokens[0][:cut], tokens[0][cut:]]
+    return tokens
+
+
+def _canonical_tokens(rng, entity_type, roots, root_cdf):
+    """Tokens del nombre canónico de una entidad."""
+    tokens = [roots[min(int(np.searchsorted(root_cdf, rng.random())), len(roots) - 1)]]
+    if rng.random() < 0.3:
+        tokens.append(roots[int(rng.integers(len(roots)))])
+    if rng.random() < 0.15:
+        tokens.append('AND')
+        tokens.append(roots[int(rng.integers(len(roots)))])
+    sector = SECTOR_WORDS[entity_type]
+    tokens.append(sector[int(rng.integers(len(sector)))])
+    if entity_type == 'financial' and rng.random() < 0.2:
+        tokens = ['BANK', 'OF'] + tokens[:-1]
+    return tokens
+
+
+def _variant(rng, entity_type, tokens, roots):
+    """Variante de un nombre canónico con el ruido de los datos originales."""
+    if rng.random() < 0.1:
+        tokens = [_typo(rng, t) if i == 0 or rng.random() < 0.3 else t for i, t in enumerate(tokens)]
+    if rng.random() < 0.08:
+        tokens = _compound(rng, tokens)
+    name = ' '.join(tokens)
+    if rng.random() < 0.1:
+        name = 'THE ' + name
+
+    if rng.random() < 0.6:
+        suffix = LEGAL_SUFFIX_LIST[int(rng.integers(len(LEGAL_SUFFIX_LIST)))]
+        if entity_type == 'financial' and rng.random() < 0.4:
+            suffix = 'NA'
+        forms = SUFFIX_FORMS.get(suffix, [suffix])
+        separator = ', ' if rng.random() < 0.5 else ' '
+        name += separator + forms[int(rng.integers(len(forms)))]
+
+    branch_p, role_p = (0.15, 0.35) if entity_type == 'financial' else (0.03, 0.05)
+    if rng.random() < branch_p:
+        name += f", {GEO_TOKENS[int(rng.integers(len(GEO_TOKENS)))]} BRANCH"
+    if rng.random() < role_p:
+        role = ROLE_PHRASES[int(rng.integers(len(ROLE_PHRASES)))]
+        if role in OPEN_ROLE_PHRASES:
+            role += f" {roots[int(rng.integers(len(roots)))]} {SECTOR_WORDS['financial'][0]}"
+        name += ', ' + role
+    return name
+
+
+def generate_names(n_names, entity_type='financial', seed=0):
+    """
+    Genera nombres sintéticos únicos con frecuencias de Zipf.
+
+    Args:
+        n_names: Número de nombres únicos
+        entity_type: 'financial' o 'non_financial'
+        seed: Semilla del generador
+
+    Returns:
+        DataFrame con columnas name, freq (ordenado por frecuencia descendente)
+    """
+    rng = np.random.default_rng(seed)
+    n_roots = max(100, n_names // 4)
+    roots = _make_roots(rng, n_roots)
+    root_cdf = _zipf_cdf(n_roots, ROOT_ZIPF)
+
+    names = []
+    seen = set()
+    while len(names) < n_names:
+        tokens = _canonical_tokens(rng, entity_type, roots, root_cdf)
+        n_variants = min(int(rng.zipf(VARIANTS_ZIPF)), MAX_VARIANTS)
+        for _ in range(n_variants):
+            name = _variant(rng, entity_type, tokens, roots)
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+                if len(names) == n_names:
+                    break
+
+    # Rango de frecuencia aleatorio: las variantes de una entidad no quedan contiguas
+    ranks = rng.permutation(n_names) + 1
+    freqs = np.maximum(1, np.round(MAX_FREQ / ranks ** FREQ_ZIPF)).astype(np.int64)
+    df = pd.DataFrame({'name': names, 'freq': freqs})
+    return df.sort_values('freq', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def write_dataset(base_dir, n_names, seed=0, financial_share=FINANCIAL_SHARE):
+    """
+    Escribe un original-data sintético con n_names nombres en total.
+
+    Args:
+        base_dir: Directorio base del proyecto sintético
+        n_names: Número total de nombres (financial + non_financial)
+        seed: Semilla del generador
+        financial_share: Proporción de nombres financieros
+
+    Returns:
+        dict: entity_type -> número de nombres escritos
+    """
+    data_dir = Path(base_dir) / "original-data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    n_financial = int(round(n_names * financial_share))
+    counts = {'financial': n_financial, 'non_financial': n_names - n_financial}
+
+    for offset, (entity_type, n) in enumerate(counts.items()):
+        file_name, name_column = DATASET_FILES[entity_type]
+        df = generate_names(n, entity_type, seed=seed + offset)
+        df.rename(columns={'name': name_column}).to_csv(data_dir / file_name, index=False)
+    return counts
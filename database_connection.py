@@ -0,0 +1,205 @@
+"""
+Gestor de Conexiones SQLite
+===========================
+Conexiones persistentes compartidas por EntityDatabase, EntityDatabaseTransaction
+y PatentTransactionDatabase.
+
+Cada base de datos tiene un SQLiteConnectionManager por proceso
+(get_connection_manager). Las conexiones se abren una vez con WAL y los PRAGMAS
+de abajo y se reutilizan: la caché de páginas de SQLite y la de sentencias
+preparadas (cached_statements) sobreviven entre llamadas, así que un rerun de
+Streamlit no paga la apertura de la conexión ni una caché fría.
+
+Una conexión pertenece a un solo hilo mientras se usa: connection() la toma del
+pool (o abre una nueva) y la devuelve al salir; las llamadas anidadas del mismo
+hilo reutilizan la misma conexión. transaction() además confirma al salir o
+deshace si hay una excepción.
+
+execute_script e insert_dataframe ejecutan DDL y cargas masivas dentro de la
+transacción en curso, sin confirmarla.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import pandas as pd
+
+# PRAGMAs de cada conexión persistente
+PRAGMAS = (
+    ('journal_mode', 'WAL'),        # Lectores no bloquean al escritor (persistente en el archivo)
+    ('synchronous', 'NORMAL'),      # Con WAL, fsync solo en los checkpoints
+    ('cache_size', -65536),         # Caché de páginas de 64 MB (negativo = KiB)
+    ('mmap_size', 268435456),       # Lecturas mapeadas en memoria (256 MB)
+    ('temp_store', 'MEMORY'),       # Ordenaciones e índices temporales en memoria
+)
+
+# Sentencias preparadas que guarda cada conexión (sqlite3 usa 128 por defecto)
+STATEMENT_CACHE_SIZE = 256
+
+# Conexiones inactivas que se conservan por base de datos
+MAX_IDLE_CONNECTIONS = 4
+
+_managers: Dict[Tuple[str, bool], 'SQLiteConnectionManager'] = {}
+_managers_lock = threading.Lock()
+
+
+def execute_script(conn: sqlite3.Connection, script: str):
+    """
+    Ejecuta un script SQL sentencia a sentencia dentro de la transacción en curso
+
+    conn.executescript confirmaría la transacción antes de empezar, y sqlite3 no
+    abre una transacción antes de un DDL: si no hay una abierta se abre aquí, así
+    que el script (CREATE, DROP TRIGGER, ...) se confirma o se deshace junto con
+    el resto de la transacción. Respeta los BEGIN ... END de los triggers.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ''
+
+
+def insert_dataframe(conn: sqlite3.Connection, table: str, df: pd.DataFrame):
+    """
+    Inserta las filas de un DataFrame (una columna por columna de la tabla)
+
+    Usa executemany dentro de la transacción en curso: df.to_sql la confirma, y
+    una carga masiva debe confirmarse junto con el DDL que la rodea
+    (deferred_entity_stats, deferred_entity_search).
+    """
+    # sqlite3 no acepta tipos de numpy ni NaN
+    values = df.astype(object)
+    rows = values.where(values.notna(), None).values.tolist()
+    placeholders = ', '.join('?' for _ in df.columns)
+    conn.executemany(f"INSERT INTO {table} ({', '.join(df.columns)}) VALUES ({placeholders})", rows)
+
+
+def get_connection_manager(db_path: Path, persistent: bool = True) -> 'SQLiteConnectionManager':
+    """
+    Devuelve el gestor de conexiones de una base de datos (uno por proceso y ruta)
+
+    Args:
+        db_path: Ruta al archivo SQLite
+        persistent: Si False, cada uso abre y cierra su conexión sin PRAGMAs
+            (comportamiento anterior; para bases en sistemas de archivos de red,
+            donde WAL no está soportado)
+    """
+    key = (str(Path(db_path).resolve()), persistent)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = SQLiteConnectionManager(db_path, persistent=persistent)
+            _managers[key] = manager
+        return manager
+
+
+class SQLiteConnectionManager:
+    """Pool de conexiones SQLite de una base de datos"""
+
+    def __init__(self, db_path: Path, persistent: bool = True):
+        self.db_path = Path(db_path)
+        self.persistent = persistent
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _open(self) -> sqlite3.Connection:
+        if not self.persistent:
+            return sqlite3.connect(self.db_path)
+        # La conexión puede pasar de un hilo a otro a través del pool, nunca se comparte
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        for name, value in PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        if self.persistent:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+        return self._open()
+
+    def _release(self, conn: sqlite3.Connection):
+        if self.persistent:
+            if conn.in_transaction:
+                # Una transacción abierta no puede volver al pool
+                conn.rollback()
+            with self._lock:
+                if len(self._idle) < MAX_IDLE_CONNECTIONS:
+                    self._idle.append(conn)
+                    return
+        conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Conexión del hilo actual (tomada del pool; las llamadas anidadas la comparten)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Conexión dentro de una transacción: confirma al salir, deshace si hay una excepción
+
+        Una transacción anidada en el mismo hilo forma parte de la exterior.
+        """
+        with self.connection() as conn:
+            if getattr(self._local, 'in_transaction', False):
+                yield conn
+                return
+            self._local.in_transaction = True
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._local.in_transaction = False
+
+    def backup(self, backup_path: Path):
+        """Copia consistente de la base de datos (incluye lo que aún está en el WAL)"""
+        target = sqlite3.connect(backup_path)
+        try:
+            with self.connection() as conn:
+                conn.backup(target)
+            # La copia es un único archivo, sin -wal
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+
+    def close(self, checkpoint: bool = True):
+        """
+        Cierra las conexiones inactivas del pool
+
+        Args:
+            checkpoint: Si True, vuelca el WAL al archivo principal antes de cerrar,
+                para que el .db quede autocontenido (copias, hashes de manifiestos)
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        if checkpoint and self.persistent and self.db_path.exists():
+            conn = idle[0] if idle else self._open()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            if not idle:
+                conn.close()
+        for conn in idle:
+            conn.close()
+
@@ -4,92 +4,168 @@ Gestor de Base de Datos para Pares de Transacciones de Patentes
 Sistema de base de datos SQLite para manejar pares (firm-bank) de transacciones de patentes.
 """
 
-import sqlite3
+import json
+import os
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
-import shutil
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 import logging
 
+from database_connection import get_connection_manager
+from patent_counts import PATENT_COUNT_MODES, ExactDistinctCounter, HyperLogLogCounter, pair_keys, value_keys
+from patent_schema import create_patent_schema, insert_pairs, prune_unused
+
 # Transaction types supported
 TRANSACTION_TYPES = ['security', 'release']
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Mapeos cargados en este proceso: transaction_type -> (firma de los archivos, mapeo)
+_mapping_cache: Dict[str, Tuple[list, Dict[str, str]]] = {}
+
+
+def _strip_names(names: pd.Series) -> pd.Categorical:
+    """
+    Nombres sin espacios en los extremos, como categórico (nulos y vacíos quedan nulos)
+    
+    Se limpian solo los valores distintos del chunk, no cada fila.
+    """
+    codes, uniques = pd.factorize(names)
+    if len(uniques) == 0:
+        # Columna sin ningún nombre en el chunk: no hay categorías que indexar
+        return pd.Categorical.from_codes(codes, categories=pd.Index([], dtype=object))
+    stripped = pd.Series(uniques, dtype=object).str.strip()
+    stripped_codes, categories = pd.factorize(stripped.where(stripped != ''))
+    # Con -1 (nulo) la indexación tomaría la última categoría: np.where lo conserva
+    codes = np.where(codes >= 0, stripped_codes[codes], -1)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def _fold_pairs(pairs: Optional[pd.DataFrame], partials: List[pd.DataFrame]) -> pd.DataFrame:
+    """Suma las frecuencias de los chunks acumulados a las de los pares (un solo groupby)"""
+    parts = partials if pairs is None else [pairs] + partials
+    return pd.concat(parts).groupby(level=[0, 1], sort=False).sum()
+
+
+def _file_signature(file_path: Path) -> list:
+    """Ruta absoluta, tamaño y mtime de un archivo (tamaño y mtime None si no existe)"""
+    if not file_path.exists():
+        return [str(file_path.resolve()), None, None]
+    stat = file_path.stat()
+    return [str(file_path.resolve()), stat.st_size, stat.st_mtime_ns]
+
+
+def _parse_mapping_files(mapping_files: List[Path]) -> Dict[str, str]:
+    """
+    Lee los archivos *_entities_standardized.csv y arma original_name -> standard_name
+    
+    Si un nombre aparece más de una vez gana la primera aparición: los archivos
+    van en orden de prioridad (financial primero).
+    """
+    frames = []
+    for file_path in mapping_files:
+        if not file_path.exists():
+            logger.warning(f"Mapping file not found: {file_path}. Continuing without it.")
+            continue
+        try:
+            # Verify required columns exist
+            columns = pd.read_csv(file_path, nrows=0).columns
+            if 'original_name' not in columns or 'standard_name' not in columns:
+                logger.warning(f"Missing required columns in {file_path.name}. Skipping.")
+                continue
+            
+            df = pd.read_csv(file_path, usecols=['original_name', 'standard_name'], dtype=str)
+            # Filas sin nombre original o estándar no aportan un mapeo
+            df = df.dropna()
+            frames.append(pd.DataFrame({
+                'original_name': df['original_name'].str.strip(),
+                'standard_name': df['standard_name'].str.strip(),
+                'file': file_path.name
+            }))
+            logger.info(f"Loaded {len(df):,} mappings from {file_path.name}")
+        except Exception as e:
+            logger.warning(f"Error loading {file_path.name}: {e}. Continuing with other files.")
+    
+    if not frames:
+        return {}
+    
+    combined = pd.concat(frames, ignore_index=True)
+    duplicated = combined['original_name'].duplicated(keep='first')
+    kept = combined[~duplicated]
+    mappings = dict(zip(kept['original_name'], kept['standard_name']))
+    
+    # Conflicts: repeated names with a different standard name (name in both financial and non-financial)
+    repeated = combined[duplicated]
+    conflicts = repeated[repeated['standard_name'] != repeated['original_name'].map(mappings)]
+    if len(conflicts) > 0:
+        logger.warning(f"Found {len(conflicts)} name conflicts between financial and non-financial mappings. "
+                      f"Using financial mapping (first file) for conflicts.")
+        for conflict in conflicts.head(10).itertuples():  # Log first 10 conflicts
+            logger.debug(f"Conflict: '{conflict.original_name}' -> existing: '{mappings[conflict.original_name]}', "
+                       f"new: '{conflict.standard_name}' from {conflict.file}")
+    
+    return mappings
+
+
+def _read_mapping_cache(cache_file: Path, sources: list) -> Optional[Dict[str, str]]:
+    """Mapeo guardado en cache_file, o None si no existe o sus archivos de origen cambiaron"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get('sources') != sources:
+        return None
+    return cache.get('mappings')
+
+
+def _write_mapping_cache(cache_file: Path, sources: list, mappings: Dict[str, str]):
+    """Guarda el mapeo con la firma de sus archivos de origen (reemplazo atómico)"""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'sources': sources, 'mappings': mappings}, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.warning(f"Could not write mapping cache {cache_file}: {e}")
+
 
 class PatentTransactionDatabase:
     """Gestor de base de datos para pares de transacciones de patentes"""
     
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, persistent_connections: bool = True):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Conexiones persistentes (WAL) compartidas en el proceso; ver database_connection.py
+        self._connections = get_connection_manager(self.db_path, persistent=persistent_connections)
         self._init_database()
     
     def _init_database(self):
-        """Inicializa la base de datos y crea tablas si no existen"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Tabla principal de pares de transacciones
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS patent_pairs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                transaction_type TEXT NOT NULL,
-                firm_name TEXT NOT NULL,
-                bank_name TEXT NOT NULL,
-                pair_name TEXT NOT NULL,
-                frequency INTEGER NOT NULL,
-                patent_count INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(transaction_type, firm_name, bank_name)
-            )
-        """)
-        
-        # Add standardized name columns if they don't exist (migration support)
-        cursor.execute("PRAGMA table_info(patent_pairs)")
-        existing_columns = [row[1] for row in cursor.fetchall()]
-        
-        if 'firm_standard_name' not in existing_columns:
-            cursor.execute("ALTER TABLE patent_pairs ADD COLUMN firm_standard_name TEXT")
-            logger.info("Added firm_standard_name column to patent_pairs table")
-        
-        if 'bank_standard_name' not in existing_columns:
-            cursor.execute("ALTER TABLE patent_pairs ADD COLUMN bank_standard_name TEXT")
-            logger.info("Added bank_standard_name column to patent_pairs table")
-        
-        if 'pair_standard_name' not in existing_columns:
-            cursor.execute("ALTER TABLE patent_pairs ADD COLUMN pair_standard_name TEXT")
-            logger.info("Added pair_standard_name column to patent_pairs table")
-        
-        # Índices para mejor rendimiento
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_transaction_type ON patent_pairs(transaction_type)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_pair_name ON patent_pairs(pair_name)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_frequency ON patent_pairs(frequency DESC)
-        """)
-        
-        conn.commit()
-        conn.close()
+        """Inicializa la base de datos y crea tablas si no existen (esquema normalizado; ver patent_schema.py)"""
+        with self._connections.transaction() as conn:
+            migrated = create_patent_schema(conn)
+            if migrated:
+                logger.info(f"Converted {migrated:,} patent_pairs rows to the normalized schema")
     
     def _load_standardized_mappings(self, transaction_type: str) -> Dict[str, str]:
         """
         Load standardized name mappings for a given transaction type.
         Combines financial and non-financial mappings.
         
+        El mapeo se guarda en memoria y en disco (mapping_cache/ junto a la base de
+        datos) con el tamaño y mtime de los archivos de origen: mientras no cambien,
+        no se vuelven a leer.
+        
         Args:
             transaction_type: Transaction type ('security' or 'release')
             
         Returns:
-            Dictionary mapping original_name -> standard_name
+            Dictionary mapping original_name -> standard_name (shared with the cache: do not modify)
         """
-        mappings = {}
         base_path = Path("results/manual_review")
         
         # Files to load based on transaction type
@@ -97,56 +173,26 @@ class PatentTransactionDatabase:
             base_path / f"financial_{transaction_type}_entities_standardized.csv",
             base_path / f"non_financial_{transaction_type}_entities_standardized.csv"
         ]
+        sources = [_file_signature(file_path) for file_path in mapping_files]
         
-        conflicts = []
-        
-        for file_path in mapping_files:
-            if file_path.exists():
-                try:
-                    df = pd.read_csv(file_path)
-                    
-                    # Verify required columns exist
-                    if 'original_name' not in df.columns or 'standard_name' not in df.columns:
-                        logger.warning(f"Missing required columns in {file_path.name}. Skipping.")
-                        continue
-                    
-                    # Create mapping: original_name -> standard_name
-                    for _, row in df.iterrows():
-                        original = str(row['original_name']).strip()
-                        standard = str(row['standard_name']).strip()
-                        
-                        # Check for conflicts (name in both financial and non-financial)
-                        if original in mappings and mappings[original] != standard:
-                            conflicts.append({
-                                'name': original,
-                                'existing': mappings[original],
-                                'new': standard,
-                                'file': file_path.name
-                            })
-                            # Prioritize financial (first file) - don't overwrite
-                            continue
-                        
-                        mappings[original] = standard
-                    
-                    logger.info(f"Loaded {len(df):,} mappings from {file_path.name}")
-                    
-                except Exception as e:
-                    logger.warning(f"Error loading {file_path.name}: {e}. Continuing with other files.")
-            else:
-                logger.warning(f"Mapping file not found: {file_path}. Continuing without it.")
+        cached = _mapping_cache.get(transaction_type)
+        if cached is not None and cached[0] == sources:
+            return cached[1]
         
-        # Log conflicts if any
-        if conflicts:
-            logger.warning(f"Found {len(conflicts)} name conflicts between financial and non-financial mappings. "
-                          f"Using financial mapping (first file) for conflicts.")
-            for conflict in conflicts[:10]:  # Log first 10 conflicts
-                logger.debug(f"Conflict: '{conflict['name']}' -> existing: '{conflict['existing']}', "
-                           f"new: '{conflict['new']}' from {conflict['file']}")
+        cache_file = self.db_path.parent / "mapping_cache" / f"{transaction_type}_mappings.json"
+        mappings = _read_mapping_cache(cache_file, sources)
+        if mappings is None:
+            mappings = _parse_mapping_files(mapping_files)
+            _write_mapping_cache(cache_file, sources, mappings)
+        else:
+            logger.info(f"Loaded {len(mappings):,} cached mappings for {transaction_type} from {cache_file}")
         
+        _mapping_cache[transaction_type] = (sources, mappings)
         logger.info(f"Total mappings loaded for {transaction_type}: {len(mappings):,}")
         return mappings
     
-    def import_from_csv(self, csv_path: Path, transaction_type: str, clear_existing: bool = False, use_standardized_names: bool = True):
+    def import_from_csv(self, csv_path: Path, transaction_type: str, clear_existing: bool = False, use_standardized_names: bool = True,
+                        patent_count_mode: str = 'exact', spill_dir: Optional[Path] = None):
         """
         Importa datos desde un archivo CSV y cuenta pares (firm-bank)
         
@@ -155,10 +201,16 @@ class PatentTransactionDatabase:
             transaction_type: Tipo de transacción ('security' o 'release')
             clear_existing: Si True, borra datos existentes del mismo tipo antes de importar
             use_standardized_names: Si True, aplica mapeo de nombres estandarizados
+            patent_count_mode: Conteo de patentes distintas por par: 'exact' (runs
+                ordenados en disco) o 'hll' (HyperLogLog, aproximado); ver patent_counts.py
+            spill_dir: Directorio para los runs del modo 'exact' (por defecto, el temporal del sistema)
         """
         if transaction_type not in TRANSACTION_TYPES:
             raise ValueError(f"Invalid transaction_type: {transaction_type}. Must be one of {TRANSACTION_TYPES}")
         
+        if patent_count_mode not in PATENT_COUNT_MODES:
+            raise ValueError(f"Invalid patent_count_mode: {patent_count_mode}. Must be one of {PATENT_COUNT_MODES}")
+        
         if not csv_path.exists():
             raise FileNotFoundError(f"No se encontró el archivo: {csv_path}")
         
@@ -168,265 +220,209 @@ class PatentTransactionDatabase:
             name_mappings = self._load_standardized_mappings(transaction_type)
             print(f"  Loaded {len(name_mappings):,} standardized name mappings")
         
-        # Helper function to get standardized name
-        def get_standard_name(original_name: str) -> str:
-            original_clean = original_name.strip()
-            return name_mappings.get(original_clean, original_clean)
+        # Security: firm = or_name, bank = ee_name
+        # Release: firm = ee_name, bank = or_name (REVERSED)
+        if transaction_type == 'security':
+            firm_col, bank_col = 'or_name', 'ee_name'
+        else:
+            firm_col, bank_col = 'ee_name', 'or_name'
         
-        # Verificar columnas necesarias
+        # Verificar columnas necesarias (solo se leen estas y 'patent')
         required_cols = ['or_name', 'ee_name']
-        
-        # Leer CSV en chunks para manejar archivos grandes
+        header = pd.read_csv(csv_path, nrows=0).columns
+        missing_cols = [col for col in required_cols if col not in header]
+        if missing_cols:
+            raise ValueError(f"Faltan columnas requeridas: {missing_cols}")
+        has_patent = 'patent' in header
+        usecols = required_cols + (['patent'] if has_patent else [])
+        
+        # Leer CSV en chunks para manejar archivos grandes: la memoria depende del
+        # número de pares únicos, no del tamaño del archivo
         chunk_size = 100000
-        pairs_dict = {}
+        pairs = None
+        # Chunks aún no sumados a pairs: se combinan todos juntos cuando igualan a pairs
+        partials = []
+        buffered = 0
         total_rows = 0
         
+        # Patentes distintas por par en todo el archivo, no por chunk
+        counter = None
+        if has_patent:
+            counter = ExactDistinctCounter(spill_dir) if patent_count_mode == 'exact' else HyperLogLogCounter()
+        patent_counts = None
+        
         print(f"Processing {csv_path.name}...")
         
-        for chunk in pd.read_csv(csv_path, chunksize=chunk_size, low_memory=False):
-            # Verificar columnas
-            missing_cols = [col for col in required_cols if col not in chunk.columns]
-            if missing_cols:
-                raise ValueError(f"Faltan columnas requeridas: {missing_cols}")
-            
-            # Filtrar filas con valores nulos o vacíos
-            chunk = chunk.dropna(subset=['or_name', 'ee_name'])
-            chunk = chunk[chunk['or_name'].str.strip() != '']
-            chunk = chunk[chunk['ee_name'].str.strip() != '']
-            
-            # Agrupar por (or_name, ee_name) y contar ocurrencias
-            grouped = chunk.groupby(['or_name', 'ee_name']).size().reset_index(name='count')
-            
-            # Contar patentes únicos por par (opcional, para referencia)
-            patent_counts = chunk.groupby(['or_name', 'ee_name'])['patent'].nunique().reset_index(name='patent_count')
-            
-            # Combinar conteos
-            grouped = grouped.merge(patent_counts, on=['or_name', 'ee_name'], how='left')
-            
-            # Acumular en diccionario
-            for _, row in grouped.iterrows():
-                # Map firm and bank based on transaction type
-                # Security: firm = or_name, bank = ee_name
-                # Release: firm = ee_name, bank = or_name (REVERSED)
-                if transaction_type == 'security':
-                    firm_raw = str(row['or_name']).strip()
-                    bank_raw = str(row['ee_name']).strip()
-                else:  # release
-                    firm_raw = str(row['ee_name']).strip()
-                    bank_raw = str(row['or_name']).strip()
+        try:
+            for chunk in pd.read_csv(csv_path, chunksize=chunk_size, usecols=usecols, dtype=str):
+                firm = _strip_names(chunk[firm_col])
+                bank = _strip_names(chunk[bank_col])
                 
-                # Apply standardization if enabled
-                firm = get_standard_name(firm_raw) if use_standardized_names else firm_raw
-                bank = get_standard_name(bank_raw) if use_standardized_names else bank_raw
+                # Agrupar por (firm, bank) sobre los códigos categóricos; los grupos con
+                # un nombre nulo o vacío se descartan (dropna)
+                keys = [pd.Series(firm, index=chunk.index, name='firm_name'),
+                        pd.Series(bank, index=chunk.index, name='bank_name')]
+                partial = keys[0].groupby(keys, observed=True, sort=False).size().to_frame('frequency')
                 
-                # Create pair names (both original and standardized)
-                pair_name = f"{firm_raw} - {bank_raw}"
-                pair_standard_name = f"{firm} - {bank}" if use_standardized_names else pair_name
+                if counter is not None:
+                    counted = keys[0].notna() & keys[1].notna() & chunk['patent'].notna()
+                    counter.add(pair_keys(keys[0][counted], keys[1][counted]),
+                                value_keys(chunk.loc[counted, 'patent']))
                 
-                count = int(row['count'])
-                patent_count = int(row['patent_count']) if pd.notna(row['patent_count']) else None
+                # Índice de texto para alinear con los chunks anteriores (categorías distintas)
+                partial.index = pd.MultiIndex.from_arrays(
+                    [partial.index.get_level_values(level).astype(str) for level in range(2)],
+                    names=['firm_name', 'bank_name']
+                )
+                partials.append(partial)
+                buffered += len(partial)
+                # Combinar cuando lo acumulado iguala a los pares: costo amortizado lineal
+                if buffered >= max(0 if pairs is None else len(pairs), chunk_size):
+                    pairs = _fold_pairs(pairs, partials)
+                    partials = []
+                    buffered = 0
                 
-                # Use original pair_name as key for accumulation
-                if pair_name in pairs_dict:
-                    pairs_dict[pair_name]['frequency'] += count
-                    if patent_count is not None:
-                        if pairs_dict[pair_name]['patent_count'] is None:
-                            pairs_dict[pair_name]['patent_count'] = patent_count
-                        else:
-                            # Sumar patentes únicos (aproximación)
-                            pairs_dict[pair_name]['patent_count'] += patent_count
-                else:
-                    pairs_dict[pair_name] = {
-                        'firm_name': firm_raw,
-                        'bank_name': bank_raw,
-                        'pair_name': pair_name,
-                        'frequency': count,
-                        'patent_count': patent_count
-                    }
-                    # Add standardized names if enabled
-                    if use_standardized_names:
-                        pairs_dict[pair_name]['firm_standard_name'] = firm
-                        pairs_dict[pair_name]['bank_standard_name'] = bank
-                        pairs_dict[pair_name]['pair_standard_name'] = pair_standard_name
+                total_rows += int(partial['frequency'].sum())
+                if total_rows % 500000 == 0:
+                    print(f"  Processed {total_rows:,} rows...")
+            
+            if partials:
+                pairs = _fold_pairs(pairs, partials)
             
-            total_rows += len(chunk)
-            if total_rows % 500000 == 0:
-                print(f"  Processed {total_rows:,} rows...")
+            if counter is not None:
+                patent_counts = counter.counts()
+        finally:
+            if counter is not None:
+                counter.close()
         
-        print(f"  Total rows processed: {total_rows:,}")
-        print(f"  Unique pairs found: {len(pairs_dict):,}")
+        if pairs is None:
+            pairs = pd.DataFrame(
+                {'frequency': []},
+                index=pd.MultiIndex.from_arrays([[], []], names=['firm_name', 'bank_name'])
+            )
         
-        # Convertir a DataFrame
-        pairs_list = list(pairs_dict.values())
-        df = pd.DataFrame(pairs_list)
-        df['transaction_type'] = transaction_type
+        print(f"  Total rows processed: {total_rows:,}")
+        print(f"  Unique pairs found: {len(pairs):,}")
+        
+        # Orden por nombres: los ids de los pares no dependen del orden del archivo
+        df = pairs.sort_index().reset_index()
+        df['frequency'] = df['frequency'].astype('int64')
+        if patent_counts is not None:
+            # Pares sin ningún número de patente: 0
+            df['patent_count'] = pd.Series(pair_keys(df['firm_name'], df['bank_name'])).map(patent_counts).fillna(0).astype('int64')
+        else:
+            df['patent_count'] = None
         
-        # Ensure standardized columns exist (fill with None if not using standardization)
-        if not use_standardized_names:
+        # Apply standardization if enabled (nombres sin mapeo se conservan)
+        if use_standardized_names:
+            df['firm_standard_name'] = df['firm_name'].map(name_mappings).fillna(df['firm_name'])
+            df['bank_standard_name'] = df['bank_name'].map(name_mappings).fillna(df['bank_name'])
+        else:
             df['firm_standard_name'] = None
             df['bank_standard_name'] = None
-            df['pair_standard_name'] = None
         
-        # Conectar a base de datos
-        conn = sqlite3.connect(self.db_path)
-        
-        try:
+        # Borrado e inserción en una sola transacción
+        with self._connections.transaction() as conn:
             if clear_existing:
                 # Borrar datos existentes del mismo tipo
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM patent_pairs WHERE transaction_type = ?", (transaction_type,))
-                conn.commit()
+                conn.execute("DELETE FROM pairs WHERE transaction_type = ?", (transaction_type,))
+                prune_unused(conn)
             
-            # Insertar datos
-            df.to_sql('patent_pairs', conn, if_exists='append', index=False)
-            
-            conn.commit()
-            print(f"  Successfully imported {len(df):,} pairs to database")
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+            # Insertar datos (nombres, entidades y pares con claves enteras)
+            insert_pairs(conn, transaction_type, df)
+        
+        print(f"  Successfully imported {len(df):,} pairs to database")
     
     def migrate_existing_data(self) -> Dict:
         """
         Migrate existing database records to include standardized names.
         Updates rows where standardized names are NULL.
         
+        Cada mapeo se carga en una tabla temporal indexada y cada tipo se migra con
+        un solo UPDATE ... FROM sobre entities (el nombre estandarizado es de cada
+        entidad, no de cada par); todo en una transacción.
+        
         Returns:
             Dictionary with migration statistics
         """
         print("Starting migration of existing data to standardized names...")
         
-        # Load mappings for both transaction types
-        security_mappings = self._load_standardized_mappings('security')
-        release_mappings = self._load_standardized_mappings('release')
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        stats = {
-            'security_rows_migrated': 0,
-            'release_rows_migrated': 0,
-            'security_unmapped_firms': set(),
-            'security_unmapped_banks': set(),
-            'release_unmapped_firms': set(),
-            'release_unmapped_banks': set()
-        }
+        stats = {}
         
-        try:
-            # Process security transactions
-            cursor.execute("""
-                SELECT id, firm_name, bank_name 
-                FROM patent_pairs 
-                WHERE transaction_type = 'security' 
-                AND (firm_standard_name IS NULL OR bank_standard_name IS NULL)
+        with self._connections.transaction() as conn:
+            # Tabla temporal de la conexión: original_name -> standard_name
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS name_mappings (
+                    original_name TEXT PRIMARY KEY,
+                    standard_name TEXT NOT NULL
+                ) WITHOUT ROWID
             """)
-            security_rows = cursor.fetchall()
-            
-            print(f"Found {len(security_rows):,} security rows to migrate")
             
-            batch_size = 1000
-            for i in range(0, len(security_rows), batch_size):
-                batch = security_rows[i:i+batch_size]
-                updates = []
+            for transaction_type in TRANSACTION_TYPES:
+                mappings = self._load_standardized_mappings(transaction_type)
+                conn.execute("DELETE FROM temp.name_mappings")
+                conn.executemany("INSERT INTO temp.name_mappings VALUES (?, ?)", mappings.items())
                 
-                for row_id, firm_name, bank_name in batch:
-                    firm_std = security_mappings.get(firm_name.strip(), firm_name.strip())
-                    bank_std = security_mappings.get(bank_name.strip(), bank_name.strip())
-                    pair_std = f"{firm_std} - {bank_std}"
-                    
-                    updates.append((firm_std, bank_std, pair_std, row_id))
-                    
-                    # Track unmapped names
-                    if firm_std == firm_name.strip():
-                        stats['security_unmapped_firms'].add(firm_name.strip())
-                    if bank_std == bank_name.strip():
-                        stats['security_unmapped_banks'].add(bank_name.strip())
+                pending = "transaction_type = ? AND (firm_standard_name IS NULL OR bank_standard_name IS NULL)"
                 
-                # Batch update
-                cursor.executemany("""
-                    UPDATE patent_pairs 
-                    SET firm_standard_name = ?, 
-                        bank_standard_name = ?, 
-                        pair_standard_name = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                """, updates)
+                # Filas a migrar y nombres sin mapeo (anti-join), antes del UPDATE
+                pending_rows, unmapped_firms, unmapped_banks = conn.execute(f"""
+                    SELECT
+                        COUNT(*),
+                        COUNT(DISTINCT CASE WHEN f.original_name IS NULL THEN trim(p.firm_name) END),
+                        COUNT(DISTINCT CASE WHEN b.original_name IS NULL THEN trim(p.bank_name) END)
+                    FROM patent_pairs p
+                    LEFT JOIN temp.name_mappings f ON f.original_name = trim(p.firm_name)
+                    LEFT JOIN temp.name_mappings b ON b.original_name = trim(p.bank_name)
+                    WHERE {pending}
+                """, (transaction_type,)).fetchone()
+                stats[f'{transaction_type}_unmapped_firms_count'] = unmapped_firms
+                stats[f'{transaction_type}_unmapped_banks_count'] = unmapped_banks
                 
-                conn.commit()
-                stats['security_rows_migrated'] += len(updates)
+                conn.execute(f"""
+                    UPDATE pairs SET updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN (SELECT id FROM patent_pairs WHERE {pending})
+                """, (transaction_type,))
                 
-                if (i + batch_size) % 5000 == 0:
-                    print(f"  Migrated {stats['security_rows_migrated']:,} security rows...")
-            
-            # Process release transactions
-            cursor.execute("""
-                SELECT id, firm_name, bank_name 
-                FROM patent_pairs 
-                WHERE transaction_type = 'release' 
-                AND (firm_standard_name IS NULL OR bank_standard_name IS NULL)
-            """)
-            release_rows = cursor.fetchall()
-            
-            print(f"Found {len(release_rows):,} release rows to migrate")
-            
-            for i in range(0, len(release_rows), batch_size):
-                batch = release_rows[i:i+batch_size]
-                updates = []
-                
-                for row_id, firm_name, bank_name in batch:
-                    firm_std = release_mappings.get(firm_name.strip(), firm_name.strip())
-                    bank_std = release_mappings.get(bank_name.strip(), bank_name.strip())
-                    pair_std = f"{firm_std} - {bank_std}"
-                    
-                    updates.append((firm_std, bank_std, pair_std, row_id))
-                    
-                    # Track unmapped names
-                    if firm_std == firm_name.strip():
-                        stats['release_unmapped_firms'].add(firm_name.strip())
-                    if bank_std == bank_name.strip():
-                        stats['release_unmapped_banks'].add(bank_name.strip())
-                
-                # Batch update
-                cursor.executemany("""
-                    UPDATE patent_pairs 
-                    SET firm_standard_name = ?, 
-                        bank_standard_name = ?, 
-                        pair_standard_name = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                """, updates)
+                # Nombres sin mapeo conservan el original (sin espacios en los extremos)
+                conn.execute("""
+                    INSERT OR IGNORE INTO names (name)
+                    SELECT coalesce(m.standard_name, trim(n.name))
+                    FROM entities e
+                    JOIN names n ON n.id = e.name_id
+                    LEFT JOIN temp.name_mappings m ON m.original_name = trim(n.name)
+                    WHERE e.transaction_type = ? AND e.standard_name_id IS NULL
+                """, (transaction_type,))
+                conn.execute("""
+                    UPDATE entities
+                    SET standard_name_id = s.id
+                    FROM names n
+                    LEFT JOIN temp.name_mappings m ON m.original_name = trim(n.name)
+                    JOIN names s ON s.name = coalesce(m.standard_name, trim(n.name))
+                    WHERE entities.name_id = n.id
+                    AND entities.transaction_type = ?
+                    AND entities.standard_name_id IS NULL
+                """, (transaction_type,))
+                stats[f'{transaction_type}_rows_migrated'] = pending_rows
                 
-                conn.commit()
-                stats['release_rows_migrated'] += len(updates)
-                
-                if (i + batch_size) % 5000 == 0:
-                    print(f"  Migrated {stats['release_rows_migrated']:,} release rows...")
-            
-            print(f"Migration complete!")
-            print(f"  Security: {stats['security_rows_migrated']:,} rows migrated")
-            print(f"  Release: {stats['release_rows_migrated']:,} rows migrated")
-            print(f"  Security unmapped firms: {len(stats['security_unmapped_firms']):,}")
-            print(f"  Security unmapped banks: {len(stats['security_unmapped_banks']):,}")
-            print(f"  Release unmapped firms: {len(stats['release_unmapped_firms']):,}")
-            print(f"  Release unmapped banks: {len(stats['release_unmapped_banks']):,}")
+                print(f"  Migrated {pending_rows:,} {transaction_type} rows")
             
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+            conn.execute("DROP TABLE temp.name_mappings")
+        
+        print(f"Migration complete!")
+        for transaction_type in TRANSACTION_TYPES:
+            print(f"  {transaction_type.capitalize()}: {stats[f'{transaction_type}_rows_migrated']:,} rows migrated")
+        for transaction_type in TRANSACTION_TYPES:
+            print(f"  {transaction_type.capitalize()} unmapped firms: {stats[f'{transaction_type}_unmapped_firms_count']:,}")
+            print(f"  {transaction_type.capitalize()} unmapped banks: {stats[f'{transaction_type}_unmapped_banks_count']:,}")
         
-        # Convert sets to counts for return
         return {
             'security_rows_migrated': stats['security_rows_migrated'],
             'release_rows_migrated': stats['release_rows_migrated'],
-            'security_unmapped_firms_count': len(stats['security_unmapped_firms']),
-            'security_unmapped_banks_count': len(stats['security_unmapped_banks']),
-            'release_unmapped_firms_count': len(stats['release_unmapped_firms']),
-            'release_unmapped_banks_count': len(stats['release_unmapped_banks'])
+            'security_unmapped_firms_count': stats['security_unmapped_firms_count'],
+            'security_unmapped_banks_count': stats['security_unmapped_banks_count'],
+            'release_unmapped_firms_count': stats['release_unmapped_firms_count'],
+            'release_unmapped_banks_count': stats['release_unmapped_banks_count']
         }
     
     def get_top_pairs(self, transaction_type: str, top_n: int = 20) -> pd.DataFrame:
@@ -443,8 +439,6 @@ class PatentTransactionDatabase:
         if transaction_type not in TRANSACTION_TYPES:
             raise ValueError(f"Invalid transaction_type: {transaction_type}. Must be one of {TRANSACTION_TYPES}")
         
-        conn = sqlite3.connect(self.db_path)
-        
         query = """
             SELECT 
                 transaction_type,
@@ -462,8 +456,8 @@ class PatentTransactionDatabase:
             LIMIT ?
         """
         
-        df = pd.read_sql_query(query, conn, params=(transaction_type, top_n))
-        conn.close()
+        with self._connections.connection() as conn:
+            df = pd.read_sql_query(query, conn, params=(transaction_type, top_n))
         
         # Calcular porcentaje del total
         if len(df) > 0:
@@ -484,45 +478,43 @@ class PatentTransactionDatabase:
         Returns:
             Diccionario con estadísticas
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         stats = {}
         
-        if transaction_type:
-            if transaction_type not in TRANSACTION_TYPES:
-                raise ValueError(f"Invalid transaction_type: {transaction_type}. Must be one of {TRANSACTION_TYPES}")
-            
-            # Total de pares únicos
-            cursor.execute("""
-                SELECT COUNT(*) FROM patent_pairs WHERE transaction_type = ?
-            """, (transaction_type,))
-            stats['total_pairs'] = cursor.fetchone()[0]
-            
-            # Total de frecuencia
-            cursor.execute("""
-                SELECT SUM(frequency) FROM patent_pairs WHERE transaction_type = ?
-            """, (transaction_type,))
-            stats['total_frequency'] = cursor.fetchone()[0] or 0
-            
-            # Firmas únicas
-            cursor.execute("""
-                SELECT COUNT(DISTINCT firm_name) FROM patent_pairs WHERE transaction_type = ?
-            """, (transaction_type,))
-            stats['unique_firms'] = cursor.fetchone()[0]
-            
-            # Bancos únicos
-            cursor.execute("""
-                SELECT COUNT(DISTINCT bank_name) FROM patent_pairs WHERE transaction_type = ?
-            """, (transaction_type,))
-            stats['unique_banks'] = cursor.fetchone()[0]
+        with self._connections.connection() as conn:
+            cursor = conn.cursor()
             
-        else:
-            # Estadísticas de todos los tipos
-            for ttype in TRANSACTION_TYPES:
-                stats[ttype] = self.get_statistics(ttype)
-        
-        conn.close()
+            if transaction_type:
+                if transaction_type not in TRANSACTION_TYPES:
+                    raise ValueError(f"Invalid transaction_type: {transaction_type}. Must be one of {TRANSACTION_TYPES}")
+                
+                # Total de pares únicos
+                cursor.execute("""
+                    SELECT COUNT(*) FROM pairs WHERE transaction_type = ?
+                """, (transaction_type,))
+                stats['total_pairs'] = cursor.fetchone()[0]
+                
+                # Total de frecuencia
+                cursor.execute("""
+                    SELECT SUM(frequency) FROM pairs WHERE transaction_type = ?
+                """, (transaction_type,))
+                stats['total_frequency'] = cursor.fetchone()[0] or 0
+                
+                # Firmas únicas (una entidad por nombre y tipo)
+                cursor.execute("""
+                    SELECT COUNT(DISTINCT firm_id) FROM pairs WHERE transaction_type = ?
+                """, (transaction_type,))
+                stats['unique_firms'] = cursor.fetchone()[0]
+                
+                # Bancos únicos
+                cursor.execute("""
+                    SELECT COUNT(DISTINCT bank_id) FROM pairs WHERE transaction_type = ?
+                """, (transaction_type,))
+                stats['unique_banks'] = cursor.fetchone()[0]
+                
+            else:
+                # Estadísticas de todos los tipos
+                for ttype in TRANSACTION_TYPES:
+                    stats[ttype] = self.get_statistics(ttype)
         
         return stats
     
@@ -539,8 +531,6 @@ class PatentTransactionDatabase:
         if transaction_type not in TRANSACTION_TYPES:
             raise ValueError(f"Invalid transaction_type: {transaction_type}. Must be one of {TRANSACTION_TYPES}")
         
-        conn = sqlite3.connect(self.db_path)
-        
         query = """
             SELECT 
                 transaction_type,
@@ -557,8 +547,8 @@ class PatentTransactionDatabase:
             ORDER BY frequency DESC
         """
         
-        df = pd.read_sql_query(query, conn, params=(transaction_type,))
-        conn.close()
+        with self._connections.connection() as conn:
+            df = pd.read_sql_query(query, conn, params=(transaction_type,))
         
         # Calcular porcentaje del total
         if len(df) > 0:
@@ -596,7 +586,8 @@ class PatentTransactionDatabase:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_path = self.db_path.parent / f"patent_transactions_backup_{timestamp}.db"
         
-        shutil.copy2(self.db_path, backup_path)
+        # API de backup de SQLite: copiar el archivo omitiría lo que sigue en el WAL
+        self._connections.backup(backup_path)
         return backup_path
     
     def clear_all(self, transaction_type: Optional[str] = None):
@@ -606,16 +597,28 @@ class PatentTransactionDatabase:
         Args:
             transaction_type: Si se especifica, solo borra ese tipo. Si es None, borra todo.
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._connections.transaction() as conn:
+            if transaction_type:
+                if transaction_type not in TRANSACTION_TYPES:
+                    raise ValueError(f"Invalid transaction_type: {transaction_type}. Must be one of {TRANSACTION_TYPES}")
+                conn.execute("DELETE FROM pairs WHERE transaction_type = ?", (transaction_type,))
+            else:
+                conn.execute("DELETE FROM pairs")
+            prune_unused(conn)
+    
+    def transaction(self):
+        """
+        Transacción sobre la conexión del pool: confirma al salir, deshace si hay una excepción
         
-        if transaction_type:
-            if transaction_type not in TRANSACTION_TYPES:
-                raise ValueError(f"Invalid transaction_type: {transaction_type}. Must be one of {TRANSACTION_TYPES}")
-            cursor.execute("DELETE FROM patent_pairs WHERE transaction_type = ?", (transaction_type,))
-        else:
-            cursor.execute("DELETE FROM patent_pairs")
+        Uso: `with db.transaction() as conn: ...`
+        """
+        return self._connections.transaction()
+    
+    def close(self):
+        """
+        Cierra las conexiones del pool y vuelca el WAL al archivo de la base de datos
         
-        conn.commit()
-        conn.close()
+        Las conexiones se vuelven a abrir en el siguiente uso.
+        """
+        self._connections.close()
 
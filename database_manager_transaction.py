@@ -5,14 +5,27 @@ Sistema de base de datos SQLite para manejar cambios de manera eficiente
 para entidades separadas por tipo de transacción (Security/Release).
 """
 
-import sqlite3
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
 import json
-import re
 from typing import Optional, List, Tuple
 
+from database_connection import get_connection_manager, insert_dataframe
+from entity_stats import (check_entity_stats, create_entity_stats, deferred_entity_stats, read_entity_stats,
+                          rebuild_entity_stats)
+from entity_pages import count_entity_groups, create_entity_pages, load_entity_page
+from entity_search import create_entity_search, deferred_entity_search, search_entities
+
+# Columnas de la tabla entities que se editan desde la web app
+ENTITY_COLUMNS = ['entity_id', 'original_name', 'normalized_name', 'standard_name', 'frequency',
+                  'component_size', 'avg_similarity', 'min_similarity', 'needs_review']
+
+# Tipos con los que save_entity_changes compara las filas (needs_review se lleva a 0/1)
+ENTITY_COLUMN_DTYPES = {'entity_id': 'string', 'original_name': 'string', 'normalized_name': 'string',
+                        'standard_name': 'string', 'frequency': 'Int64', 'component_size': 'Int64',
+                        'avg_similarity': 'Float64', 'min_similarity': 'Float64'}
+
 # Entity types supported
 ENTITY_TYPES = ['financial_security', 'financial_release', 'non_financial_security', 'non_financial_release']
 
@@ -20,61 +33,73 @@ ENTITY_TYPES = ['financial_security', 'financial_release', 'non_financial_securi
 class EntityDatabaseTransaction:
     """Gestor de base de datos para entidades por transacción"""
     
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, persistent_connections: bool = True):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Conexiones persistentes (WAL) compartidas en el proceso; ver database_connection.py
+        self._connections = get_connection_manager(self.db_path, persistent=persistent_connections)
         self._init_database()
     
     def _init_database(self):
         """Inicializa la base de datos y crea tablas si no existen"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Tabla principal de entidades
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS entities (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                entity_id TEXT NOT NULL,
-                original_name TEXT NOT NULL,
-                normalized_name TEXT NOT NULL,
-                standard_name TEXT NOT NULL,
-                frequency INTEGER NOT NULL,
-                component_size INTEGER NOT NULL,
-                avg_similarity REAL,
-                min_similarity REAL,
-                needs_review BOOLEAN DEFAULT 0,
-                entity_type TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(entity_id, original_name, entity_type)
-            )
-        """)
-        
-        # Índices para mejor rendimiento
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_entity_id ON entities(entity_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_entity_type ON entities(entity_type)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_standard_name ON entities(standard_name)
-        """)
-        
-        # Tabla de historial de cambios (opcional, para auditoría)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS change_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                change_type TEXT NOT NULL,
-                entity_id TEXT,
-                details TEXT,
-                changed_by TEXT DEFAULT 'user',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        with self._connections.transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Tabla principal de entidades
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS entities (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    entity_id TEXT NOT NULL,
+                    original_name TEXT NOT NULL,
+                    normalized_name TEXT NOT NULL,
+                    standard_name TEXT NOT NULL,
+                    frequency INTEGER NOT NULL,
+                    component_size INTEGER NOT NULL,
+                    avg_similarity REAL,
+                    min_similarity REAL,
+                    needs_review BOOLEAN DEFAULT 0,
+                    entity_type TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(entity_id, original_name, entity_type)
+                )
+            """)
+            
+            # Índices para mejor rendimiento
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_entity_id ON entities(entity_id)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_entity_type ON entities(entity_type)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_standard_name ON entities(standard_name)
+            """)
+            # Búsqueda por nombre original dentro de un tipo (guardado incremental)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_type_original_name ON entities(entity_type, original_name)
+            """)
+            
+            # Tabla de historial de cambios (opcional, para auditoría)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS change_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    change_type TEXT NOT NULL,
+                    entity_id TEXT,
+                    details TEXT,
+                    changed_by TEXT DEFAULT 'user',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Estadísticas por tipo mantenidas por triggers (ver entity_stats.py)
+            create_entity_stats(conn)
+            
+            # entity_num, índice de páginas y vista entity_summary (ver entity_pages.py)
+            create_entity_pages(conn)
+            
+            # Índice FTS5 trigram para la búsqueda por subcadena (ver entity_search.py)
+            create_entity_search(conn)
     
     def import_from_csv(self, csv_path: Path, entity_type: str, clear_existing: bool = False):
         """
@@ -99,14 +124,12 @@ class EntityDatabaseTransaction:
         if missing_cols:
             raise ValueError(f"Faltan columnas requeridas: {missing_cols}")
         
-        conn = sqlite3.connect(self.db_path)
-        
-        try:
+        with self._connections.transaction() as conn, deferred_entity_stats(conn, entity_type), \
+                deferred_entity_search(conn):
             if clear_existing:
                 # Borrar datos existentes del mismo tipo
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM entities WHERE entity_type = ?", (entity_type,))
-                conn.commit()
             
             # Limpiar valores nulos en columnas requeridas
             df['original_name'] = df['original_name'].fillna('').astype(str)
@@ -137,15 +160,7 @@ class EntityDatabaseTransaction:
             df['component_size'] = df.get('component_size', 1)
             
             # Insertar datos
-            df.to_sql('entities', conn, if_exists='append', index=False)
-            
-            conn.commit()
-            
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+            insert_dataframe(conn, 'entities', df)
     
     def load_entities(self, entity_type: str) -> pd.DataFrame:
         """
@@ -160,8 +175,6 @@ class EntityDatabaseTransaction:
         if entity_type not in ENTITY_TYPES:
             raise ValueError(f"Invalid entity_type: {entity_type}. Must be one of {ENTITY_TYPES}")
         
-        conn = sqlite3.connect(self.db_path)
-        
         query = """
             SELECT 
                 entity_id,
@@ -175,23 +188,12 @@ class EntityDatabaseTransaction:
                 CASE WHEN needs_review = 1 THEN 1 ELSE 0 END as needs_review
             FROM entities
             WHERE entity_type = ?
+            ORDER BY entity_num, entity_id, frequency DESC
         """
         
-        df = pd.read_sql_query(query, conn, params=(entity_type,))
-        conn.close()
-        
-        # Sort entity_id numerically instead of lexicographically
-        def extract_numeric_key(entity_id):
-            """Extract numeric part for sorting"""
-            match = re.search(r'_(\d+)$', str(entity_id))
-            if match:
-                return int(match.group(1))
-            return 0
-        
-        # Sort by entity_id numerically, then by frequency descending
-        df['_sort_key'] = df['entity_id'].apply(extract_numeric_key)
-        df = df.sort_values(by=['_sort_key', 'frequency'], ascending=[True, False])
-        df = df.drop(columns=['_sort_key'])
+        # Orden numérico de entity_id por entity_num, resuelto con idx_entity_page
+        with self._connections.connection() as conn:
+            df = pd.read_sql_query(query, conn, params=(entity_type,))
         
         return df
     
@@ -206,10 +208,10 @@ class EntityDatabaseTransaction:
         if entity_type not in ENTITY_TYPES:
             raise ValueError(f"Invalid entity_type: {entity_type}. Must be one of {ENTITY_TYPES}")
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
+        with self._connections.transaction() as conn, deferred_entity_stats(conn, entity_type), \
+                deferred_entity_search(conn):
+            cursor = conn.cursor()
+            
             # Borrar entidades existentes del tipo
             cursor.execute("DELETE FROM entities WHERE entity_type = ?", (entity_type,))
             
@@ -219,18 +221,167 @@ class EntityDatabaseTransaction:
                 df['needs_review'] = df['needs_review'].astype(int)
             else:
                 df['needs_review'] = 0
-            df['updated_at'] = datetime.now()
+            df['updated_at'] = str(datetime.now())
             
             # Insertar datos actualizados
-            df.to_sql('entities', conn, if_exists='append', index=False)
+            insert_dataframe(conn, 'entities', df)
+    
+    def load_entity_page(self, entity_type: str, after: Optional[tuple] = None, limit: int = 25,
+                         filters: Optional[dict] = None, sort: str = 'entity_num',
+                         offset: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame, Optional[tuple]]:
+        """
+        Carga una página de grupos (paginación por clave, ver entity_pages.py)
+        
+        Args:
+            entity_type: Tipo de entidad
+            after: Cursor devuelto por la página anterior (None para la primera)
+            limit: Grupos por página
+            filters: min_names, max_names, needs_review y/o search
+            sort: 'entity_num', 'total_frequency' o 'names_count'
+            offset: Grupos a saltar después del cursor (saltos a páginas sin cursor)
+            
+        Returns:
+            Tupla (resumen de los grupos, nombres de esos grupos, cursor de la página siguiente)
+        """
+        if entity_type not in ENTITY_TYPES:
+            raise ValueError(f"Invalid entity_type: {entity_type}. Must be one of {ENTITY_TYPES}")
+        
+        with self._connections.connection() as conn:
+            return load_entity_page(conn, entity_type, after=after, limit=limit, filters=filters,
+                                    sort=sort, offset=offset)
+    
+    def count_entity_groups(self, entity_type: str, filters: Optional[dict] = None) -> int:
+        """
+        Cuenta los grupos de un tipo que cumplen los filtros de load_entity_page
+        
+        Args:
+            entity_type: Tipo de entidad
+            filters: min_names, max_names, needs_review y/o search
+            
+        Returns:
+            Número de grupos
+        """
+        if entity_type not in ENTITY_TYPES:
+            raise ValueError(f"Invalid entity_type: {entity_type}. Must be one of {ENTITY_TYPES}")
+        
+        with self._connections.connection() as conn:
+            return count_entity_groups(conn, entity_type, filters)
+    
+    def search_entities(self, entity_type: str, query: str, limit: int = 25, offset: int = 0) -> pd.DataFrame:
+        """
+        Busca entidades por subcadena con el índice FTS5 (ver entity_search.py)
+        
+        Args:
+            entity_type: Tipo de entidad
+            query: Texto a buscar en original_name, normalized_name, entity_id o
+                   standard_name (al menos 3 caracteres, sin distinguir mayúsculas)
+            limit: Número máximo de entidades
+            offset: Entidades a saltar
+            
+        Returns:
+            DataFrame con entity_id, matched_names y score, ordenado por relevancia
+        """
+        if entity_type not in ENTITY_TYPES:
+            raise ValueError(f"Invalid entity_type: {entity_type}. Must be one of {ENTITY_TYPES}")
+        
+        with self._connections.connection() as conn:
+            return search_entities(conn, entity_type, query, limit=limit, offset=offset)
+    
+    def save_entity_changes(self, df_original: pd.DataFrame, df_edited: pd.DataFrame,
+                            entity_type: str) -> dict:
+        """
+        Guarda solo las filas que cambiaron entre df_original y df_edited
+        
+        Las filas se identifican por original_name y se comparan por hash de sus
+        columnas (pd.util.hash_pandas_object), así que el costo depende del tamaño
+        de la edición y no del de la tabla. Si original_name no es único en alguno
+        de los dos DataFrames se reescribe el tipo completo con update_entities.
+        
+        Args:
+            df_original: DataFrame tal como se cargó (o se guardó por última vez)
+            df_edited: DataFrame con las ediciones
+            entity_type: Tipo de entidad
             
-            conn.commit()
+        Returns:
+            Diccionario con 'updated', 'deleted' y 'full_rewrite'
+        """
+        if (df_original['original_name'].duplicated().any() or
+                df_edited['original_name'].duplicated().any()):
+            self.update_entities(df_edited.copy(), entity_type)
+            return {'updated': len(df_edited), 'deleted': 0, 'full_rewrite': True}
+        
+        columns = [col for col in ENTITY_COLUMNS if col in df_edited.columns]
+        
+        def row_hashes(df):
+            """Hash de cada fila indexado por original_name"""
+            # El hash incluye el dtype: un NaN en needs_review lo vuelve float64 y
+            # marcaría como cambiadas filas iguales, así que se fijan los tipos
+            compared = df.reindex(columns=columns)
+            for col in columns:
+                if col == 'needs_review':
+                    compared[col] = compared[col].fillna(0).astype(int)
+                elif col in ENTITY_COLUMN_DTYPES:
+                    compared[col] = compared[col].astype(ENTITY_COLUMN_DTYPES[col])
+            hashes = pd.util.hash_pandas_object(compared, index=False, categorize=False)
+            return pd.Series(hashes.values, index=df['original_name'].values)
+        
+        original_hash = row_hashes(df_original)
+        edited_hash = row_hashes(df_edited)
+        
+        # Filas nuevas o con algún valor distinto, y nombres que ya no están
+        changed = ~edited_hash.eq(original_hash.reindex(edited_hash.index)).values
+        deleted = original_hash.index.difference(edited_hash.index).tolist()
+        
+        self.apply_entity_changes(df_edited.loc[changed, columns], deleted, entity_type)
+        return {'updated': int(changed.sum()), 'deleted': len(deleted), 'full_rewrite': False}
+    
+    def apply_entity_changes(self, rows: pd.DataFrame, deleted_names: List[str], entity_type: str):
+        """
+        Aplica un conjunto de cambios fila a fila en una sola transacción
+        
+        Args:
+            rows: Filas nuevas o modificadas (identificadas por original_name)
+            deleted_names: Nombres originales a borrar
+            entity_type: Tipo de entidad
+        """
+        if entity_type not in ENTITY_TYPES:
+            raise ValueError(f"Invalid entity_type: {entity_type}. Must be one of {ENTITY_TYPES}")
+        
+        columns = [col for col in ENTITY_COLUMNS if col in rows.columns and col != 'original_name']
+        rows = rows.copy()
+        if 'needs_review' in rows.columns:
+            rows['needs_review'] = rows['needs_review'].fillna(0).astype(int)
+        # sqlite3 no acepta tipos de numpy ni NaN
+        values = rows[columns + ['original_name']].astype(object)
+        values = values.where(values.notna(), None).values.tolist()
+        updated_at = str(datetime.now())
+        
+        with self._connections.transaction() as conn:
+            cursor = conn.cursor()
             
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+            if deleted_names:
+                cursor.executemany(
+                    "DELETE FROM entities WHERE entity_type = ? AND original_name = ?",
+                    [(entity_type, name) for name in deleted_names]
+                )
+            
+            if values:
+                assignments = ', '.join(f"{col} = ?" for col in columns)
+                cursor.executemany(
+                    f"UPDATE entities SET {assignments}, updated_at = ? "
+                    f"WHERE entity_type = ? AND original_name = ?",
+                    [row[:-1] + [updated_at, entity_type, row[-1]] for row in values]
+                )
+                
+                # Nombres que aún no existen en la base de datos
+                insert_columns = columns + ['original_name', 'entity_type', 'updated_at']
+                placeholders = ', '.join('?' for _ in insert_columns)
+                cursor.executemany(
+                    f"INSERT INTO entities ({', '.join(insert_columns)}) "
+                    f"SELECT {placeholders} WHERE NOT EXISTS ("
+                    f"SELECT 1 FROM entities WHERE entity_type = ? AND original_name = ?)",
+                    [row + [entity_type, updated_at, entity_type, row[-1]] for row in values]
+                )
     
     def add_change_history(self, change_type: str, entity_id: Optional[str] = None, 
                           details: Optional[dict] = None):
@@ -242,18 +393,13 @@ class EntityDatabaseTransaction:
             entity_id: ID de entidad afectada
             details: Detalles del cambio como diccionario
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         details_json = json.dumps(details) if details else None
         
-        cursor.execute("""
-            INSERT INTO change_history (change_type, entity_id, details)
-            VALUES (?, ?, ?)
-        """, (change_type, entity_id, details_json))
-        
-        conn.commit()
-        conn.close()
+        with self._connections.transaction() as conn:
+            conn.execute("""
+                INSERT INTO change_history (change_type, entity_id, details)
+                VALUES (?, ?, ?)
+            """, (change_type, entity_id, details_json))
     
     def get_change_history(self, limit: int = 50) -> pd.DataFrame:
         """
@@ -265,8 +411,6 @@ class EntityDatabaseTransaction:
         Returns:
             DataFrame con el historial
         """
-        conn = sqlite3.connect(self.db_path)
-        
         query = """
             SELECT 
                 change_type,
@@ -279,8 +423,8 @@ class EntityDatabaseTransaction:
             LIMIT ?
         """
         
-        df = pd.read_sql_query(query, conn, params=(limit,))
-        conn.close()
+        with self._connections.connection() as conn:
+            df = pd.read_sql_query(query, conn, params=(limit,))
         
         return df
     
@@ -310,39 +454,24 @@ class EntityDatabaseTransaction:
         if entity_type not in ENTITY_TYPES:
             raise ValueError(f"Invalid entity_type: {entity_type}. Must be one of {ENTITY_TYPES}")
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        stats = {}
-        
-        # Total de nombres
-        cursor.execute("""
-            SELECT COUNT(*) FROM entities WHERE entity_type = ?
-        """, (entity_type,))
-        stats['total_names'] = cursor.fetchone()[0]
-        
-        # Total de entidades únicas
-        cursor.execute("""
-            SELECT COUNT(DISTINCT entity_id) FROM entities WHERE entity_type = ?
-        """, (entity_type,))
-        stats['unique_entities'] = cursor.fetchone()[0]
-        
-        # Tamaño promedio de grupos
-        cursor.execute("""
-            SELECT AVG(component_size) FROM entities WHERE entity_type = ?
-        """, (entity_type,))
-        stats['avg_group_size'] = cursor.fetchone()[0] or 0
-        
-        # Grupos grandes
-        cursor.execute("""
-            SELECT COUNT(DISTINCT entity_id) FROM entities 
-            WHERE entity_type = ? AND component_size > 20
-        """, (entity_type,))
-        stats['large_groups'] = cursor.fetchone()[0]
-        
-        conn.close()
+        with self._connections.connection() as conn:
+            return read_entity_stats(conn, entity_type)
+    
+    def check_statistics(self, repair: bool = False) -> List[str]:
+        """
+        Compara las estadísticas materializadas con un recálculo completo
         
-        return stats
+        Args:
+            repair: Si True y hay diferencias, reconstruye el resumen
+            
+        Returns:
+            Lista de diferencias encontradas (vacía si coinciden)
+        """
+        with self._connections.transaction() as conn:
+            differences = check_entity_stats(conn)
+            if differences and repair:
+                rebuild_entity_stats(conn)
+        return differences
     
     def backup_database(self, backup_path: Optional[Path] = None) -> Path:
         """
@@ -355,13 +484,12 @@ class EntityDatabaseTransaction:
         Returns:
             Ruta del archivo de backup creado
         """
-        import shutil
-        
         if backup_path is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_path = self.db_path.parent / f"entities_by_transaction_backup_{timestamp}.db"
         
-        shutil.copy2(self.db_path, backup_path)
+        # API de backup de SQLite: copiar el archivo omitiría lo que sigue en el WAL
+        self._connections.backup(backup_path)
         return backup_path
     
     def clear_all(self, entity_type: Optional[str] = None):
@@ -371,16 +499,28 @@ class EntityDatabaseTransaction:
         Args:
             entity_type: Si se especifica, solo borra ese tipo. Si es None, borra todo.
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._connections.transaction() as conn, deferred_entity_stats(conn, entity_type), \
+                deferred_entity_search(conn):
+            if entity_type:
+                if entity_type not in ENTITY_TYPES:
+                    raise ValueError(f"Invalid entity_type: {entity_type}. Must be one of {ENTITY_TYPES}")
+                conn.execute("DELETE FROM entities WHERE entity_type = ?", (entity_type,))
+            else:
+                conn.execute("DELETE FROM entities")
+    
+    def transaction(self):
+        """
+        Transacción sobre la conexión del pool: confirma al salir, deshace si hay una excepción
         
-        if entity_type:
-            if entity_type not in ENTITY_TYPES:
-                raise ValueError(f"Invalid entity_type: {entity_type}. Must be one of {ENTITY_TYPES}")
-            cursor.execute("DELETE FROM entities WHERE entity_type = ?", (entity_type,))
-        else:
-            cursor.execute("DELETE FROM entities")
+        Uso: `with db.transaction() as conn: ...`
+        """
+        return self._connections.transaction()
+    
+    def close(self):
+        """
+        Cierra las conexiones del pool y vuelca el WAL al archivo de la base de datos
         
-        conn.commit()
-        conn.close()
+        Las conexiones se vuelven a abrir en el siguiente uso.
+        """
+        self._connections.close()
 
@@ -0,0 +1,216 @@
+"""
+Paginación de Grupos de Entidades
+=================================
+Carga por páginas de los grupos (entity_id) de un tipo de entidad, ordenada y
+filtrada en SQLite en lugar de en pandas. La usan EntityDatabase y
+EntityDatabaseTransaction (load_entity_page, count_entity_groups).
+
+- entity_num: columna generada con el sufijo numérico de entity_id
+  ('financial_123' -> 123), para ordenar numéricamente sin regex en Python
+- idx_entity_page: índice (entity_type, entity_num, entity_id, frequency DESC).
+  Con el orden por entity_num, una página recorre solo sus filas del índice
+  (paginación por clave: la página siguiente empieza después del último grupo
+  de la anterior, sin OFFSET)
+- entity_summary: vista con un resumen por grupo (nombres, frecuencia total,
+  nombre estándar, similitud promedio, revisión)
+
+Los órdenes por frecuencia total o número de nombres dependen de agregados, así
+que esas páginas agregan el tipo completo en SQLite (sin índice que los cubra).
+"""
+
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# Sufijo numérico de entity_id (los prefijos son letras y guiones bajos); 0 si no hay
+ENTITY_NUM_SQL = ("CAST(ltrim(entity_id, 'abcdefghijklmnopqrstuvwxyz"
+                  "ABCDEFGHIJKLMNOPQRSTUVWXYZ_') AS INTEGER)")
+
+# Resumen por grupo. Con un único MAX(), SQLite toma standard_name de la fila más
+# frecuente (el mismo que muestra la web app: primer nombre del grupo)
+_GROUP_COLUMNS = """
+        entity_num,
+        entity_id,
+        COUNT(*) AS names_count,
+        SUM(frequency) AS total_frequency,
+        standard_name,
+        MAX(frequency) AS max_frequency,
+        AVG(avg_similarity) AS avg_similarity,
+        SUM(needs_review) > 0 AS needs_review
+"""
+
+SUMMARY_VIEW = f"""
+    CREATE VIEW IF NOT EXISTS entity_summary AS
+    SELECT entity_type, {_GROUP_COLUMNS}
+    FROM entities
+    GROUP BY entity_type, entity_num, entity_id
+"""
+
+# Columnas de clave de cada orden (la última combinación es única por grupo)
+SORT_KEYS = {
+    'entity_num': [('entity_num', 'ASC'), ('entity_id', 'ASC')],
+    'total_frequency': [('total_frequency', 'DESC'), ('entity_num', 'ASC'), ('entity_id', 'ASC')],
+    'names_count': [('names_count', 'DESC'), ('entity_num', 'ASC'), ('entity_id', 'ASC')],
+}
+
+NAME_COLUMNS = """
+        entity_id,
+        original_name,
+        normalized_name,
+        standard_name,
+        frequency,
+        component_size,
+        avg_similarity,
+        min_similarity,
+        CASE WHEN needs_review = 1 THEN 1 ELSE 0 END as needs_review
+"""
+
+
+def create_entity_pages(conn: sqlite3.Connection):
+    """Agrega entity_num (bases anteriores), el índice de páginas y la vista entity_summary"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_xinfo(entities)")}
+    if 'entity_num' not in columns:
+        # Columna virtual: se calcula de entity_id, no cambia ningún INSERT existente
+        conn.execute(f"ALTER TABLE entities ADD COLUMN entity_num INTEGER "
+                     f"GENERATED ALWAYS AS ({ENTITY_NUM_SQL}) VIRTUAL")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_entity_page
+        ON entities(entity_type, entity_num, entity_id, frequency DESC)
+    """)
+    conn.execute(SUMMARY_VIEW)
+
+
+def _filter_clauses(filters: Optional[Dict]) -> Tuple[List[str], List]:
+    """
+    Condiciones HAVING de los filtros de grupo
+
+    Filtros soportados: min_names, max_names, needs_review (True: solo grupos
+    marcados) y search (subcadena de entity_id o del nombre estándar, sin
+    distinguir mayúsculas).
+    """
+    filters = filters or {}
+    clauses, params = [], []
+    if filters.get('min_names') is not None:
+        clauses.append("COUNT(*) >= ?")
+        params.append(filters['min_names'])
+    if filters.get('max_names') is not None:
+        clauses.append("COUNT(*) <= ?")
+        params.append(filters['max_names'])
+    if filters.get('needs_review'):
+        clauses.append("SUM(needs_review) > 0")
+    if filters.get('search'):
+        # Búsqueda literal: % y _ del texto no son comodines
+        escaped = filters['search'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f"%{escaped}%"
+        clauses.append("(entity_id LIKE ? ESCAPE '\\' OR standard_name LIKE ? ESCAPE '\\')")
+        params.extend([pattern, pattern])
+    return clauses, params
+
+
+def _after_clause(sort: str, after: tuple) -> Tuple[str, List]:
+    """Condición de clave: grupos que van después de `after` en el orden `sort`"""
+    keys = SORT_KEYS[sort]
+    alternatives, params = [], []
+    for i, (column, direction) in enumerate(keys):
+        terms = [f"{prev} = ?" for prev, _ in keys[:i]]
+        terms.append(f"{column} {'>' if direction == 'ASC' else '<'} ?")
+        alternatives.append("(" + " AND ".join(terms) + ")")
+        params.extend(list(after[:i]) + [after[i]])
+    return "(" + " OR ".join(alternatives) + ")", params
+
+
+def load_entity_page(conn: sqlite3.Connection, entity_type: str, after: Optional[tuple] = None,
+                     limit: int = 25, filters: Optional[Dict] = None, sort: str = 'entity_num',
+                     offset: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame, Optional[tuple]]:
+    """
+    Carga una página de grupos y los nombres de esos grupos
+
+    Args:
+        conn: Conexión a la base de datos
+        entity_type: Tipo de entidad
+        after: Cursor devuelto por la página anterior (None para la primera)
+        limit: Grupos por página
+        filters: Filtros de grupo (ver _filter_clauses)
+        sort: 'entity_num', 'total_frequency' o 'names_count'
+        offset: Grupos a saltar después del cursor (para saltar a una página
+            sin cursor conocido; la navegación secuencial no lo necesita)
+
+    Returns:
+        Tupla (grupos, nombres, cursor siguiente). grupos tiene una fila por
+        grupo en el orden de la página; nombres, las filas de esos grupos en el
+        mismo orden (frecuencia descendente dentro del grupo); el cursor es None
+        en la última página.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Invalid sort: {sort}. Must be one of {list(SORT_KEYS)}")
+
+    where, params = ["entity_type = ?"], [entity_type]
+    having, having_params = _filter_clauses(filters)
+    if after is not None:
+        if sort == 'entity_num':
+            # Rango sobre el índice: la consulta empieza en el último grupo de la página anterior
+            where.append("entity_num >= ?")
+            params.append(after[0])
+        clause, clause_params = _after_clause(sort, after)
+        having.append(clause)
+        having_params.extend(clause_params)
+
+    order = ", ".join(f"{column} {direction}" for column, direction in SORT_KEYS[sort])
+    query = f"""
+        SELECT {_GROUP_COLUMNS}
+        FROM entities
+        WHERE {' AND '.join(where)}
+        GROUP BY entity_num, entity_id
+        {'HAVING ' + ' AND '.join(having) if having else ''}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+    """
+    # Un grupo de más para saber si hay página siguiente
+    groups = pd.read_sql_query(query, conn, params=params + having_params + [limit + 1, offset])
+    has_next = len(groups) > limit
+    groups = groups.head(limit)
+
+    next_cursor = None
+    if has_next:
+        # astype(object): valores de Python, no de numpy (sqlite3 no los acepta)
+        key_columns = [column for column, _ in SORT_KEYS[sort]]
+        next_cursor = tuple(groups[key_columns].astype(object).iloc[-1])
+
+    entity_ids = groups['entity_id'].tolist()
+    if entity_ids:
+        placeholders = ', '.join('?' for _ in entity_ids)
+        # '+entity_type' descarta su índice: la búsqueda va por idx_entity_id
+        names = pd.read_sql_query(f"""
+            SELECT {NAME_COLUMNS}
+            FROM entities
+            WHERE +entity_type = ? AND entity_id IN ({placeholders})
+            ORDER BY frequency DESC
+        """, conn, params=[entity_type] + entity_ids)
+        # Orden de la página; sort estable conserva la frecuencia descendente
+        position = {entity_id: i for i, entity_id in enumerate(entity_ids)}
+        names = names.sort_values('entity_id', key=lambda ids: ids.map(position), kind='stable')
+        names = names.reset_index(drop=True)
+    else:
+        names = pd.read_sql_query(f"SELECT {NAME_COLUMNS} FROM entities WHERE 0", conn)
+
+    return groups, names, next_cursor
+
+
+def count_entity_groups(conn: sqlite3.Connection, entity_type: str, filters: Optional[Dict] = None) -> int:
+    """Número de grupos de un tipo que cumplen los filtros"""
+    having, params = _filter_clauses(filters)
+    if not having:
+        # Sin filtros coincide con el resumen materializado (entity_stats)
+        row = conn.execute("SELECT unique_entities FROM entity_stats WHERE entity_type = ?",
+                           (entity_type,)).fetchone()
+        return row[0] if row else 0
+    return conn.execute(f"""
+        SELECT COUNT(*) FROM (
+            SELECT entity_id, standard_name, MAX(frequency)
+            FROM entities
+            WHERE entity_type = ?
+            GROUP BY entity_num, entity_id
+            HAVING {' AND '.join(having)}
+        )
+    """, [entity_type] + params).fetchone()[0]
@@ -0,0 +1,143 @@
+"""
+Búsqueda de Texto Completo de Entidades
+=======================================
+Índice FTS5 (entities_fts) sobre original_name, normalized_name, entity_id y
+standard_name de la tabla entities, con el tokenizador trigram: cualquier
+subcadena de 3 o más caracteres se resuelve con el índice, sin distinguir
+mayúsculas, en lugar de recorrer todos los nombres.
+
+entities_fts es una tabla de contenido externo (content='entities'): guarda solo
+el índice y lee el texto de entities. Los triggers de abajo la mantienen al día
+en cada INSERT, UPDATE y DELETE. Las cargas masivas usan deferred_entity_search:
+quitan los triggers dentro de su transacción y reconstruyen el índice una vez al
+final (mantenerlo fila a fila multiplica por cuatro el tiempo de importación).
+Una base sin índice o sin triggers se indexa completa al abrirse.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+import pandas as pd
+
+from database_connection import execute_script
+
+# Longitud mínima de búsqueda: el tokenizador trigram indexa grupos de 3 caracteres
+MIN_QUERY_LENGTH = 3
+
+# Columnas indexadas
+SEARCH_COLUMNS = ['original_name', 'normalized_name', 'entity_id', 'standard_name']
+
+_COLUMNS = ', '.join(SEARCH_COLUMNS)
+_NEW_VALUES = ', '.join(f'NEW.{column}' for column in SEARCH_COLUMNS)
+_OLD_VALUES = ', '.join(f'OLD.{column}' for column in SEARCH_COLUMNS)
+
+TRIGGER_NAMES = ['entities_fts_insert', 'entities_fts_delete', 'entities_fts_update']
+
+SCHEMA = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS entities_fts USING fts5(
+        {_COLUMNS},
+        content = 'entities',
+        content_rowid = 'id',
+        tokenize = 'trigram'
+    );
+"""
+
+TRIGGERS = f"""
+    CREATE TRIGGER IF NOT EXISTS entities_fts_insert AFTER INSERT ON entities
+    BEGIN
+        INSERT INTO entities_fts (rowid, {_COLUMNS}) VALUES (NEW.id, {_NEW_VALUES});
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS entities_fts_delete AFTER DELETE ON entities
+    BEGIN
+        INSERT INTO entities_fts (entities_fts, rowid, {_COLUMNS}) VALUES ('delete', OLD.id, {_OLD_VALUES});
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS entities_fts_update
+    AFTER UPDATE OF {_COLUMNS} ON entities
+    BEGIN
+        INSERT INTO entities_fts (entities_fts, rowid, {_COLUMNS}) VALUES ('delete', OLD.id, {_OLD_VALUES});
+        INSERT INTO entities_fts (rowid, {_COLUMNS}) VALUES (NEW.id, {_NEW_VALUES});
+    END;
+"""
+
+
+def create_entity_search(conn: sqlite3.Connection):
+    """
+    Crea entities_fts y sus triggers
+
+    Si faltaba alguno (base anterior a entities_fts o carga masiva interrumpida),
+    el índice se reconstruye.
+    """
+    present = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE 'entities_fts%'"
+    )}
+    execute_script(conn, SCHEMA + TRIGGERS)
+    if not present.issuperset(['entities_fts', *TRIGGER_NAMES]):
+        rebuild_entity_search(conn)
+
+
+def rebuild_entity_search(conn: sqlite3.Connection):
+    """Reconstruye entities_fts desde la tabla entities"""
+    conn.execute("INSERT INTO entities_fts (entities_fts) VALUES ('rebuild')")
+
+
+@contextmanager
+def deferred_entity_search(conn: sqlite3.Connection) -> Iterator[None]:
+    """
+    Quita los triggers de entities_fts durante una carga masiva y reconstruye el índice al final
+
+    Igual que deferred_entity_stats: el DDL es transaccional, así que un rollback
+    de la carga restaura los triggers.
+    """
+    execute_script(conn, ''.join(f"DROP TRIGGER IF EXISTS {name};\n" for name in TRIGGER_NAMES))
+    yield
+    execute_script(conn, TRIGGERS)
+    rebuild_entity_search(conn)
+
+
+def match_expression(query: str) -> str:
+    """
+    Expresión MATCH que busca `query` como subcadena literal
+
+    Con trigram, una frase entre comillas coincide con cualquier texto que la
+    contenga; las comillas internas se duplican.
+    """
+    return '"' + query.replace('"', '""') + '"'
+
+
+def search_entities(conn: sqlite3.Connection, entity_type: str, query: str, limit: int = 25,
+                    offset: int = 0) -> pd.DataFrame:
+    """
+    Entidades con algún nombre, entity_id o nombre estándar que contiene `query`
+
+    Args:
+        conn: Conexión a la base de datos
+        entity_type: Tipo de entidad
+        query: Texto a buscar (al menos MIN_QUERY_LENGTH caracteres)
+        limit: Número máximo de entidades
+        offset: Entidades a saltar (paginación de resultados)
+
+    Returns:
+        DataFrame con entity_id, matched_names (nombres que coinciden) y score
+        (bm25 del mejor nombre; menor es mejor), ordenado por relevancia
+    """
+    if len(query) < MIN_QUERY_LENGTH:
+        raise ValueError(f"Search query must have at least {MIN_QUERY_LENGTH} characters")
+
+    # rank (bm25) solo está disponible en la consulta FTS; la agregación va afuera
+    return pd.read_sql_query("""
+        SELECT
+            e.entity_id,
+            COUNT(*) AS matched_names,
+            MIN(m.rank) AS score
+        FROM (
+            SELECT rowid, rank FROM entities_fts WHERE entities_fts MATCH ?
+        ) m
+        JOIN entities e ON e.id = m.rowid
+        WHERE e.entity_type = ?
+        GROUP BY e.entity_id
+        ORDER BY score, MIN(e.entity_num), e.entity_id
+        LIMIT ? OFFSET ?
+    """, conn, params=(match_expression(query), entity_type, limit, offset))
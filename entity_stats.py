@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Estadísticas Materializadas de Entidades
+========================================
+Tabla entity_stats con un resumen por entity_type (total de nombres, entidades
+únicas, suma de component_size y grupos grandes), mantenida por triggers sobre
+la tabla entities. get_statistics de EntityDatabase y EntityDatabaseTransaction
+lee una sola fila por clave primaria en lugar de recorrer la partición del tipo
+con cuatro agregados.
+
+Los conteos distintos (entidades únicas, grupos grandes) necesitan saber cuántos
+nombres quedan en cada entidad, así que los triggers mantienen además
+entity_group_counts: nombres por (entity_type, entity_id) y cuántos de ellos
+tienen component_size > LARGE_GROUP_SIZE.
+
+Las cargas masivas (import_from_csv, la reescritura completa de update_entities,
+clear_all) envuelven su trabajo en deferred_entity_stats: los triggers se quitan
+dentro de la transacción y el resumen del tipo se recalcula una vez al final, en
+lugar de fila a fila (con los triggers activos la carga tarda el doble). Si la
+base se abre sin triggers (carga interrumpida), el resumen se reconstruye.
+
+Si el resumen se desincroniza (p. ej. una base editada con una versión anterior
+sin triggers), check_entity_stats lo compara con un recálculo completo y
+rebuild_entity_stats lo reconstruye.
+
+Uso:
+    python entity_stats.py database/entities.db            # Verifica el resumen
+    python entity_stats.py database/entities.db --repair   # Lo reconstruye si difiere
+"""
+
+import argparse
+import sqlite3
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from database_connection import execute_script
+
+# Un grupo es grande si su component_size supera este valor
+LARGE_GROUP_SIZE = 20
+
+STAT_COLUMNS = ['total_names', 'unique_entities', 'component_size_sum', 'large_groups']
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entity_stats (
+        entity_type TEXT PRIMARY KEY,
+        total_names INTEGER NOT NULL DEFAULT 0,
+        unique_entities INTEGER NOT NULL DEFAULT 0,
+        component_size_sum INTEGER NOT NULL DEFAULT 0,
+        large_groups INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS entity_group_counts (
+        entity_type TEXT NOT NULL,
+        entity_id TEXT NOT NULL,
+        names INTEGER NOT NULL DEFAULT 0,
+        large_names INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (entity_type, entity_id)
+    ) WITHOUT ROWID;
+"""
+
+TRIGGER_NAMES = ['entity_stats_insert', 'entity_stats_delete', 'entity_stats_update']
+
+# Alta de una fila (NEW) en el resumen
+_ADD_ROW = f"""
+        INSERT OR IGNORE INTO entity_stats (entity_type) VALUES (NEW.entity_type);
+        INSERT OR IGNORE INTO entity_group_counts (entity_type, entity_id)
+        VALUES (NEW.entity_type, NEW.entity_id);
+        UPDATE entity_stats SET
+            total_names = total_names + 1,
+            component_size_sum = component_size_sum + COALESCE(NEW.component_size, 0),
+            unique_entities = unique_entities + (
+                SELECT names = 0 FROM entity_group_counts
+                WHERE entity_type = NEW.entity_type AND entity_id = NEW.entity_id),
+            large_groups = large_groups + (
+                SELECT large_names = 0 AND NEW.component_size > {LARGE_GROUP_SIZE} FROM entity_group_counts
+                WHERE entity_type = NEW.entity_type AND entity_id = NEW.entity_id)
+        WHERE entity_type = NEW.entity_type;
+        UPDATE entity_group_counts SET
+            names = names + 1,
+            large_names = large_names + (NEW.component_size > {LARGE_GROUP_SIZE})
+        WHERE entity_type = NEW.entity_type AND entity_id = NEW.entity_id;
+"""
+
+# Baja de una fila (OLD) del resumen
+_REMOVE_ROW = f"""
+        UPDATE entity_group_counts SET
+            names = names - 1,
+            large_names = large_names - (OLD.component_size > {LARGE_GROUP_SIZE})
+        WHERE entity_type = OLD.entity_type AND entity_id = OLD.entity_id;
+        UPDATE entity_stats SET
+            total_names = total_names - 1,
+            component_size_sum = component_size_sum - COALESCE(OLD.component_size, 0),
+            unique_entities = unique_entities - (
+                SELECT names = 0 FROM entity_group_counts
+                WHERE entity_type = OLD.entity_type AND entity_id = OLD.entity_id),
+            large_groups = large_groups - (
+                SELECT large_names = 0 AND OLD.component_size > {LARGE_GROUP_SIZE} FROM entity_group_counts
+                WHERE entity_type = OLD.entity_type AND entity_id = OLD.entity_id)
+        WHERE entity_type = OLD.entity_type;
+        DELETE FROM entity_group_counts
+        WHERE entity_type = OLD.entity_type AND entity_id = OLD.entity_id AND names = 0;
+"""
+
+TRIGGERS = f"""
+    CREATE TRIGGER IF NOT EXISTS entity_stats_insert AFTER INSERT ON entities
+    BEGIN
+        {_ADD_ROW}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS entity_stats_delete AFTER DELETE ON entities
+    BEGIN
+        {_REMOVE_ROW}
+    END;
+
+    -- Solo las columnas que afectan al resumen (no updated_at, standard_name, ...)
+    CREATE TRIGGER IF NOT EXISTS entity_stats_update
+    AFTER UPDATE OF entity_type, entity_id, component_size ON entities
+    BEGIN
+        {_REMOVE_ROW}
+        {_ADD_ROW}
+    END;
+"""
+
+# Recálculo completo desde entities ({where} filtra opcionalmente por tipo)
+_RECOMPUTE_GROUPS = f"""
+    SELECT entity_type, entity_id, COUNT(*), SUM(component_size > {LARGE_GROUP_SIZE})
+    FROM entities
+    {{where}}
+    GROUP BY entity_type, entity_id
+"""
+
+_RECOMPUTE_STATS = f"""
+    SELECT entity_type, SUM(names), COUNT(*), SUM(size_sum), SUM(large_names > 0)
+    FROM (
+        SELECT entity_type, entity_id, COUNT(*) AS names,
+               COALESCE(SUM(component_size), 0) AS size_sum,
+               SUM(component_size > {LARGE_GROUP_SIZE}) AS large_names
+        FROM entities
+        {{where}}
+        GROUP BY entity_type, entity_id
+    )
+    GROUP BY entity_type
+"""
+
+
+def create_entity_stats(conn: sqlite3.Connection):
+    """
+    Crea las tablas de resumen y sus triggers (idempotente)
+
+    Si faltaba alguno (base anterior a entity_stats o carga masiva interrumpida),
+    el resumen se calcula desde cero.
+    """
+    present = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE 'entity_stats%'"
+    )}
+    execute_script(conn, SCHEMA + TRIGGERS)
+    if not present.issuperset(['entity_stats', *TRIGGER_NAMES]):
+        rebuild_entity_stats(conn)
+
+
+def read_entity_stats(conn: sqlite3.Connection, entity_type: str) -> Dict:
+    """
+    Estadísticas de un tipo de entidad (lectura por clave primaria)
+
+    Returns:
+        Diccionario con total_names, unique_entities, avg_group_size y large_groups
+    """
+    row = conn.execute(
+        "SELECT total_names, unique_entities, component_size_sum, large_groups "
+        "FROM entity_stats WHERE entity_type = ?",
+        (entity_type,)
+    ).fetchone()
+    total_names, unique_entities, size_sum, large_groups = row if row else (0, 0, 0, 0)
+    return {
+        'total_names': total_names,
+        'unique_entities': unique_entities,
+        'avg_group_size': size_sum / total_names if total_names else 0,
+        'large_groups': large_groups
+    }
+
+
+def recompute_entity_stats(conn: sqlite3.Connection) -> Dict[str, Dict]:
+    """Resumen por entity_type calculado desde cero sobre entities"""
+    return {
+        row[0]: dict(zip(STAT_COLUMNS, row[1:]))
+        for row in conn.execute(_RECOMPUTE_STATS.format(where=''))
+    }
+
+
+def stored_entity_stats(conn: sqlite3.Connection) -> Dict[str, Dict]:
+    """Resumen por entity_type tal como está en entity_stats (sin tipos vacíos)"""
+    return {
+        row[0]: dict(zip(STAT_COLUMNS, row[1:]))
+        for row in conn.execute(f"SELECT entity_type, {', '.join(STAT_COLUMNS)} FROM entity_stats")
+        if row[1] != 0 or any(row[2:])
+    }
+
+
+def check_entity_stats(conn: sqlite3.Connection) -> List[str]:
+    """
+    Compara entity_stats con un recálculo completo
+
+    Returns:
+        Lista de diferencias ('tipo.columna: guardado != recalculado'); vacía si coinciden
+    """
+    stored = stored_entity_stats(conn)
+    expected = recompute_entity_stats(conn)
+    differences = []
+    for entity_type in sorted(set(stored) | set(expected)):
+        for column in STAT_COLUMNS:
+            have = stored.get(entity_type, {}).get(column, 0)
+            want = expected.get(entity_type, {}).get(column, 0)
+            if have != want:
+                differences.append(f"{entity_type}.{column}: {have} != {want}")
+    return differences
+
+
+def rebuild_entity_stats(conn: sqlite3.Connection, entity_type: Optional[str] = None):
+    """
+    Reconstruye entity_stats y entity_group_counts desde entities
+
+    Args:
+        conn: Conexión a la base de datos
+        entity_type: Si se especifica, solo reconstruye ese tipo
+    """
+    if entity_type is None:
+        where, params = '', ()
+    else:
+        where, params = 'WHERE entity_type = ?', (entity_type,)
+    conn.execute(f"DELETE FROM entity_group_counts {where}", params)
+    conn.execute(f"INSERT INTO entity_group_counts (entity_type, entity_id, names, large_names) "
+                 f"{_RECOMPUTE_GROUPS.format(where=where)}", params)
+    conn.execute(f"DELETE FROM entity_stats {where}", params)
+    conn.execute(f"INSERT INTO entity_stats (entity_type, {', '.join(STAT_COLUMNS)}) "
+                 f"{_RECOMPUTE_STATS.format(where=where)}", params)
+
+
+@contextmanager
+def deferred_entity_stats(conn: sqlite3.Connection, entity_type: Optional[str] = None) -> Iterator[None]:
+    """
+    Quita los triggers durante una carga masiva y recalcula el resumen al final
+
+    El DDL de SQLite es transaccional: si la carga falla, el rollback restaura
+    los triggers. La carga no debe confirmar la transacción (df.to_sql lo hace;
+    se inserta con insert_dataframe), así que quitar los triggers, cargar y
+    recalcular se confirman juntos.
+
+    Args:
+        conn: Conexión a la base de datos
+        entity_type: Tipo afectado por la carga. Si es None, se recalculan todos
+    """
+    execute_script(conn, ''.join(f"DROP TRIGGER IF EXISTS {name};\n" for name in TRIGGER_NAMES))
+    yield
+    execute_script(conn, TRIGGERS)
+    rebuild_entity_stats(conn, entity_type)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Función principal."""
+    parser = argparse.ArgumentParser(
+        description="Verifica (y repara) el resumen materializado entity_stats",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  python entity_stats.py database/entities.db                              # Verificar
+  python entity_stats.py database/entities_by_transaction.db --repair      # Reconstruir si difiere
+        """
+    )
+
+    parser.add_argument(
+        'db_path',
+        type=Path,
+        help='Base de datos SQLite de entidades'
+    )
+
+    parser.add_argument(
+        '--repair',
+        action='store_true',
+        help='Reconstruir el resumen desde cero si no coincide'
+    )
+
+    args = parser.parse_args(argv)
+
+    if not args.db_path.exists():
+        parser.error(f"No se encontró la base de datos: {args.db_path}")
+
+    print("=" * 80)
+    print("VERIFICACIÓN DE ESTADÍSTICAS MATERIALIZADAS")
+    print("=" * 80)
+    print(f"Base de datos: {args.db_path}")
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        with conn:
+            create_entity_stats(conn)
+        differences = check_entity_stats(conn)
+        if not differences:
+            print("\n✓ entity_stats coincide con el recálculo completo")
+        else:
+            print(f"\n⚠️  {len(differences)} diferencias:")
+            for difference in differences:
+                print(f"   - {difference}")
+            if args.repair:
+                with conn:
+                    rebuild_entity_stats(conn)
+                print("\n✓ entity_stats reconstruido")
+    finally:
+        conn.close()
+    print("=" * 80)
+
+    return 1 if differences and not args.repair else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
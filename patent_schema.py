@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Esquema Normalizado de Pares de Transacciones de Patentes
+=========================================================
+PatentTransactionDatabase guarda los pares (firm, bank) con claves enteras en
+lugar de repetir los nombres en cada fila:
+
+- names: diccionario de textos (nombres originales y estandarizados), cada uno
+  una sola vez
+- entities: un nombre original dentro de un tipo de transacción, con su nombre
+  estandarizado (standard_name_id; NULL si se importó sin estandarizar)
+- pairs: tabla de hechos; firm_id y bank_id apuntan a entities. La clave UNIQUE
+  y los índices son enteros: idx_pairs_frequency cubre el top-N por frecuencia
+  (get_top_pairs lee 20 entradas del índice y resuelve solo esos nombres) e
+  idx_pairs_bank los conteos de bancos distintos
+
+La vista patent_pairs conserva las columnas de la tabla anterior (firm_name,
+pair_name, firm_standard_name, ...), así que get_top_pairs y load_all_pairs
+devuelven lo mismo que antes.
+
+Una base con la tabla patent_pairs anterior se convierte al abrirse
+(create_patent_schema) o con este script, que además hace un backup y compacta
+el archivo (VACUUM).
+
+Uso:
+    python patent_schema.py database/patent_transactions.db               # Convierte y compacta
+    python patent_schema.py database/patent_transactions.db --no-backup   # Sin backup previo
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+from database_connection import execute_script
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS names (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE IF NOT EXISTS entities (
+        id INTEGER PRIMARY KEY,
+        transaction_type TEXT NOT NULL,
+        name_id INTEGER NOT NULL REFERENCES names(id),
+        standard_name_id INTEGER REFERENCES names(id),
+        UNIQUE(transaction_type, name_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS pairs (
+        id INTEGER PRIMARY KEY,
+        transaction_type TEXT NOT NULL,
+        firm_id INTEGER NOT NULL REFERENCES entities(id),
+        bank_id INTEGER NOT NULL REFERENCES entities(id),
+        frequency INTEGER NOT NULL,
+        patent_count INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(transaction_type, firm_id, bank_id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_pairs_frequency
+    ON pairs(transaction_type, frequency DESC, firm_id, bank_id, patent_count);
+
+    CREATE INDEX IF NOT EXISTS idx_pairs_bank ON pairs(transaction_type, bank_id);
+"""
+
+# Columnas de la tabla patent_pairs anterior
+VIEW = """
+    CREATE VIEW IF NOT EXISTS patent_pairs AS
+    SELECT
+        p.id,
+        p.transaction_type,
+        fn.name AS firm_name,
+        bn.name AS bank_name,
+        fn.name || ' - ' || bn.name AS pair_name,
+        p.frequency,
+        p.patent_count,
+        p.created_at,
+        p.updated_at,
+        fs.name AS firm_standard_name,
+        bs.name AS bank_standard_name,
+        fs.name || ' - ' || bs.name AS pair_standard_name
+    FROM pairs p
+    JOIN entities f ON f.id = p.firm_id
+    JOIN names fn ON fn.id = f.name_id
+    JOIN entities b ON b.id = p.bank_id
+    JOIN names bn ON bn.id = b.name_id
+    LEFT JOIN names fs ON fs.id = f.standard_name_id
+    LEFT JOIN names bs ON bs.id = b.standard_name_id;
+"""
+
+
+def is_legacy_schema(conn: sqlite3.Connection) -> bool:
+    """True si patent_pairs es todavía una tabla con los nombres en cada fila"""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'patent_pairs'").fetchone()
+    return row is not None and row[0] == 'table'
+
+
+def create_patent_schema(conn: sqlite3.Connection) -> int:
+    """
+    Crea names, entities, pairs y la vista patent_pairs
+
+    Una tabla patent_pairs anterior se convierte en la misma transacción.
+
+    Returns:
+        Pares convertidos desde la tabla anterior (0 si no había)
+    """
+    execute_script(conn, SCHEMA)
+    migrated = migrate_legacy_schema(conn) if is_legacy_schema(conn) else 0
+    execute_script(conn, VIEW)
+    return migrated
+
+
+def migrate_legacy_schema(conn: sqlite3.Connection) -> int:
+    """
+    Copia la tabla patent_pairs anterior a names/entities/pairs y la borra
+
+    Los ids de los pares se conservan. Si un nombre tenía distintos nombres
+    estandarizados en distintas filas del mismo tipo, se conserva uno.
+
+    Returns:
+        Pares copiados
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(patent_pairs)")}
+    # Bases anteriores a las columnas estandarizadas
+    firm_standard = 'firm_standard_name' if 'firm_standard_name' in columns else 'NULL'
+    bank_standard = 'bank_standard_name' if 'bank_standard_name' in columns else 'NULL'
+
+    conn.execute(f"""
+        INSERT OR IGNORE INTO names (name)
+        SELECT firm_name FROM patent_pairs
+        UNION SELECT bank_name FROM patent_pairs
+        UNION SELECT {firm_standard} FROM patent_pairs WHERE {firm_standard} IS NOT NULL
+        UNION SELECT {bank_standard} FROM patent_pairs WHERE {bank_standard} IS NOT NULL
+    """)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO entities (transaction_type, name_id, standard_name_id)
+        SELECT r.transaction_type, n.id, MAX(s.id)
+        FROM (
+            SELECT transaction_type, firm_name AS name, {firm_standard} AS standard_name FROM patent_pairs
+            UNION ALL
+            SELECT transaction_type, bank_name, {bank_standard} FROM patent_pairs
+        ) r
+        JOIN names n ON n.name = r.name
+        LEFT JOIN names s ON s.name = r.standard_name
+        GROUP BY r.transaction_type, n.id
+    """)
+    migrated = conn.execute("""
+        INSERT INTO pairs (id, transaction_type, firm_id, bank_id, frequency, patent_count, created_at, updated_at)
+        SELECT p.id, p.transaction_type, f.id, b.id, p.frequency, p.patent_count, p.created_at, p.updated_at
+        FROM patent_pairs p
+        JOIN names fn ON fn.name = p.firm_name
+        JOIN entities f ON f.transaction_type = p.transaction_type AND f.name_id = fn.id
+        JOIN names bn ON bn.name = p.bank_name
+        JOIN entities b ON b.transaction_type = p.transaction_type AND b.name_id = bn.id
+    """).rowcount
+    conn.execute("DROP TABLE patent_pairs")
+    return migrated
+
+
+def insert_pairs(conn: sqlite3.Connection, transaction_type: str, df: pd.DataFrame) -> int:
+    """
+    Inserta pares agregados en names, entities y pairs
+
+    Args:
+        conn: Conexión a la base de datos (dentro de una transacción)
+        transaction_type: Tipo de transacción
+        df: Una fila por par con firm_name, bank_name, frequency, patent_count,
+            firm_standard_name y bank_standard_name (None sin estandarizar)
+
+    Returns:
+        Pares insertados
+    """
+    # Nombres originales y estandarizados, una vez cada uno
+    texts = pd.concat([df['firm_name'], df['bank_name'],
+                       df['firm_standard_name'], df['bank_standard_name']]).dropna().unique()
+    conn.executemany("INSERT OR IGNORE INTO names (name) VALUES (?)", ((text,) for text in texts))
+    name_ids = pd.read_sql_query("SELECT name, id FROM names", conn).set_index('name')['id']
+
+    # Una entidad por nombre original; un nombre estandarizado nuevo reemplaza al anterior
+    entities = pd.DataFrame({
+        'name': pd.concat([df['firm_name'], df['bank_name']], ignore_index=True),
+        'standard_name': pd.concat([df['firm_standard_name'], df['bank_standard_name']], ignore_index=True)
+    }).drop_duplicates('name')
+    entity_rows = zip(
+        entities['name'].map(name_ids).tolist(),
+        entities['standard_name'].map(name_ids).astype('Int64').astype(object).where(entities['standard_name'].notna(), None).tolist()
+    )
+    conn.executemany("""
+        INSERT INTO entities (transaction_type, name_id, standard_name_id) VALUES (?, ?, ?)
+        ON CONFLICT(transaction_type, name_id)
+        DO UPDATE SET standard_name_id = coalesce(excluded.standard_name_id, standard_name_id)
+    """, ((transaction_type, name_id, standard_id) for name_id, standard_id in entity_rows))
+    entity_ids = pd.read_sql_query(
+        "SELECT name_id, id FROM entities WHERE transaction_type = ?", conn, params=(transaction_type,)
+    ).set_index('name_id')['id']
+
+    firm_ids = df['firm_name'].map(name_ids).map(entity_ids)
+    bank_ids = df['bank_name'].map(name_ids).map(entity_ids)
+    # tolist(): valores de Python (sqlite3 no acepta escalares de numpy)
+    rows = zip(firm_ids.tolist(), bank_ids.tolist(), df['frequency'].tolist(),
+               df['patent_count'].astype(object).tolist())
+    conn.executemany("""
+        INSERT INTO pairs (transaction_type, firm_id, bank_id, frequency, patent_count)
+        VALUES (?, ?, ?, ?, ?)
+    """, ((transaction_type, *row) for row in rows))
+    return len(df)
+
+
+def prune_unused(conn: sqlite3.Connection):
+    """Borra entidades sin pares y nombres sin entidades (después de borrar pares)"""
+    conn.execute("""
+        DELETE FROM entities
+        WHERE id NOT IN (SELECT firm_id FROM pairs UNION SELECT bank_id FROM pairs)
+    """)
+    conn.execute("""
+        DELETE FROM names
+        WHERE id NOT IN (
+            SELECT name_id FROM entities
+            UNION SELECT standard_name_id FROM entities WHERE standard_name_id IS NOT NULL
+        )
+    """)
+
+
+def _top_pairs_latency(conn: sqlite3.Connection, repeats: int = 20) -> float:
+    """Mediana en ms de la consulta top-20 de get_top_pairs para cada tipo presente"""
+    types = [row[0] for row in conn.execute(
+        "SELECT DISTINCT transaction_type FROM patent_pairs"
+    )]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for transaction_type in types:
+            conn.execute("""
+                SELECT transaction_type, firm_name, bank_name, pair_name, firm_standard_name,
+                       bank_standard_name, pair_standard_name, frequency, patent_count
+                FROM patent_pairs WHERE transaction_type = ? ORDER BY frequency DESC LIMIT 20
+            """, (transaction_type,)).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Función principal."""
+    parser = argparse.ArgumentParser(
+        description="Convierte una base de pares de patentes al esquema normalizado (names/entities/pairs)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  python patent_schema.py database/patent_transactions.db                # Backup, conversión y VACUUM
+  python patent_schema.py database/patent_transactions.db --no-backup    # Sin backup previo
+        """
+    )
+
+    parser.add_argument(
+        'db_path',
+        type=Path,
+        help='Base de datos SQLite de pares de patentes'
+    )
+
+    parser.add_argument(
+        '--no-backup',
+        action='store_true',
+        help='No crear un backup antes de convertir'
+    )
+
+    args = parser.parse_args(argv)
+
+    if not args.db_path.exists():
+        parser.error(f"No se encontró la base de datos: {args.db_path}")
+
+    print("=" * 80)
+    print("CONVERSIÓN AL ESQUEMA NORMALIZADO DE PARES")
+    print("=" * 80)
+    print(f"Base de datos: {args.db_path}")
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        if not is_legacy_schema(conn):
+            print("\n✓ La base ya usa el esquema normalizado")
+            print("=" * 80)
+            return 0
+
+        # Checkpoint del WAL: el tamaño del archivo refleja todos los datos
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size_before = args.db_path.stat().st_size
+        latency_before = _top_pairs_latency(conn)
+
+        if not args.no_backup:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_path = args.db_path.parent / f"patent_transactions_backup_{timestamp}.db"
+            backup = sqlite3.connect(backup_path)
+            with backup:
+                conn.backup(backup)
+            backup.close()
+            print(f"✓ Backup: {backup_path}")
+
+        with conn:
+            migrated = create_patent_schema(conn)
+        print(f"✓ Pares convertidos: {migrated:,}")
+
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size_after = args.db_path.stat().st_size
+        latency_after = _top_pairs_latency(conn)
+    finally:
+        conn.close()
+
+    print(f"\n   {'':<24} {'Antes':>12} {'Después':>12}")
+    print(f"   {'Tamaño del archivo':<24} {size_before / 2**20:>10.1f}MB {size_after / 2**20:>10.1f}MB")
+    print(f"   {'Top-20 (mediana)':<24} {latency_before:>10.2f}ms {latency_after:>10.2f}ms")
+    print("=" * 80)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
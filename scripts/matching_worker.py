@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Worker de Matching Distribuido
+==============================
+Procesa unidades de trabajo de la cola de matching (modules/work_queue.py).
+Se puede arrancar cualquier número de workers, en cualquier máquina que vea el
+directorio de la cola; el coordinador es scripts/pipeline.py --queue-dir.
+
+Uso:
+    python scripts/matching_worker.py --queue-dir /shared/queue                  # Espera trabajos indefinidamente
+    python scripts/matching_worker.py --queue-dir /shared/queue --exit-when-idle # Termina sin trabajo pendiente
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Agregar el directorio scripts al path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from modules import work_queue
+
+
+def main():
+    """Función principal."""
+    parser = argparse.ArgumentParser(
+        description="Worker de la cola de matching distribuido",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  python scripts/matching_worker.py --queue-dir /shared/queue                    # Worker permanente
+  python scripts/matching_worker.py --queue-dir /shared/queue --exit-when-idle   # Termina al vaciarse la cola
+  python scripts/matching_worker.py --queue-dir /shared/queue --lease-seconds 60 # Leases más cortos
+        """
+    )
+
+    parser.add_argument(
+        '--queue-dir',
+        type=Path,
+        required=True,
+        metavar='DIR',
+        help='Directorio compartido de la cola (el mismo que --queue-dir del pipeline)'
+    )
+
+    parser.add_argument(
+        '--worker-id',
+        help='Identificador del worker en los leases (por defecto host-pid)'
+    )
+
+    parser.add_argument(
+        '--lease-seconds',
+        type=int,
+        default=work_queue.LEASE_SECONDS,
+        help=f'Validez del lease de cada unidad (por defecto {work_queue.LEASE_SECONDS})'
+    )
+
+    parser.add_argument(
+        '--exit-when-idle',
+        action='store_true',
+        help='Terminar cuando todos los trabajos de la cola estén completos'
+    )
+
+    args = parser.parse_args()
+
+    worker_id = work_queue.default_worker_id() if args.worker_id is None else args.worker_id
+    if '.' in worker_id:
+        parser.error('--worker-id no puede contener puntos')
+
+    print("=" * 80)
+    print("WORKER DE MATCHING DISTRIBUIDO")
+    print("=" * 80)
+    print(f"Cola: {args.queue_dir}")
+    print(f"Worker: {worker_id}")
+
+    processed = work_queue.run_worker(args.queue_dir, worker_id=worker_id, lease_seconds=args.lease_seconds,
+                                      exit_when_idle=args.exit_when_idle)
+    print(f"\n✓ Unidades procesadas: {processed:,}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,10 @@ Crea bloques optimizados y guarda solo el resultado final.
 """
 
 import pandas as pd
-import json
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
+from . import artifacts
 
 # Palabras genéricas que no son distintivas
 GENERIC_WORDS = {
@@ -88,17 +88,10 @@ def create_blocks(financial_df, non_financial_df, base_dir=None, transaction_typ
     # Guardar solo bloques optimizados finales con sufijo del tipo de transacción (si existe)
     print("\n4. Guardando bloques optimizados...")
     suffix = f"_{transaction_type}" if transaction_type else ""
-    output_file_financial = results_dir / f"financial_blocks{suffix}.json"
-    output_file_non_financial = results_dir / f"non_financial_blocks{suffix}.json"
-    
-    financial_blocks_json = {str(k): [int(i) for i in v] for k, v in financial_blocks_opt.items()}
-    non_financial_blocks_json = {str(k): [int(i) for i in v] for k, v in non_financial_blocks_opt.items()}
-    
-    with open(output_file_financial, 'w', encoding='utf-8') as f:
-        json.dump(financial_blocks_json, f, indent=2)
-    
-    with open(output_file_non_financial, 'w', encoding='utf-8') as f:
-        json.dump(non_financial_blocks_json, f, indent=2)
+    output_file_financial = artifacts.save_groups(financial_blocks_opt, results_dir, f"financial_blocks{suffix}")
+    output_file_non_financial = artifacts.save_groups(
+        non_financial_blocks_opt, results_dir, f"non_financial_blocks{suffix}"
+    )
     
     print(f"   ✓ {output_file_financial}")
     print(f"   ✓ {output_file_non_financial}")
@@ -362,8 +355,8 @@ if __name__ == "__main__":
     base_dir = Path(__file__).parent.parent.parent
     results_dir = base_dir / "results" / "intermediate"
     
-    financial_df = pd.read_csv(results_dir / "financial_normalized.csv")
-    non_financial_df = pd.read_csv(results_dir / "non_financial_normalized.csv")
+    financial_df = artifacts.load_table(results_dir, "financial_normalized")
+    non_financial_df = artifacts.load_table(results_dir, "non_financial_normalized")
     
     create_blocks(financial_df, non_financial_df, base_dir, transaction_type=None)
 
@@ -0,0 +1,237 @@
+"""
+Módulo de Checkpoints de Matching
+=================================
+Guarda periódicamente los matches de los bloques terminados para que un
+matching interrumpido (caída, kill) pueda reanudarse sin repetir esos bloques.
+
+Cada checkpoint es un directorio (intermediate/checkpoints/<artefacto>/) con:
+- edges.seg: segmento de solo-anexado; cada registro contiene las posiciones
+  de los bloques terminados, cuántos matches tiene cada uno y los matches
+  (idx1, idx2, similarity) como arrays binarios.
+- state.json: huella de la entrada, bitmap de bloques terminados y número de
+  bytes confirmados de edges.seg.
+
+Una confirmación anexa los registros a edges.seg (con fsync) y después
+reemplaza state.json de forma atómica (archivo temporal + os.replace). Lo que
+quede en edges.seg más allá de los bytes confirmados es de una confirmación
+interrumpida y se descarta al reanudar.
+
+La huella cubre los bloques (claves, índices y nombres), el threshold y el
+scorer: si la entrada cambió, el checkpoint se descarta en lugar de reutilizarse.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+import struct
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Segundos entre confirmaciones del checkpoint
+CHECKPOINT_INTERVAL_SECONDS = 30
+
+SEGMENT_FILE = "edges.seg"
+STATE_FILE = "state.json"
+RECORD_MAGIC = b'MSEG'
+# Cabecera de registro: magic, número de bloques, número de matches
+RECORD_HEADER = struct.Struct('<4sQQ')
+
+
+def checkpoint_dir(results_dir, name):
+    """Directorio del checkpoint del artefacto `name` (p. ej. 'financial_matches')."""
+    return Path(results_dir) / "checkpoints" / name
+
+
+def remove_checkpoint(directory):
+    """Elimina un checkpoint (cuando el matching terminó y guardó sus resultados)."""
+    directory = Path(directory)
+    if directory.exists():
+        shutil.rmtree(directory)
+
+
+def blocks_fingerprint(blocks, names, threshold, scorer=None):
+    """
+    Huella de la entrada del matching.
+
+    Args:
+        blocks: dict clave -> lista de índices (en el orden de procesamiento)
+        names: dict índice -> nombre
+        threshold: Threshold de similitud
+        scorer: Función de rapidfuzz (None = WRatio)
+    """
+    digest = hashlib.sha256()
+    scorer_name = getattr(scorer, '__name__', 'WRatio') if scorer is not None else 'WRatio'
+    digest.update(f"{threshold}|{scorer_name}|{len(blocks)}".encode('utf-8'))
+    for key, indices in blocks.items():
+        digest.update(f"\x1e{key}\x1f".encode('utf-8'))
+        digest.update(np.asarray(indices, dtype=np.int64).tobytes())
+        digest.update('\x1f'.join(str(names[i]) for i in indices).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _fsync_directory(directory):
+    # No todos los sistemas permiten abrir un directorio (p. ej. Windows)
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def encode_record(block_matches):
+    """Serializa [(posición, matches), ...] como un registro del segmento."""
+    positions = np.fromiter((p for p, _ in block_matches), dtype=np.int64, count=len(block_matches))
+    counts = np.fromiter((len(m) for _, m in block_matches), dtype=np.int64, count=len(block_matches))
+    edges = [edge for _, matches in block_matches for edge in matches]
+    idx1 = np.fromiter((e[0] for e in edges), dtype=np.int64, count=len(edges))
+    idx2 = np.fromiter((e[1] for e in edges), dtype=np.int64, count=len(edges))
+    similarity = np.fromiter((e[2] for e in edges), dtype=np.float64, count=len(edges))
+    header = RECORD_HEADER.pack(RECORD_MAGIC, len(block_matches), len(edges))
+    return b''.join([header, positions.tobytes(), counts.tobytes(),
+                     idx1.tobytes(), idx2.tobytes(), similarity.tobytes()])
+
+
+def decode_records(data):
+    """Lee los registros de un segmento: dict posición -> lista de matches."""
+    replayed = {}
+    offset = 0
+    while offset < len(data):
+        magic, n_blocks, n_edges = RECORD_HEADER.unpack_from(data, offset)
+        if magic != RECORD_MAGIC:
+            raise ValueError(f"Registro de checkpoint corrupto en el byte {offset}")
+        offset += RECORD_HEADER.size
+        arrays = []
+        for dtype, size in ((np.int64, n_blocks), (np.int64, n_blocks), (np.int64, n_edges),
+                            (np.int64, n_edges), (np.float64, n_edges)):
+            arrays.append(np.frombuffer(data, dtype=dtype, count=size, offset=offset))
+            offset += size * 8
+        positions, counts, idx1, idx2, similarity = arrays
+        edges = list(zip(idx1.tolist(), idx2.tolist(), similarity.tolist()))
+        start = 0
+        for position, n in zip(positions.tolist(), counts.tolist()):
+            replayed[position] = edges[start:start + n]
+            start += n
+    return replayed
+
+
+class MatchCheckpoint:
+    """Checkpoint de los bloques terminados de un process_all_blocks."""
+
+    def __init__(self, directory, fingerprint, n_blocks, resume=False, interval_seconds=None):
+        """
+        Abre el checkpoint de `directory`.
+
+        Con resume=True y un checkpoint con la misma huella, carga los bloques
+        confirmados (replayed: posición -> matches). En cualquier otro caso
+        empieza un checkpoint vacío. interval_seconds: segundos entre
+        confirmaciones (None = CHECKPOINT_INTERVAL_SECONDS).
+        """
+        self.directory = Path(directory)
+        self.fingerprint = fingerprint
+        self.n_blocks = n_blocks
+        self.interval_seconds = CHECKPOINT_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+        self.segment_file = self.directory / SEGMENT_FILE
+        self.state_file = self.directory / STATE_FILE
+        self.completed = np.zeros(n_blocks, dtype=bool)
+        self.committed_bytes = 0
+        self.replayed = {}
+        self.discarded_reason = None
+        self.pending = []
+        self.last_commit = time.monotonic()
+
+        state = self._read_state()
+        if resume and state is not None:
+            if state.get('fingerprint') != fingerprint or state.get('n_blocks') != n_blocks:
+                self.discarded_reason = "la entrada cambió desde el checkpoint"
+            elif self._load(state):
+                return
+            else:
+                self.discarded_reason = "el segmento del checkpoint está incompleto"
+        elif resume:
+            self.discarded_reason = "no hay checkpoint"
+        self._reset()
+
+    @property
+    def completed_count(self):
+        return int(self.completed.sum())
+
+    def is_done(self, position):
+        """True si el bloque en `position` está en el checkpoint."""
+        return bool(self.completed[position])
+
+    def add(self, position, matches):
+        """Registra un bloque terminado y confirma si pasó el intervalo."""
+        self.pending.append((position, matches))
+        if time.monotonic() - self.last_commit >= self.interval_seconds:
+            self.commit()
+
+    def commit(self):
+        """Anexa los bloques pendientes al segmento y confirma el estado de forma atómica."""
+        self.last_commit = time.monotonic()
+        if not self.pending:
+            return
+        record = encode_record(self.pending)
+        with open(self.segment_file, 'r+b') as f:
+            f.seek(self.committed_bytes)
+            f.write(record)
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        for position, _ in self.pending:
+            self.completed[position] = True
+        self.committed_bytes += len(record)
+        self.pending = []
+        self._write_state()
+
+    def _read_state(self):
+        if not self.state_file.exists():
+            return None
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self, state):
+        """Carga el estado confirmado; False si el segmento no lo contiene entero."""
+        committed_bytes = state['committed_bytes']
+        if not self.segment_file.exists() or self.segment_file.stat().st_size < committed_bytes:
+            return False
+        with open(self.segment_file, 'r+b') as f:
+            data = f.read(committed_bytes)
+            # Bytes de una confirmación interrumpida: no forman parte del checkpoint
+            f.truncate(committed_bytes)
+        bitmap = np.frombuffer(base64.b64decode(state['bitmap']), dtype=np.uint8)
+        self.completed = np.unpackbits(bitmap, count=self.n_blocks).astype(bool)
+        self.committed_bytes = committed_bytes
+        self.replayed = decode_records(data)
+        return True
+
+    def _reset(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.segment_file, 'wb') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self._write_state()
+
+    def _write_state(self):
+        state = {
+            'fingerprint': self.fingerprint,
+            'n_blocks': self.n_blocks,
+            'completed_blocks': self.completed_count,
+            'committed_bytes': self.committed_bytes,
+            'bitmap': base64.b64encode(np.packbits(self.completed).tobytes()).decode('ascii')
+        }
+        tmp_file = self.state_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.state_file)
+        _fsync_directory(self.directory)
@@ -6,13 +6,16 @@ incluyendo los que no tienen matches (singletons).
 """
 
 import pandas as pd
-import json
+import numpy as np
 from pathlib import Path
 from datetime import datetime
+from . import artifacts
 from . import grouping
+from . import entity_ids
 
 
-def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, base_dir=None, transaction_type=None):
+def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, base_dir=None, transaction_type=None,
+                         id_mode='sequential'):
     """
     Completa el mapeo agregando nombres faltantes (singletons).
     
@@ -21,6 +24,8 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
         non_financial_mapping: DataFrame con mapeo no financiero (si None, intenta cargar desde archivo)
         base_dir: Directorio base del proyecto
         transaction_type: Tipo de transacción ('pledge' o 'release') o None para datos fusionados
+        id_mode: 'sequential' o 'stable' (los singletons conservan su ID anterior y se guarda
+                 *_entity_changes.csv con las entidades que cambiaron)
         
     Returns:
         tuple: (complete_financial_mapping, complete_non_financial_mapping)
@@ -60,17 +65,20 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
         original_file_financial = None
         original_file_non_financial = None
     
-    normalized_file_financial = results_dir / f"financial_normalized{suffix}.csv"
-    normalized_file_non_financial = results_dir / f"non_financial_normalized{suffix}.csv"
+    normalized_file_financial = artifacts.find_table(results_dir, f"financial_normalized{suffix}")
+    normalized_file_non_financial = artifacts.find_table(results_dir, f"non_financial_normalized{suffix}")
     
     # Load normalized data
-    if not normalized_file_financial.exists():
+    if normalized_file_financial is None:
         print("   ✗ Error: No se encontró el archivo normalizado.")
-        print(f"   Archivo requerido: {normalized_file_financial}")
+        print(f"   Archivo requerido: {artifacts.table_file(results_dir, f'financial_normalized{suffix}')}")
         return None, None
     
-    normalized_financial = pd.read_csv(normalized_file_financial)
-    normalized_non_financial = pd.read_csv(normalized_file_non_financial) if normalized_file_non_financial.exists() else None
+    normalized_financial = artifacts.load_table(results_dir, f"financial_normalized{suffix}")
+    normalized_non_financial = (
+        artifacts.load_table(results_dir, f"non_financial_normalized{suffix}")
+        if normalized_file_non_financial is not None else None
+    )
     
     # For merged data (transaction_type=None), we use normalized data as the source
     # The normalized data already contains all names from both pledge and release
@@ -113,16 +121,13 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
         else:
             # Intentar generar desde componentes
             print("   ℹ️  No se encontró archivo de mapeo, intentando generar desde componentes...")
-            components_file = results_dir / f"financial_components{suffix}.json"
-            matches_file = results_dir / f"financial_matches{suffix}.csv"
+            components_name = f"financial_components{suffix}"
+            matches_name = f"financial_matches{suffix}"
             
-            if components_file.exists() and matches_file.exists():
+            if artifacts.find_groups(results_dir, components_name) and artifacts.find_table(results_dir, matches_name):
                 print("   ✓ Generando mapeo desde componentes...")
-                with open(components_file, 'r', encoding='utf-8') as f:
-                    financial_components_json = json.load(f)
-                    financial_components = [set(int(idx) for idx in comp) for comp in financial_components_json.values()]
-                
-                financial_matches_df = pd.read_csv(matches_file)
+                financial_components = artifacts.load_components(results_dir, components_name)
+                financial_matches_df = artifacts.load_table(results_dir, matches_name, columns=artifacts.MATCH_EDGE_COLUMNS)
                 financial_mapping, _ = grouping.process_components(
                     normalized_financial, financial_components, financial_matches_df,
                     'normalized_name', 'frequency', 'financial'
@@ -142,16 +147,16 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
             print("   ℹ️  Mapeo no financiero cargado desde archivo")
         else:
             # Intentar generar desde componentes
-            components_file = results_dir / f"non_financial_components{suffix}.json"
-            matches_file = results_dir / f"non_financial_matches{suffix}.csv"
+            components_name = f"non_financial_components{suffix}"
+            matches_name = f"non_financial_matches{suffix}"
             
-            if components_file.exists() and matches_file.exists() and normalized_non_financial is not None:
+            if (artifacts.find_groups(results_dir, components_name) and artifacts.find_table(results_dir, matches_name)
+                    and normalized_non_financial is not None):
                 print("   ℹ️  Generando mapeo no financiero desde componentes...")
-                with open(components_file, 'r', encoding='utf-8') as f:
-                    non_financial_components_json = json.load(f)
-                    non_financial_components = [set(int(idx) for idx in comp) for comp in non_financial_components_json.values()]
-                
-                non_financial_matches_df = pd.read_csv(matches_file)
+                non_financial_components = artifacts.load_components(results_dir, components_name)
+                non_financial_matches_df = artifacts.load_table(
+                    results_dir, matches_name, columns=artifacts.MATCH_EDGE_COLUMNS
+                )
                 non_financial_mapping, _ = grouping.process_components(
                     normalized_non_financial, non_financial_components, non_financial_matches_df,
                     'normalized_name', 'frequency', 'non_financial'
@@ -172,8 +177,8 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
     
     # Identificar nombres faltantes
     print("\n2. Identificando nombres faltantes...")
-    mapped_original_names = set(financial_mapping['original_name'].str.upper().str.strip())
-    original_financial['name_upper'] = original_financial['ee_name'].str.upper().str.strip()
+    mapped_original_names = set(name_key(financial_mapping['original_name']))
+    original_financial['name_upper'] = name_key(original_financial['ee_name'])
     missing_financial = original_financial[~original_financial['name_upper'].isin(mapped_original_names)].copy()
     
     print(f"   ✓ Nombres faltantes en financial: {len(missing_financial):,}")
@@ -183,36 +188,26 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
     max_entity_id = financial_mapping['entity_id'].str.extract(r'financial_(\d+)')[0].astype(int).max()
     next_entity_id = int(max_entity_id) + 1 if not pd.isna(max_entity_id) else 0
     
-    singleton_mappings = []
-    for idx, row in missing_financial.iterrows():
-        original_name = row['ee_name']
-        freq = row['freq']
-        
-        normalized_row = normalized_financial[normalized_financial['original_name'].str.upper().str.strip() == original_name.upper().strip()]
-        normalized_name = normalized_row.iloc[0]['normalized_name'] if len(normalized_row) > 0 else original_name.upper().strip()
-        standard_name = normalized_name
-        
-        singleton_mappings.append({
-            'entity_id': f'financial_{next_entity_id}',
-            'original_name': original_name,
-            'normalized_name': normalized_name,
-            'standard_name': standard_name,
-            'frequency': freq,
-            'component_size': 1,
-            'avg_similarity': None,
-            'min_similarity': None,
-            'needs_review': False
-        })
-        
-        next_entity_id += 1
+    singletons_financial = build_singleton_mapping(
+        missing_financial, 'ee_name', normalized_financial, 'financial', next_entity_id
+    )
+    
+    print(f"   ✓ {len(singletons_financial):,} singletons agregados")
     
-    print(f"   ✓ {len(singleton_mappings):,} singletons agregados")
+    previous_financial = None
+    if id_mode == 'stable':
+        previous_financial = entity_ids.load_previous_mapping(
+            final_results_dir / f"financial_entity_mapping_complete{suffix}.csv"
+        )
+        singletons_financial = entity_ids.assign_singleton_ids(
+            financial_mapping, singletons_financial, previous_financial, 'financial'
+        )
     
     # Combinar mapeos
     print("\n4. Combinando mapeos...")
     complete_mapping_financial = pd.concat([
         financial_mapping,
-        pd.DataFrame(singleton_mappings)
+        singletons_financial
     ], ignore_index=True)
     
     print(f"   ✓ Mapeo completo financial: {len(complete_mapping_financial):,} nombres")
@@ -221,8 +216,8 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
     complete_mapping_non_financial = None
     if original_non_financial is not None and non_financial_mapping is not None:
         print("\n5. Procesando non-financial entities...")
-        mapped_original_names_nf = set(non_financial_mapping['original_name'].str.upper().str.strip())
-        original_non_financial['name_upper'] = original_non_financial['or_name'].str.upper().str.strip()
+        mapped_original_names_nf = set(name_key(non_financial_mapping['original_name']))
+        original_non_financial['name_upper'] = name_key(original_non_financial['or_name'])
         missing_non_financial = original_non_financial[~original_non_financial['name_upper'].isin(mapped_original_names_nf)].copy()
         
         print(f"   ✓ Nombres faltantes en non-financial: {len(missing_non_financial):,}")
@@ -230,31 +225,20 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
         max_entity_id_nf = non_financial_mapping['entity_id'].str.extract(r'non_financial_(\d+)')[0].astype(int).max()
         next_entity_id_nf = int(max_entity_id_nf) + 1 if not pd.isna(max_entity_id_nf) else 0
         
-        singleton_mappings_nf = []
-        for idx, row in missing_non_financial.iterrows():
-            original_name = row['or_name']
-            freq = row['freq']
-            
-            normalized_row = normalized_non_financial[normalized_non_financial['original_name'].str.upper().str.strip() == original_name.upper().strip()]
-            normalized_name = normalized_row.iloc[0]['normalized_name'] if len(normalized_row) > 0 else original_name.upper().strip()
-            
-            singleton_mappings_nf.append({
-                'entity_id': f'non_financial_{next_entity_id_nf}',
-                'original_name': original_name,
-                'normalized_name': normalized_name,
-                'standard_name': normalized_name,
-                'frequency': freq,
-                'component_size': 1,
-                'avg_similarity': None,
-                'min_similarity': None,
-                'needs_review': False
-            })
-            
-            next_entity_id_nf += 1
+        singletons_non_financial = build_singleton_mapping(
+            missing_non_financial, 'or_name', normalized_non_financial, 'non_financial', next_entity_id_nf
+        )
+        if id_mode == 'stable':
+            previous_non_financial = entity_ids.load_previous_mapping(
+                final_results_dir / f"non_financial_entity_mapping_complete{suffix}.csv"
+            )
+            singletons_non_financial = entity_ids.assign_singleton_ids(
+                non_financial_mapping, singletons_non_financial, previous_non_financial, 'non_financial'
+            )
         
         complete_mapping_non_financial = pd.concat([
             non_financial_mapping,
-            pd.DataFrame(singleton_mappings_nf)
+            singletons_non_financial
         ], ignore_index=True)
         
         print(f"   ✓ Mapeo completo non-financial: {len(complete_mapping_non_financial):,} nombres")
@@ -267,6 +251,9 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
     print(f"     - Total nombres: {len(complete_mapping_financial):,}")
     print(f"     - Entidades únicas: {complete_mapping_financial['entity_id'].nunique():,}")
     print(f"     - Singletons: {len(complete_mapping_financial[complete_mapping_financial['component_size'] == 1]):,}")
+    if id_mode == 'stable':
+        _save_entity_changes(previous_financial, complete_mapping_financial,
+                             final_results_dir / f"financial_entity_changes{suffix}.csv")
     
     if complete_mapping_non_financial is not None:
         output_file_non_financial = final_results_dir / f"non_financial_entity_mapping_complete{suffix}.csv"
@@ -275,6 +262,9 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
         print(f"     - Total nombres: {len(complete_mapping_non_financial):,}")
         print(f"     - Entidades únicas: {complete_mapping_non_financial['entity_id'].nunique():,}")
         print(f"     - Singletons: {len(complete_mapping_non_financial[complete_mapping_non_financial['component_size'] == 1]):,}")
+        if id_mode == 'stable':
+            _save_entity_changes(previous_non_financial, complete_mapping_non_financial,
+                                 final_results_dir / f"non_financial_entity_changes{suffix}.csv")
     
     # Estadísticas finales
     print("\n7. Estadísticas finales:")
@@ -297,6 +287,67 @@ def run_complete_mapping(financial_mapping=None, non_financial_mapping=None, bas
     return complete_mapping_financial, complete_mapping_non_financial
 
 
+def name_key(names):
+    """Clave de cruce de nombres: mayúsculas y sin espacios en los extremos."""
+    return names.str.upper().str.strip()
+
+
+def build_singleton_mapping(missing_df, name_column, normalized_df, entity_type, next_entity_id):
+    """
+    Construye las filas de mapeo de los nombres faltantes (singletons) en una sola operación.
+    
+    El normalized_name se toma de la primera fila de normalized_df con la misma clave
+    (name_key de original_name); si no existe, se usa la propia clave. Los entity_id
+    son consecutivos a partir de next_entity_id, en el orden de missing_df.
+    
+    Args:
+        missing_df: Nombres del archivo original que no están en el mapeo
+        name_column: Columna con el nombre en missing_df
+        normalized_df: DataFrame normalizado (original_name, normalized_name)
+        entity_type: Prefijo de los entity_id
+        next_entity_id: Primer número de entity_id libre
+        
+    Returns:
+        DataFrame con las columnas del mapeo de entidades
+    """
+    if len(missing_df) == 0:
+        return pd.DataFrame()
+    
+    keys = name_key(missing_df[name_column])
+    normalized_keys = name_key(normalized_df['original_name'])
+    first_rows = ~normalized_keys.duplicated(keep='first')
+    lookup = pd.Series(
+        normalized_df['normalized_name'].to_numpy()[first_rows.to_numpy()],
+        index=normalized_keys[first_rows].to_numpy()
+    )
+    found = keys.isin(lookup.index).to_numpy()
+    normalized_names = np.where(found, keys.map(lookup).to_numpy(dtype=object), keys.to_numpy(dtype=object))
+    
+    n = len(missing_df)
+    entity_numbers = np.arange(next_entity_id, next_entity_id + n)
+    return pd.DataFrame({
+        'entity_id': [f'{entity_type}_{number}' for number in entity_numbers],
+        'original_name': missing_df[name_column].to_numpy(),
+        'normalized_name': normalized_names,
+        'standard_name': normalized_names,
+        'frequency': missing_df['freq'].to_numpy(),
+        'component_size': np.ones(n, dtype=np.int64),
+        'avg_similarity': [None] * n,
+        'min_similarity': [None] * n,
+        'needs_review': np.zeros(n, dtype=bool)
+    })
+
+
+def _save_entity_changes(previous_mapping, complete_mapping, changes_file):
+    """Guarda las entidades añadidas, eliminadas o modificadas respecto al mapeo anterior."""
+    changes = entity_ids.diff_entity_mappings(previous_mapping, complete_mapping)
+    changes.to_csv(changes_file, index=False)
+    counts = changes['change'].value_counts()
+    print(f"   ✓ {changes_file}")
+    print(f"     - Añadidas: {counts.get('added', 0):,}, modificadas: {counts.get('modified', 0):,}, "
+          f"eliminadas: {counts.get('removed', 0):,}")
+
+
 def update_database(base_dir=None, overwrite=True):
     """
     Actualiza la base de datos con los mapeos completos.
@@ -358,6 +409,9 @@ def update_database(base_dir=None, overwrite=True):
     else:
         print(f"\n2. ⚠️ Archivo no encontrado: {non_financial_csv}")
     
+    # Volcar el WAL al archivo: entities.db queda autocontenido (copias y hash del manifiesto)
+    db.close()
+    
     print("\n" + "=" * 80)
     print("✓ Base de datos actualizada")
     print(f"✓ Ubicación: {db_path}")
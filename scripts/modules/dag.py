@@ -0,0 +1,275 @@
+"""
+Módulo de Ejecución por DAG
+===========================
+Ejecuta las fases del pipeline como un grafo de dependencias entre artefactos.
+
+- Cada fase declara sus archivos de entrada y de salida; las dependencias entre
+  fases se deducen de qué fase produce cada entrada.
+- Al terminar una fase se guarda un manifiesto JSON con el hash (sha256) de sus
+  entradas y salidas, la versión del código (hash de los módulos de la fase) y
+  los parámetros que afectan al resultado.
+- Una fase se omite si su manifiesto está al día: mismas entradas, mismo código,
+  mismos parámetros y salidas intactas. Si una fase se re-ejecuta pero produce
+  exactamente los mismos archivos, las fases posteriores siguen al día.
+- Los hashes se reutilizan mientras el tamaño y la fecha de modificación del
+  archivo no cambien, así que una re-ejecución sin cambios no relee los datos.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from datetime import datetime
+
+from . import instrumentation
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class Phase:
+    """
+    Fase del pipeline con sus artefactos declarados.
+
+    Args:
+        name: Nombre de la fase
+        run: Función sin argumentos que ejecuta la fase y escribe sus salidas
+        inputs: Archivos que lee la fase
+        outputs: Archivos que la fase debe producir
+        code: Archivos de código cuyo contenido define la versión de la fase
+        params: Diccionario (serializable a JSON) de parámetros que afectan al resultado
+        optional_outputs: Archivos que la fase puede producir o no (no se verifican)
+    """
+
+    def __init__(self, name, run, inputs, outputs, code, params=None, optional_outputs=()):
+        self.name = name
+        self.run = run
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.code = [Path(p) for p in code]
+        self.params = params or {}
+        self.optional_outputs = [Path(p) for p in optional_outputs]
+
+
+def file_sha256(path):
+    """Hash sha256 del contenido de un archivo (None si no existe)."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_version(paths):
+    """Versión del código: hash del contenido de los archivos de código (orden estable)."""
+    digest = hashlib.sha256()
+    for path in sorted(Path(p) for p in paths):
+        digest.update(path.name.encode('utf-8'))
+        digest.update((file_sha256(path) or '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """
+    Manifiestos de las fases y caché de hashes de artefactos.
+
+    Los manifiestos se guardan en manifest_dir/<fase>.json con las rutas relativas
+    a base_dir, de modo que el directorio de resultados se puede mover.
+    """
+
+    def __init__(self, base_dir, manifest_dir):
+        self.base_dir = Path(base_dir)
+        self.manifest_dir = Path(manifest_dir)
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        # ruta relativa -> (size, mtime_ns, sha256)
+        self._hash_cache = {}
+        for manifest_file in self.manifest_dir.glob('*.json'):
+            manifest = self._read(manifest_file)
+            if manifest is None:
+                continue
+            for section in ('inputs', 'outputs'):
+                for rel_path, entry in manifest.get(section, {}).items():
+                    if entry is None:
+                        continue
+                    # Si varios manifiestos registran el archivo, vale la versión más reciente
+                    cached = self._hash_cache.get(rel_path)
+                    if cached is None or entry['mtime_ns'] > cached[1]:
+                        self._hash_cache[rel_path] = (entry['size'], entry['mtime_ns'], entry['sha256'])
+
+    @staticmethod
+    def _read(manifest_file):
+        try:
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _relative(self, path):
+        path = Path(path)
+        try:
+            return path.resolve().relative_to(self.base_dir.resolve()).as_posix()
+        except ValueError:
+            return path.resolve().as_posix()
+
+    def fingerprint(self, path):
+        """Entrada de manifiesto de un archivo: {sha256, size, mtime_ns} o None si no existe."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        stat = path.stat()
+        rel_path = self._relative(path)
+        cached = self._hash_cache.get(rel_path)
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            sha = cached[2]
+        else:
+            sha = file_sha256(path)
+            self._hash_cache[rel_path] = (stat.st_size, stat.st_mtime_ns, sha)
+        return {'sha256': sha, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def manifest_path(self, phase):
+        return self.manifest_dir / f"{phase.name}.json"
+
+    def load_manifest(self, phase):
+        manifest_file = self.manifest_path(phase)
+        return self._read(manifest_file) if manifest_file.exists() else None
+
+    def stale_reason(self, phase):
+        """
+        Motivo por el que la fase debe ejecutarse, o None si su manifiesto está al día.
+        """
+        manifest = self.load_manifest(phase)
+        if manifest is None:
+            return "sin manifiesto"
+        if manifest.get('code_version') != code_version(phase.code):
+            return "código modificado"
+        if manifest.get('params') != phase.params:
+            return "parámetros distintos"
+
+        recorded_inputs = manifest.get('inputs', {})
+        for path in phase.inputs:
+            current = self.fingerprint(path)
+            recorded = recorded_inputs.get(self._relative(path))
+            if (current or {}).get('sha256') != (recorded or {}).get('sha256'):
+                return f"entrada modificada: {self._relative(path)}"
+
+        recorded_outputs = manifest.get('outputs', {})
+        for path in phase.outputs:
+            current = self.fingerprint(path)
+            if current is None:
+                return f"falta la salida: {self._relative(path)}"
+            recorded = recorded_outputs.get(self._relative(path))
+            if recorded is None or current['sha256'] != recorded['sha256']:
+                return f"salida modificada: {self._relative(path)}"
+
+        return None
+
+    def write_manifest(self, phase, duration_seconds):
+        """Guarda el manifiesto de una fase recién ejecutada."""
+        missing = [self._relative(p) for p in phase.outputs if not Path(p).exists()]
+        if missing:
+            raise RuntimeError(f"La fase '{phase.name}' no generó sus salidas: {', '.join(missing)}")
+
+        manifest = {
+            'phase': phase.name,
+            'code_version': code_version(phase.code),
+            'params': phase.params,
+            'inputs': {self._relative(p): self.fingerprint(p) for p in phase.inputs},
+            'outputs': {self._relative(p): self.fingerprint(p) for p in phase.outputs},
+            'completed_at': datetime.now().isoformat(timespec='seconds'),
+            'duration_seconds': round(duration_seconds, 3)
+        }
+        manifest_file = self.manifest_path(phase)
+        tmp_file = manifest_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_file, manifest_file)
+
+
+def topological_order(phases):
+    """
+    Ordena las fases según sus dependencias (respetando el orden de declaración).
+
+    Returns:
+        tuple: (fases ordenadas, dict nombre -> nombres de las fases de las que depende)
+    """
+    producers = {}
+    for phase in phases:
+        for path in phase.outputs:
+            producers[path.resolve()] = phase.name
+
+    dependencies = {
+        phase.name: {producers[p.resolve()] for p in phase.inputs if p.resolve() in producers} - {phase.name}
+        for phase in phases
+    }
+
+    ordered = []
+    done = set()
+    pending = list(phases)
+    while pending:
+        ready = [phase for phase in pending if dependencies[phase.name] <= done]
+        if not ready:
+            cycle = ', '.join(phase.name for phase in pending)
+            raise ValueError(f"Dependencias cíclicas entre fases: {cycle}")
+        phase = ready[0]
+        ordered.append(phase)
+        done.add(phase.name)
+        pending.remove(phase)
+
+    return ordered, dependencies
+
+
+def run_dag(phases, store, targets=None, force=False):
+    """
+    Ejecuta las fases necesarias para obtener los objetivos.
+
+    Se consideran los objetivos y todas las fases de las que dependen; cada una se
+    ejecuta solo si su manifiesto no está al día (o siempre, si force=True).
+
+    Args:
+        phases: Lista de Phase
+        store: ArtifactStore con los manifiestos
+        targets: Nombres de las fases objetivo (None = todas)
+        force: Si True, ejecuta todas las fases consideradas
+
+    Returns:
+        dict: nombre de fase -> 'ejecutada' u 'omitida'
+    """
+    ordered, dependencies = topological_order(phases)
+    names = {phase.name for phase in phases}
+
+    if targets is None:
+        needed = set(names)
+    else:
+        unknown = set(targets) - names
+        if unknown:
+            raise ValueError(f"Fases desconocidas: {', '.join(sorted(unknown))}")
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(dependencies[name])
+
+    status = {}
+    for phase in ordered:
+        if phase.name not in needed:
+            continue
+        reason = "forzada" if force else store.stale_reason(phase)
+        if reason is None:
+            print(f"\n⏭  Fase '{phase.name}' al día (omitida)")
+            status[phase.name] = 'omitida'
+            instrumentation.record_skipped(phase.name)
+            continue
+
+        print(f"\n▶  Fase '{phase.name}' ({reason})")
+        start = time.perf_counter()
+        with instrumentation.phase(phase.name):
+            phase.run()
+        store.write_manifest(phase, time.perf_counter() - start)
+        status[phase.name] = 'ejecutada'
+
+    return status
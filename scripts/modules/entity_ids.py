@@ -0,0 +1,190 @@
+"""
+Módulo de IDs Estables de Entidades
+===================================
+Asigna entity_id estables entre ejecuciones a partir de la huella (fingerprint)
+del contenido de cada componente, reutilizando los IDs del mapeo anterior.
+
+- La huella de una entidad es un hash del conjunto ordenado de sus original_name.
+- Cada entidad del mapeo anterior conserva su ID en el componente nuevo con el que
+  más nombres comparte; los componentes sin antecedente reciben IDs nuevos a partir
+  del máximo anterior, así que un ID nunca se reutiliza para otra entidad.
+- diff_entity_mappings lista solo las entidades añadidas, eliminadas o modificadas,
+  para que los almacenes posteriores apliquen cambios incrementales.
+"""
+
+import hashlib
+import pandas as pd
+from pathlib import Path
+
+# Separador de nombres al calcular la huella (no aparece en nombres reales)
+FINGERPRINT_SEPARATOR = '\x1f'
+
+
+def component_fingerprint(names):
+    """Huella de un componente: sha1 de sus nombres únicos ordenados (16 hex)."""
+    joined = FINGERPRINT_SEPARATOR.join(sorted(set(str(n) for n in names)))
+    return hashlib.sha1(joined.encode('utf-8')).hexdigest()[:16]
+
+
+def fingerprint_mapping(mapping_df):
+    """
+    Calcula la huella de cada entidad de un mapeo.
+    
+    Returns:
+        Serie entity_id -> fingerprint
+    """
+    if mapping_df is None or len(mapping_df) == 0:
+        return pd.Series(dtype=object, name='fingerprint')
+    return mapping_df.groupby('entity_id', sort=False)['original_name'].agg(component_fingerprint).rename('fingerprint')
+
+
+def entity_number(entity_ids):
+    """Extrae la parte numérica de entity_id (ej: 'financial_12' -> 12); NaN si no tiene."""
+    return pd.Series(entity_ids).astype(str).str.extract(r'_(\d+)$')[0].astype(float)
+
+
+def load_previous_mapping(mapping_file):
+    """Carga el mapeo anterior (solo las columnas necesarias) o None si no existe."""
+    mapping_file = Path(mapping_file)
+    if not mapping_file.exists():
+        return None
+    return pd.read_csv(mapping_file, usecols=['entity_id', 'original_name', 'standard_name'])
+
+
+def assign_stable_entity_ids(mapping_df, previous_mapping, entity_type, min_next_number=0):
+    """
+    Reasigna los entity_id de un mapeo nuevo conservando los del mapeo anterior.
+    
+    Reconciliación greedy: se ordenan los pares (entidad nueva, entidad anterior)
+    por número de original_name compartidos y cada ID anterior se asigna como mucho
+    a un componente nuevo. Los componentes sin correspondencia reciben IDs nuevos
+    (máximo anterior + 1, en orden de componente).
+    
+    Args:
+        mapping_df: Mapeo recién generado (entity_id secuenciales de process_components)
+        previous_mapping: Mapeo anterior con columnas entity_id y original_name (o None)
+        entity_type: Prefijo de los entity_id ('financial', 'financial_security', etc.)
+        min_next_number: Número mínimo para los IDs nuevos (para no chocar con IDs ya usados)
+        
+    Returns:
+        tuple: (mapeo con IDs estables, dict entity_id_nuevo_secuencial -> entity_id_estable)
+    """
+    new_ids = pd.unique(mapping_df['entity_id'])
+    
+    if previous_mapping is None or len(previous_mapping) == 0:
+        previous_mapping = pd.DataFrame(columns=['entity_id', 'original_name'])
+    
+    # Solapamiento entre entidades nuevas y anteriores (por original_name)
+    new_names = mapping_df[['entity_id', 'original_name']].astype(str)
+    old_names = previous_mapping[['entity_id', 'original_name']].astype(str)
+    pairs = new_names.merge(old_names, on='original_name', suffixes=('_new', '_old'))
+    overlap = pairs.groupby(['entity_id_new', 'entity_id_old'], sort=False).size().reset_index(name='overlap')
+    
+    # Orden determinista: mayor solapamiento, luego orden de componente nuevo y número del ID anterior
+    new_position = pd.Series(range(len(new_ids)), index=new_ids)
+    overlap['new_position'] = overlap['entity_id_new'].map(new_position).to_numpy()
+    overlap['old_number'] = entity_number(overlap['entity_id_old']).to_numpy()
+    overlap = overlap.sort_values(['overlap', 'new_position', 'old_number'], ascending=[False, True, True])
+    
+    id_map = {}
+    used_old_ids = set()
+    for entity_id_new, entity_id_old in zip(overlap['entity_id_new'], overlap['entity_id_old']):
+        if entity_id_new in id_map or entity_id_old in used_old_ids:
+            continue
+        id_map[entity_id_new] = entity_id_old
+        used_old_ids.add(entity_id_old)
+    
+    # IDs nuevos a partir del máximo anterior, en orden de componente
+    max_number = entity_number(previous_mapping['entity_id']).max()
+    next_number = max(int(max_number) + 1 if pd.notna(max_number) else 0, min_next_number)
+    for entity_id_new in new_ids:
+        if entity_id_new not in id_map:
+            id_map[entity_id_new] = f"{entity_type}_{next_number}"
+            next_number += 1
+    
+    stable_mapping = mapping_df.copy()
+    stable_mapping['entity_id'] = stable_mapping['entity_id'].map(id_map)
+    return stable_mapping, id_map
+
+
+def assign_singleton_ids(mapping_df, singletons_df, previous_mapping, entity_type):
+    """
+    Asigna IDs estables a los singletons que completan un mapeo ya reconciliado.
+    
+    Un singleton recupera el ID que tenía en el mapeo anterior si ese ID no lo usa ya
+    otra entidad del mapeo; si no, recibe un ID nuevo por encima de todos los existentes.
+    
+    Args:
+        mapping_df: Mapeo de componentes (con IDs ya estables)
+        singletons_df: Filas de singletons con entity_id provisionales
+        previous_mapping: Mapeo completo anterior (o None)
+        entity_type: Prefijo de los entity_id
+        
+    Returns:
+        DataFrame de singletons con IDs estables
+    """
+    if len(singletons_df) == 0:
+        return singletons_df
+    
+    used_ids = set(mapping_df['entity_id'])
+    min_next_number = 0
+    for ids in (mapping_df['entity_id'], previous_mapping['entity_id'] if previous_mapping is not None else None):
+        if ids is not None and len(ids) > 0:
+            max_number = entity_number(ids).max()
+            if pd.notna(max_number):
+                min_next_number = max(min_next_number, int(max_number) + 1)
+    
+    if previous_mapping is not None:
+        previous_mapping = previous_mapping[~previous_mapping['entity_id'].isin(used_ids)]
+    
+    singletons, _ = assign_stable_entity_ids(singletons_df, previous_mapping, entity_type, min_next_number)
+    return singletons
+
+
+def diff_entity_mappings(previous_mapping, mapping_df):
+    """
+    Compara dos mapeos y devuelve solo las entidades que cambiaron.
+    
+    Una entidad está 'modified' si cambia su conjunto de nombres o su standard_name.
+    
+    Returns:
+        DataFrame con columnas entity_id, change ('added', 'removed', 'modified'),
+        old_fingerprint, new_fingerprint, old_standard_name, new_standard_name
+    """
+    columns = ['entity_id', 'change', 'old_fingerprint', 'new_fingerprint',
+               'old_standard_name', 'new_standard_name']
+    
+    def summarize(df):
+        if df is None or len(df) == 0:
+            return pd.DataFrame(columns=['fingerprint', 'standard_name'])
+        summary = fingerprint_mapping(df).to_frame()
+        summary['standard_name'] = df.groupby('entity_id', sort=False)['standard_name'].first()
+        return summary
+    
+    old = summarize(previous_mapping)
+    new = summarize(mapping_df)
+    both = old.join(new, how='outer', lsuffix='_old', rsuffix='_new')
+    
+    change = pd.Series(pd.NA, index=both.index, dtype=object)
+    change[both['fingerprint_old'].isna()] = 'added'
+    change[both['fingerprint_new'].isna()] = 'removed'
+    existing = both['fingerprint_old'].notna() & both['fingerprint_new'].notna()
+    modified = existing & (
+        (both['fingerprint_old'] != both['fingerprint_new']) |
+        (both['standard_name_old'].astype(str) != both['standard_name_new'].astype(str))
+    )
+    change[modified] = 'modified'
+    
+    changes = pd.DataFrame({
+        'entity_id': both.index,
+        'change': change.to_numpy(),
+        'old_fingerprint': both['fingerprint_old'].to_numpy(),
+        'new_fingerprint': both['fingerprint_new'].to_numpy(),
+        'old_standard_name': both['standard_name_old'].to_numpy(),
+        'new_standard_name': both['standard_name_new'].to_numpy()
+    }, columns=columns)
+    changes = changes[changes['change'].notna()]
+    
+    # Orden numérico de entity_id
+    changes = changes.assign(_number=entity_number(changes['entity_id']).to_numpy())
+    return changes.sort_values(['_number', 'entity_id']).drop(columns='_number').reset_index(drop=True)
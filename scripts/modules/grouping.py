@@ -5,10 +5,16 @@ Asigna IDs únicos y selecciona nombres estándar para cada grupo.
 """
 
 import pandas as pd
-import json
+import numpy as np
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
 import re
+from . import artifacts
+from . import entity_ids
 
 # Legal suffixes to remove when extracting root names
 LEGAL_SUFFIXES = {
@@ -95,7 +101,8 @@ ROLE_DESCRIPTOR_PATTERNS = [
 
 
 def run_grouping(financial_df, non_financial_df, financial_components, non_financial_components,
-                 financial_matches_df, non_financial_matches_df, base_dir=None, transaction_type='pledge'):
+                 financial_matches_df, non_financial_matches_df, base_dir=None, transaction_type='pledge',
+                 n_partitions=1, max_workers=None, id_mode='sequential'):
     """
     Ejecuta agrupación y asignación de IDs.
     
@@ -108,6 +115,10 @@ def run_grouping(financial_df, non_financial_df, financial_components, non_finan
         non_financial_matches_df: DataFrame con matches no financieros
         base_dir: Directorio base del proyecto
         transaction_type: Tipo de transacción ('pledge' o 'release')
+        n_partitions: Si > 1, procesa los componentes en particiones paralelas
+        max_workers: Número de procesos para el modo particionado (por defecto, n_partitions)
+        id_mode: 'sequential' (IDs por orden de componente) o 'stable' (reutiliza los IDs
+                 del mapeo completo anterior)
         
     Returns:
         tuple: (financial_mapping, non_financial_mapping, financial_review, non_financial_review)
@@ -136,17 +147,29 @@ def run_grouping(financial_df, non_financial_df, financial_components, non_finan
     # Procesar componentes
     print("1. Procesando componentes y asignando IDs...")
     print("   Financial entities:")
-    financial_mapping, financial_review = process_components(
+    financial_mapping, financial_review = _run_process_components(
         financial_df, financial_components, financial_matches_df,
-        'normalized_name', 'frequency', 'financial'
+        'financial', n_partitions, max_workers
     )
     
     print("   Non-financial entities:")
-    non_financial_mapping, non_financial_review = process_components(
+    non_financial_mapping, non_financial_review = _run_process_components(
         non_financial_df, non_financial_components, non_financial_matches_df,
-        'normalized_name', 'frequency', 'non_financial'
+        'non_financial', n_partitions, max_workers
     )
     
+    if id_mode == 'stable':
+        print("\n   Asignando IDs estables...")
+        suffix = f"_{transaction_type}" if transaction_type else ""
+        financial_mapping, financial_review = _apply_stable_ids(
+            financial_mapping, financial_review,
+            final_results_dir / f"financial_entity_mapping_complete{suffix}.csv", 'financial'
+        )
+        non_financial_mapping, non_financial_review = _apply_stable_ids(
+            non_financial_mapping, non_financial_review,
+            final_results_dir / f"non_financial_entity_mapping_complete{suffix}.csv", 'non_financial'
+        )
+    
     print(f"\n   ✓ Componentes procesados:")
     print(f"     - Financial: {len(financial_components):,} componentes")
     print(f"     - Non-financial: {len(non_financial_components):,} componentes")
@@ -186,6 +209,72 @@ def run_grouping(financial_df, non_financial_df, financial_components, non_finan
     return financial_mapping, non_financial_mapping, financial_review, non_financial_review
 
 
+# Estructuras compiladas una sola vez a partir de las constantes anteriores.
+# Si se modifican las constantes en tiempo de ejecución hay que llamar a
+# compile_root_name_rules() para reconstruirlas (y vaciar la caché).
+_EXCEPTION_TRIE = {}
+_EXCEPTION_PREFIXES = ()
+_ROLE_DESCRIPTOR_REGEXES = []
+_MULTI_WORD_REGEXES = []
+_LOCATION_REGEXES = []
+_STRIP_TOKENS = frozenset()
+
+# Marca de fin de excepción dentro del trie de tokens
+_TRIE_END = None
+
+
+def compile_root_name_rules():
+    """
+    Compila las reglas de extracción de nombres raíz.
+    
+    - Construye un trie de tokens con EXCEPTION_INSTITUTIONS para detectar
+      prefijos protegidos en una sola pasada sobre las palabras del nombre.
+    - Precompila ROLE_DESCRIPTOR_PATTERNS, MULTI_WORD_PATTERNS y LOCATION_PATTERNS.
+    - Precalcula el conjunto de tokens eliminables (sufijos legales y
+      geográficos que no están en KEEP_SUFFIXES).
+    """
+    global _EXCEPTION_TRIE, _EXCEPTION_PREFIXES, _STRIP_TOKENS
+    global _ROLE_DESCRIPTOR_REGEXES, _MULTI_WORD_REGEXES, _LOCATION_REGEXES
+    
+    exceptions = sorted((e.upper().strip() for e in EXCEPTION_INSTITUTIONS), key=len, reverse=True)
+    
+    trie = {}
+    for exception in exceptions:
+        node = trie
+        for word in exception.split():
+            node = node.setdefault(word, {})
+        node.setdefault(_TRIE_END, exception)
+    
+    _EXCEPTION_TRIE = trie
+    _EXCEPTION_PREFIXES = tuple(exceptions)
+    _ROLE_DESCRIPTOR_REGEXES = [re.compile(p, flags=re.IGNORECASE) for p in ROLE_DESCRIPTOR_PATTERNS]
+    _MULTI_WORD_REGEXES = [re.compile(p, flags=re.IGNORECASE) for p in MULTI_WORD_PATTERNS]
+    _LOCATION_REGEXES = [re.compile(p, flags=re.IGNORECASE) for p in LOCATION_PATTERNS]
+    _STRIP_TOKENS = frozenset((LEGAL_SUFFIXES | BRANCH_GEO_TOKENS) - KEEP_SUFFIXES)
+    
+    extract_root_name.cache_clear()
+
+
+def _match_exception(words):
+    """Devuelve la institución excepcional más larga con la que empiezan las palabras, o None."""
+    node = _EXCEPTION_TRIE
+    match = None
+    for word in words:
+        node = node.get(word)
+        if node is None:
+            break
+        match = node.get(_TRIE_END, match)
+    return match
+
+
+def _apply_patterns(name_upper, regexes):
+    """Aplica una lista de regex compiladas y re-normaliza espacios."""
+    for regex in regexes:
+        name_upper = regex.sub('', name_upper)
+    return ' '.join(name_upper.split())
+
+
+@lru_cache(maxsize=None)
 def extract_root_name(name: str) -> str:
     """
     Extrae el nombre raíz (root name) de un nombre normalizado.
@@ -196,6 +285,9 @@ def extract_root_name(name: str) -> str:
     3. Elimina patrones multi-palabra (CAYMAN ISLANDS, TRUST CO, etc.)
     4. Elimina sufijos legales y tokens geográficos/sucursales
     
+    Las reglas se compilan una sola vez (ver compile_root_name_rules) y el
+    resultado se memoiza por nombre distinto.
+    
     Args:
         name: Nombre normalizado (ya en mayúsculas y sin puntuación extra)
         
@@ -205,368 +297,443 @@ def extract_root_name(name: str) -> str:
     if not name or not name.strip():
         return name
     
-    # Normalizar espacios y convertir a mayúsculas
-    name_upper = name.upper().strip()
-    
-    # Paso 1: Verificar si el nombre contiene alguna institución excepcional
+    # Paso 1: Verificar si el nombre empieza con alguna institución excepcional
     # (antes de cualquier stripping)
-    # Ordenar excepciones por longitud (más largas primero) para encontrar la mejor coincidencia
-    sorted_exceptions = sorted(EXCEPTION_INSTITUTIONS, key=len, reverse=True)
-    name_words = name_upper.split()
-    
-    for exception in sorted_exceptions:
-        exception_upper = exception.upper().strip()
-        exception_words = exception_upper.split()
-        
-        # Si el nombre coincide exactamente
-        if name_upper == exception_upper:
-            return exception_upper
-        
-        # Si el nombre comienza con la excepción (puede tener más palabras después)
-        if name_upper.startswith(exception_upper + ' '):
-            return exception_upper
-        
-        # Verificar si las primeras palabras del nombre coinciden exactamente con la excepción
-        if len(name_words) >= len(exception_words):
-            if name_words[:len(exception_words)] == exception_words:
-                return exception_upper
-    
-    # Paso 2: Eliminar frases de roles/descriptores usando patrones regex
-    for pattern in ROLE_DESCRIPTOR_PATTERNS:
-        name_upper = re.sub(pattern, '', name_upper, flags=re.IGNORECASE)
-    
-    # Normalizar espacios después de eliminar patrones
-    name_upper = ' '.join(name_upper.split())
+    name_upper = name.upper().strip()
+    exception = _match_exception(name_upper.split())
+    if exception:
+        return exception
     
+    # Paso 2: Eliminar frases de roles/descriptores
+    name_upper = _apply_patterns(name_upper, _ROLE_DESCRIPTOR_REGEXES)
     if not name_upper:
         return name
     
-    # Verificar excepciones nuevamente después de eliminar roles/descriptores
-    for exception in sorted_exceptions:
-        exception_upper = exception.upper().strip()
-        exception_words = exception_upper.split()
-        name_words = name_upper.split()
-        
-        if name_upper == exception_upper or name_upper.startswith(exception_upper + ' '):
-            return exception_upper
-        
-        # Verificar si las primeras palabras coinciden
-        if len(name_words) >= len(exception_words) and name_words[:len(exception_words)] == exception_words:
-            return exception_upper
+    tokens = name_upper.split()
+    exception = _match_exception(tokens)
+    if exception:
+        return exception
     
     # Paso 3: Eliminar patrones multi-palabra (ej: "CAYMAN ISLANDS", "TRUST CO")
-    for pattern in MULTI_WORD_PATTERNS:
-        name_upper = re.sub(pattern, '', name_upper, flags=re.IGNORECASE)
-    
-    # Re-normalizar espacios después de eliminar patrones multi-palabra
-    name_upper = ' '.join(name_upper.split())
-    
-    # Verificar excepciones nuevamente después de eliminar patrones multi-palabra
-    for exception in sorted_exceptions:
-        exception_upper = exception.upper().strip()
-        exception_words = exception_upper.split()
-        name_words = name_upper.split()
-        
-        if name_upper == exception_upper or name_upper.startswith(exception_upper + ' '):
-            return exception_upper
-        
-        # Verificar si las primeras palabras coinciden
-        if len(name_words) >= len(exception_words) and name_words[:len(exception_words)] == exception_words:
-            return exception_upper
+    name_upper = _apply_patterns(name_upper, _MULTI_WORD_REGEXES)
+    tokens = name_upper.split()
+    exception = _match_exception(tokens)
+    if exception:
+        return exception
     
-    # Paso 3.5: Eliminar patrones de ubicación "OF [LOCATION]" (después de verificar excepciones)
+    # Paso 3.5: Eliminar patrones de ubicación "OF [LOCATION]"
     # Esto maneja casos como "UNITED STATES TRUST COMPANY OF NEW YORK"
-    for pattern in LOCATION_PATTERNS:
-        name_upper = re.sub(pattern, '', name_upper, flags=re.IGNORECASE)
-    
-    # Re-normalizar espacios después de eliminar patrones de ubicación
-    name_upper = ' '.join(name_upper.split())
-    
-    # Verificar excepciones nuevamente después de eliminar patrones de ubicación
-    for exception in sorted_exceptions:
-        exception_upper = exception.upper().strip()
-        exception_words = exception_upper.split()
-        name_words = name_upper.split()
-        
-        if name_upper == exception_upper or name_upper.startswith(exception_upper + ' '):
-            return exception_upper
-        
-        # Verificar si las primeras palabras coinciden
-        if len(name_words) >= len(exception_words) and name_words[:len(exception_words)] == exception_words:
-            return exception_upper
-    
+    name_upper = _apply_patterns(name_upper, _LOCATION_REGEXES)
     tokens = name_upper.split()
-    
-    # Filtrar tokens vacíos
-    tokens = [t for t in tokens if t]
-    
     if not tokens:
         return name
     
-    # Paso 4: Eliminar tokens desde el final hacia el principio (donde suelen aparecer)
-    # PRIMERO verificar si el nombre actual (antes de stripping) coincide con una excepción
-    current_name = ' '.join(tokens)
-    for exception in sorted_exceptions:
-        exception_upper = exception.upper().strip()
-        exception_words = exception_upper.split()
-        current_words = current_name.split()
-        
-        if current_name == exception_upper or current_name.startswith(exception_upper + ' '):
-            return exception_upper
-        
-        # Verificar si las primeras palabras coinciden
-        if len(current_words) >= len(exception_words) and current_words[:len(exception_words)] == exception_words:
-            return exception_upper
-    
-    # Intentar reconstruir el nombre eliminando tokens finales que están en nuestras listas
-    # y verificar excepciones en cada paso
-    for i in range(len(tokens), 0, -1):
-        candidate = ' '.join(tokens[:i])
-        candidate_words = candidate.split()
-        
-        for exception in sorted_exceptions:
-            exception_upper = exception.upper().strip()
-            exception_words = exception_upper.split()
-            
-            # Verificar coincidencia exacta
-            if candidate == exception_upper:
-                return exception_upper
-            
-            # Verificar si el candidato comienza con la excepción
-            if candidate.startswith(exception_upper + ' ') or candidate.startswith(exception_upper):
-                return exception_upper
-            
-            # Verificar si las primeras palabras del candidato coinciden con la excepción
-            if len(candidate_words) >= len(exception_words) and candidate_words[:len(exception_words)] == exception_words:
-                return exception_upper
-        
-        # Solo continuar eliminando si el token actual está en nuestras listas de stripping
-        # PERO preservar los sufijos en KEEP_SUFFIXES
-        if i > 0 and (tokens[i-1] in LEGAL_SUFFIXES or tokens[i-1] in BRANCH_GEO_TOKENS) and tokens[i-1] not in KEEP_SUFFIXES:
-            continue
-        else:
-            # Si llegamos a un token que no está en las listas, no tiene sentido seguir
-            break
+    exception = _match_exception(tokens)
+    if exception:
+        return exception
+    
+    # Antes del stripping, una excepción también protege al nombre cuando es
+    # prefijo a nivel de caracteres (ej: "US TRUSTEES" -> "US TRUST")
+    if name_upper.startswith(_EXCEPTION_PREFIXES):
+        for exception in _EXCEPTION_PREFIXES:
+            if name_upper.startswith(exception):
+                return exception
     
-    # Si no se encontró excepción, proceder con el stripping normal
-    filtered_tokens = []
-    i = len(tokens) - 1
-    
-    # Eliminar desde el final hasta encontrar tokens que no sean sufijos/geográficos
-    while i >= 0:
-        token = tokens[i]
-        # Si es un sufijo legal o token geográfico/sucursal, saltarlo
-        # PERO preservar los sufijos en KEEP_SUFFIXES
-        if (token in LEGAL_SUFFIXES or token in BRANCH_GEO_TOKENS) and token not in KEEP_SUFFIXES:
-            i -= 1
-            continue
-        # Si llegamos aquí, es un token que queremos mantener
-        filtered_tokens.insert(0, token)
-        i -= 1
-    
-    # También eliminar cualquier token restante que sea sufijo/geográfico en el medio
-    # (por si acaso quedó alguno)
-    # PERO preservar los sufijos en KEEP_SUFFIXES
-    final_tokens = [t for t in filtered_tokens if (t not in LEGAL_SUFFIXES and t not in BRANCH_GEO_TOKENS) or t in KEEP_SUFFIXES]
+    # Paso 4: Eliminar sufijos legales y tokens geográficos/sucursales
+    # (preservando los sufijos en KEEP_SUFFIXES)
+    final_tokens = [t for t in tokens if t not in _STRIP_TOKENS]
     
     # Asegurar que al menos quede un token
     if not final_tokens:
         return name
     
-    root_name = ' '.join(final_tokens).strip()
+    root_name = ' '.join(final_tokens)
     
-    # Si el root_name resultante está vacío o es muy corto, usar el nombre original
+    # Si el root_name resultante es muy corto, usar el nombre original
     if len(root_name) < 2:
         return name
     
     return root_name
 
 
-def select_standard_name(df, component_indices, name_column='normalized_name', freq_column='frequency'):
+def extract_root_names(names):
+    """
+    Versión por lotes de extract_root_name.
+    
+    Calcula el nombre raíz una sola vez por valor distinto y lo propaga.
+    
+    Args:
+        names: Serie (o iterable) de nombres normalizados
+        
+    Returns:
+        Serie con el nombre raíz de cada elemento (mismo índice que la entrada)
+    """
+    names = names if isinstance(names, pd.Series) else pd.Series(list(names), dtype=object)
+    uniques = names.dropna().unique()
+    roots = {name: extract_root_name(name) for name in uniques}
+    return names.map(roots)
+
+
+compile_root_name_rules()
+
+
+def component_labels(components):
+    """
+    Aplana una lista de componentes en arrays (members, labels).
+    
+    Los miembros se recorren en el mismo orden de iteración que cada set, de
+    modo que las filas del mapeo conservan el orden histórico.
+    
+    Returns:
+        tuple: (members, labels, sizes) - índices del DataFrame, id de componente
+               de cada miembro y tamaño de cada componente
+    """
+    sizes = np.fromiter((len(c) for c in components), dtype=np.int64, count=len(components))
+    members = np.fromiter(itertools.chain.from_iterable(components), dtype=np.int64, count=int(sizes.sum()))
+    labels = np.repeat(np.arange(len(components), dtype=np.int64), sizes)
+    return members, labels, sizes
+
+
+def select_standard_names(names, freqs, labels, sizes):
     """
-    Selecciona el nombre estándar para un componente usando nombres raíz (root names).
-    
-    Estrategia:
-    1. Para componentes con múltiples elementos:
-       - Extrae el nombre raíz de cada candidato (eliminando sufijos legales y tokens geográficos/sucursales)
-       - Agrega frecuencias por nombre raíz (suma de todas las variantes que comparten el mismo root)
-       - Selecciona el nombre raíz con mayor frecuencia total
-       - En caso de empate, prefiere el root derivado del nombre subyacente más corto
-    2. Para singletons: usa el nombre normalizado directamente
+    Selecciona el nombre estándar de todos los componentes a la vez.
+    
+    Los candidatos de cada componente se agrupan por nombre raíz (extract_root_name,
+    sin sufijos legales ni tokens geográficos/sucursales) con un único
+    groupby([componente, root]): gana el root con mayor frecuencia total, luego
+    el de menor longitud del nombre subyacente y luego el orden alfabético del
+    root. Los singletons usan el nombre normalizado.
+    
+    Args:
+        names: Serie con el nombre normalizado de cada miembro (orden de members)
+        freqs: Serie con la frecuencia de cada miembro
+        labels: Array con el id de componente de cada miembro
+        sizes: Array con el tamaño de cada componente
+        
+    Returns:
+        np.ndarray: nombre estándar por componente
     """
-    if len(component_indices) == 1:
-        idx = component_indices[0]
-        return idx, df.loc[idx, name_column]
-    
-    # Construir datos de cada candidato con su root_name
-    component_data = []
-    for idx in component_indices:
-        name = df.loc[idx, name_column]
-        freq = df.loc[idx, freq_column]
-        length = len(name)
-        root_name = extract_root_name(name)
-        component_data.append({
-            'idx': idx,
-            'name': name,
-            'freq': freq,
-            'length': length,
-            'root_name': root_name
+    names = names.reset_index(drop=True)
+    freqs = freqs.reset_index(drop=True)
+    standard_names = np.empty(len(sizes), dtype=object)
+    
+    single = sizes[labels] == 1
+    standard_names[labels[single]] = names[single].to_numpy()
+    
+    multi = ~single
+    if multi.any():
+        multi_names = names[multi]
+        candidates = pd.DataFrame({
+            'label': labels[multi],
+            'root_name': extract_root_names(multi_names).to_numpy(),
+            'freq': freqs[multi].to_numpy(),
+            'length': multi_names.str.len().to_numpy()
         })
+        roots = candidates.groupby(['label', 'root_name'], sort=False).agg(
+            total_freq=('freq', 'sum'),
+            best_length=('length', 'min')
+        ).reset_index()
+        roots = roots.sort_values(
+            ['label', 'total_freq', 'best_length', 'root_name'],
+            ascending=[True, False, True, True]
+        ).drop_duplicates('label')
+        standard_names[roots['label'].to_numpy()] = roots['root_name'].to_numpy()
+    
+    return standard_names
+
+
+def calculate_all_component_stats(matches_df, members, labels, sizes):
+    """
+    Calcula avg/min/max de similitud y needs_review para todos los componentes.
     
-    # Agrupar por root_name y calcular estadísticas agregadas
-    root_groups = {}
-    for item in component_data:
-        root = item['root_name']
-        if root not in root_groups:
-            root_groups[root] = {
-                'root_name': root,
-                'total_freq': 0,
-                'best_length': float('inf'),
-                'best_idx': None
-            }
-        root_groups[root]['total_freq'] += item['freq']
-        if item['length'] < root_groups[root]['best_length']:
-            root_groups[root]['best_length'] = item['length']
-            root_groups[root]['best_idx'] = item['idx']
-    
-    # Seleccionar el mejor root_name:
-    # 1. Mayor frecuencia total
-    # 2. Si hay empate, menor longitud del nombre subyacente
-    # 3. Si sigue habiendo empate, orden alfabético del root_name
-    root_list = list(root_groups.values())
-    root_list.sort(key=lambda x: (-x['total_freq'], x['best_length'], x['root_name']))
-    
-    best_root = root_list[0]
-    best_idx = best_root['best_idx']
-    standard_name = best_root['root_name']
-    
-    return best_idx, standard_name
-
-
-def calculate_component_stats(df, component_indices, matches_df, name_column='normalized_name'):
-    """Calcula estadísticas de un componente para identificar problemas."""
-    if len(component_indices) == 1:
-        return {
-            'avg_similarity': None,
-            'min_similarity': None,
-            'max_similarity': None,
-            'size': 1,
-            'needs_review': False
-        }
-    
-    # Obtener matches dentro de este componente
-    component_matches = matches_df[
-        (matches_df['idx1'].isin(component_indices)) & 
-        (matches_df['idx2'].isin(component_indices))
-    ]
-    
-    if len(component_matches) == 0:
-        return {
-            'avg_similarity': None,
-            'min_similarity': None,
-            'max_similarity': None,
-            'size': len(component_indices),
-            'needs_review': True
-        }
-    
-    similarities = component_matches['similarity'].tolist()
-    avg_sim = sum(similarities) / len(similarities)
-    min_sim = min(similarities)
-    max_sim = max(similarities)
-    
-    # Marcar para revisión si:
-    # - Similitud promedio baja (< 90%)
-    # - Similitud mínima muy baja (< 87%)
-    # - Componente muy grande (> 20 nombres)
-    needs_review = (
-        avg_sim < 90 or 
-        min_sim < 87 or 
-        len(component_indices) > 20
-    )
+    Etiqueta cada match con el componente de sus dos extremos y agrega con un
+    único groupby (solo cuentan los matches con ambos extremos en el mismo componente).
     
-    return {
-        'avg_similarity': avg_sim,
-        'min_similarity': min_sim,
-        'max_similarity': max_sim,
-        'size': len(component_indices),
-        'needs_review': needs_review
-    }
+    Returns:
+        DataFrame indexado por id de componente con columnas
+        avg_similarity, min_similarity, max_similarity, size, needs_review
+    """
+    n_components = len(sizes)
+    stats = pd.DataFrame({
+        'avg_similarity': np.full(n_components, np.nan),
+        'min_similarity': np.full(n_components, np.nan),
+        'max_similarity': np.full(n_components, np.nan),
+        'size': sizes,
+        # Componentes con varios nombres pero sin matches internos se revisan
+        'needs_review': sizes > 1
+    })
+    
+    if len(matches_df) > 0 and len(members) > 0:
+        idx1 = matches_df['idx1'].to_numpy(dtype=np.int64)
+        idx2 = matches_df['idx2'].to_numpy(dtype=np.int64)
+        label_of = np.full(max(members.max(), idx1.max(), idx2.max()) + 1, -1, dtype=np.int64)
+        label_of[members] = labels
+        edge_labels = label_of[idx1]
+        internal = (edge_labels >= 0) & (edge_labels == label_of[idx2])
+        internal &= sizes[np.where(edge_labels >= 0, edge_labels, 0)] > 1
+        
+        edges = pd.DataFrame({
+            'label': edge_labels[internal],
+            'similarity': matches_df['similarity'].to_numpy(dtype=float)[internal]
+        })
+        agg = edges.groupby('label', sort=True)['similarity'].agg(['sum', 'count', 'min', 'max'])
+        component_ids = agg.index.to_numpy()
+        avg_sim = (agg['sum'] / agg['count']).to_numpy()
+        min_sim = agg['min'].to_numpy()
+        
+        stats.loc[component_ids, 'avg_similarity'] = avg_sim
+        stats.loc[component_ids, 'min_similarity'] = min_sim
+        stats.loc[component_ids, 'max_similarity'] = agg['max'].to_numpy()
+        # Marcar para revisión si:
+        # - Similitud promedio baja (< 90%)
+        # - Similitud mínima muy baja (< 87%)
+        # - Componente muy grande (> 20 nombres)
+        stats.loc[component_ids, 'needs_review'] = (
+            (avg_sim < 90) | (min_sim < 87) | (sizes[component_ids] > 20)
+        )
+    
+    return stats
 
 
 def process_components(df, components, matches_df, name_column='normalized_name', 
-                      freq_column='frequency', entity_type='financial'):
+                      freq_column='frequency', entity_type='financial', component_ids=None):
     """
     Procesa todos los componentes y asigna IDs y nombres estándar.
     
+    Trabaja sobre el array de etiquetas de componente: los nombres raíz se
+    calculan una sola vez, el nombre estándar y las estadísticas se obtienen
+    con un groupby cada uno y el mapeo se arma columna a columna.
+    
+    Args:
+        component_ids: Ids globales de los componentes (por defecto, su posición).
+                       Lo usan las particiones para conservar los entity_id.
+    
     Returns:
         tuple: (DataFrame con mapeo, DataFrame con casos para revisión)
     """
-    mapping_data = []
-    review_cases = []
-    
     print(f"   Procesando {len(components):,} componentes...")
     
-    for component_id, component_indices in enumerate(components):
-        # Seleccionar nombre estándar
-        std_idx, std_name = select_standard_name(df, list(component_indices), name_column, freq_column)
-        
-        # Calcular estadísticas
-        stats = calculate_component_stats(df, list(component_indices), matches_df, name_column)
-        
-        # Si necesita revisión, agregar a casos problemáticos
-        if stats['needs_review']:
-            component_names = [df.loc[idx, name_column] for idx in component_indices]
-            review_cases.append({
-                'component_id': component_id,
-                'size': stats['size'],
-                'avg_similarity': stats['avg_similarity'],
-                'min_similarity': stats['min_similarity'],
-                'standard_name': std_name,
-                'all_names': component_names
-            })
-        
-        # Crear entrada de mapeo para cada nombre en el componente
-        for idx in component_indices:
-            original_name = df.loc[idx, 'original_name']
-            normalized_name = df.loc[idx, name_column]
-            freq = df.loc[idx, freq_column]
-            
-            mapping_data.append({
-                'entity_id': f"{entity_type}_{component_id}",
-                'original_name': original_name,
-                'normalized_name': normalized_name,
-                'standard_name': std_name,
-                'frequency': freq,
-                'component_size': stats['size'],
-                'avg_similarity': stats['avg_similarity'],
-                'min_similarity': stats['min_similarity'],
-                'needs_review': stats['needs_review']
-            })
-    
-    mapping_df = pd.DataFrame(mapping_data)
-    review_df = pd.DataFrame(review_cases) if review_cases else pd.DataFrame()
+    members, labels, sizes = component_labels(components)
+    rows = df.loc[members].reset_index(drop=True)
+    names = rows[name_column]
+    
+    standard_names = select_standard_names(names, rows[freq_column], labels, sizes)
+    stats = calculate_all_component_stats(matches_df, members, labels, sizes)
+    
+    if component_ids is None:
+        component_ids = np.arange(len(sizes))
+    component_ids = np.asarray(component_ids, dtype=np.int64)
+    component_entity_ids = np.array([f"{entity_type}_{component_id}" for component_id in component_ids], dtype=object)
+    member_stats = stats.iloc[labels].reset_index(drop=True)
+    mapping_df = pd.DataFrame({
+        'entity_id': component_entity_ids[labels],
+        'original_name': rows['original_name'],
+        'normalized_name': names,
+        'standard_name': standard_names[labels],
+        'frequency': rows[freq_column],
+        'component_size': member_stats['size'],
+        'avg_similarity': member_stats['avg_similarity'],
+        'min_similarity': member_stats['min_similarity'],
+        'needs_review': member_stats['needs_review'].astype(bool)
+    })
+    
+    # Casos para revisión: los miembros de cada componente son contiguos en members
+    review_ids = np.flatnonzero(stats['needs_review'].to_numpy(dtype=bool))
+    if len(review_ids) > 0:
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        name_values = names.to_numpy()
+        review_df = pd.DataFrame({
+            'component_id': component_ids[review_ids],
+            'size': sizes[review_ids],
+            'avg_similarity': stats['avg_similarity'].to_numpy()[review_ids],
+            'min_similarity': stats['min_similarity'].to_numpy()[review_ids],
+            'standard_name': standard_names[review_ids],
+            'all_names': [list(name_values[offsets[c]:offsets[c + 1]]) for c in review_ids]
+        })
+    else:
+        review_df = pd.DataFrame()
     
     return mapping_df, review_df
 
 
+def partition_components(sizes, n_partitions):
+    """
+    Divide los componentes en rangos contiguos de ids balanceados por número de miembros.
+    
+    Al ser rangos contiguos, concatenar los resultados en orden de partición
+    reproduce el orden de componentes (y por tanto los mismos entity_id).
+    
+    Returns:
+        list: lista de (inicio, fin) de ids de componente, sin rangos vacíos
+    """
+    n_partitions = max(1, min(int(n_partitions), len(sizes)))
+    cumulative = np.cumsum(sizes)
+    total = cumulative[-1] if len(cumulative) else 0
+    targets = total * np.arange(1, n_partitions) / n_partitions
+    cuts = np.searchsorted(cumulative, targets, side='left') + 1
+    bounds = np.unique(np.concatenate(([0], cuts, [len(sizes)])))
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def _process_partition(partition_id, df, components, component_ids, matches_df,
+                       name_column, freq_column, entity_type):
+    """Procesa una partición en un worker y mide su tiempo."""
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    mapping_df, review_df = process_components(
+        df, components, matches_df, name_column, freq_column, entity_type,
+        component_ids=component_ids
+    )
+    timing = {
+        'partition': partition_id,
+        'first_component': int(component_ids[0]) if len(component_ids) else None,
+        'last_component': int(component_ids[-1]) if len(component_ids) else None,
+        'components': len(components),
+        'names': len(mapping_df),
+        'edges': len(matches_df),
+        'wall_seconds': time.perf_counter() - start_wall,
+        'cpu_seconds': time.process_time() - start_cpu
+    }
+    return mapping_df, review_df, timing
+
+
+def process_components_partitioned(df, components, matches_df, name_column='normalized_name',
+                                   freq_column='frequency', entity_type='financial',
+                                   n_partitions=4, max_workers=None):
+    """
+    Procesa los componentes en N particiones en paralelo.
+    
+    Cada worker recibe solo las filas de sus componentes (columnas original_name,
+    nombre y frecuencia) y los matches internos de esos componentes. Los resultados
+    se concatenan en orden de componente, así que entity_id es determinista e igual
+    al de process_components.
+    
+    Args:
+        n_partitions: Número de particiones
+        max_workers: Número de procesos (por defecto, n_partitions)
+        
+    Returns:
+        tuple: (DataFrame con mapeo, DataFrame con casos para revisión,
+                DataFrame con tiempos por partición)
+    """
+    members, labels, sizes = component_labels(components)
+    partitions = partition_components(sizes, n_partitions)
+    
+    print(f"   Procesando {len(components):,} componentes en {len(partitions)} particiones...")
+    
+    if len(partitions) <= 1:
+        # Una sola partición: no compensa levantar procesos
+        mapping_df, review_df, timing = _process_partition(
+            0, df, components, np.arange(len(components)), matches_df,
+            name_column, freq_column, entity_type
+        )
+        return mapping_df, review_df, pd.DataFrame([timing])
+    
+    # Partición de cada índice del DataFrame, para repartir filas y matches
+    partition_of_label = np.empty(len(sizes), dtype=np.int64)
+    for partition_id, (start, end) in enumerate(partitions):
+        partition_of_label[start:end] = partition_id
+    
+    idx1 = matches_df['idx1'].to_numpy(dtype=np.int64)
+    idx2 = matches_df['idx2'].to_numpy(dtype=np.int64)
+    max_index = max([0] + [int(a.max()) for a in (members, idx1, idx2) if len(a)])
+    partition_of_index = np.full(max_index + 1, -1, dtype=np.int64)
+    partition_of_index[members] = partition_of_label[labels]
+    edge_partition = partition_of_index[idx1]
+    edge_partition = np.where(edge_partition == partition_of_index[idx2], edge_partition, -1)
+    
+    columns = list(dict.fromkeys(['original_name', name_column, freq_column]))
+    edge_columns = matches_df[['idx1', 'idx2', 'similarity']]
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    
+    wall_start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers or len(partitions)) as executor:
+        futures = {}
+        for partition_id, (start, end) in enumerate(partitions):
+            partition_members = members[offsets[start]:offsets[end]]
+            futures[executor.submit(
+                _process_partition,
+                partition_id,
+                df.loc[partition_members, columns],
+                # Listas y no sets: el orden de iteración de un set puede cambiar al serializarlo
+                [list(c) for c in components[start:end]],
+                np.arange(start, end),
+                edge_columns[edge_partition == partition_id],
+                name_column, freq_column, entity_type
+            )] = partition_id
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    
+    ordered = [results[partition_id] for partition_id in range(len(partitions))]
+    mapping_df = pd.concat([r[0] for r in ordered], ignore_index=True)
+    review_frames = [r[1] for r in ordered if len(r[1]) > 0]
+    review_df = pd.concat(review_frames, ignore_index=True) if review_frames else pd.DataFrame()
+    timing_df = pd.DataFrame([r[2] for r in ordered])
+    
+    print(f"   ✓ {len(partitions)} particiones procesadas en {time.perf_counter() - wall_start:.2f}s")
+    
+    return mapping_df, review_df, timing_df
+
+
+def print_partition_timing(timing_df):
+    """Imprime el reporte de tiempos por partición."""
+    print("   Tiempos por partición:")
+    for row in timing_df.to_dict('records'):
+        print(f"     - Partición {row['partition']}: componentes {row['first_component']:,}-{row['last_component']:,}, "
+              f"{row['names']:,} nombres, {row['edges']:,} matches, "
+              f"{row['wall_seconds']:.2f}s (CPU {row['cpu_seconds']:.2f}s)")
+
+
+def _run_process_components(df, components, matches_df, entity_type, n_partitions=1, max_workers=None):
+    """Ejecuta process_components, en modo particionado si n_partitions > 1."""
+    if n_partitions and n_partitions > 1:
+        mapping, review, timing = process_components_partitioned(
+            df, components, matches_df, 'normalized_name', 'frequency', entity_type,
+            n_partitions=n_partitions, max_workers=max_workers
+        )
+        print_partition_timing(timing)
+        return mapping, review
+    return process_components(df, components, matches_df, 'normalized_name', 'frequency', entity_type)
+
+
+def _apply_stable_ids(mapping, review, previous_mapping_file, entity_type):
+    """
+    Reconcilia los entity_id de los componentes con el mapeo completo anterior.
+    
+    Returns:
+        tuple: (mapping, review) con IDs estables
+    """
+    
+    previous = entity_ids.load_previous_mapping(previous_mapping_file)
+    mapping, id_map = entity_ids.assign_stable_entity_ids(mapping, previous, entity_type)
+    
+    if len(review) > 0:
+        stable_ids = pd.Series([f"{entity_type}_{c}" for c in review['component_id']]).map(id_map)
+        review = review.copy()
+        review['component_id'] = entity_ids.entity_number(stable_ids).astype(int).to_numpy()
+    
+    previous_ids = set(previous['entity_id']) if previous is not None else set()
+    reused = sum(1 for stable_id in id_map.values() if stable_id in previous_ids)
+    print(f"   ✓ IDs estables ({entity_type}): {reused:,} reutilizados, {len(id_map) - reused:,} nuevos")
+    
+    return mapping, review
+
+
 if __name__ == "__main__":
     # Para ejecución independiente
     base_dir = Path(__file__).parent.parent.parent
     results_dir = base_dir / "results" / "intermediate"
     final_results_dir = base_dir / "results" / "final"
     
-    financial_df = pd.read_csv(results_dir / "financial_normalized.csv")
-    non_financial_df = pd.read_csv(results_dir / "non_financial_normalized.csv")
-    financial_matches_df = pd.read_csv(results_dir / "financial_matches.csv")
-    non_financial_matches_df = pd.read_csv(results_dir / "non_financial_matches.csv")
-    
-    with open(results_dir / "financial_components.json", 'r', encoding='utf-8') as f:
-        financial_components_json = json.load(f)
-        financial_components = [set(int(idx) for idx in comp) for comp in financial_components_json.values()]
-    
-    with open(results_dir / "non_financial_components.json", 'r', encoding='utf-8') as f:
-        non_financial_components_json = json.load(f)
-        non_financial_components = [set(int(idx) for idx in comp) for comp in non_financial_components_json.values()]
+    financial_df = artifacts.load_table(results_dir, "financial_normalized")
+    non_financial_df = artifacts.load_table(results_dir, "non_financial_normalized")
+    financial_matches_df = artifacts.load_table(results_dir, "financial_matches", columns=artifacts.MATCH_EDGE_COLUMNS)
+    non_financial_matches_df = artifacts.load_table(
+        results_dir, "non_financial_matches", columns=artifacts.MATCH_EDGE_COLUMNS
+    )
+    financial_components = artifacts.load_components(results_dir, "financial_components")
+    non_financial_components = artifacts.load_components(results_dir, "non_financial_components")
     
     run_grouping(financial_df, non_financial_df, financial_components, non_financial_components,
                  financial_matches_df, non_financial_matches_df, base_dir, transaction_type=None)
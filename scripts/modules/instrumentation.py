@@ -0,0 +1,281 @@
+"""
+Módulo de Instrumentación
+=========================
+Mide tiempo y memoria por fase y cuenta operaciones del camino crítico.
+
+- start_run() activa la medición del proceso; sin ella, phase() y count() no hacen nada.
+- Cada `with phase(nombre):` registra tiempo real y de CPU, el pico de RSS de la
+  fase y los contadores incrementados con count() durante la fase. El pico por
+  fase solo existe en Linux: se reinicia al empezar la fase (/proc/self/clear_refs)
+  y se lee al terminar (VmHWM). En otros sistemas el pico de RSS se reporta una
+  vez por ejecución.
+- Con trace_memory=True registra además el pico de memoria de tracemalloc dentro
+  de la fase (tracemalloc multiplica el tiempo de ejecución, por eso es opcional).
+- Con profile=True cada fase guarda además sus estadísticas de cProfile
+  (profiles/<fase>.prof y un resumen .txt por tiempo acumulado).
+- finish_run() escribe run_report.json con todas las fases y los totales.
+"""
+
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Líneas del resumen de cProfile por fase
+PROFILE_SUMMARY_LINES = 40
+
+_active_run = None
+
+
+def peak_rss_mb():
+    """
+    Pico de memoria residente del proceso en MB (None si no se puede medir).
+
+    En Linux es VmHWM, que reset_peak_rss() reinicia; en otros sistemas, el
+    pico de toda la vida del proceso (ru_maxrss).
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(max_rss / divisor, 1)
+
+
+def reset_peak_rss():
+    """
+    Reinicia el pico de RSS del proceso al RSS actual (solo Linux).
+
+    Returns:
+        True si se reinició (entonces peak_rss_mb() mide desde ahora)
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class RunReport:
+    """Mediciones de una ejecución del pipeline."""
+
+    def __init__(self, pipeline, output_dir, profile=False, trace_memory=False):
+        self.pipeline = pipeline
+        self.output_dir = output_dir
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.started_at = datetime.now()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.phases = []
+        self.current = None
+        # Pico de RSS anterior al último reinicio de una fase
+        self.peak_rss_mb = None
+
+    def observe_peak_rss(self, peak=None):
+        """Acumula un pico de RSS (por defecto, el actual) en el de la ejecución."""
+        peak = peak_rss_mb() if peak is None else peak
+        if peak is not None and (self.peak_rss_mb is None or peak > self.peak_rss_mb):
+            self.peak_rss_mb = peak
+
+    def to_dict(self):
+        totals = {}
+        for record in self.phases:
+            for name, value in record['counters'].items():
+                totals[name] = totals.get(name, 0) + value
+        self.observe_peak_rss()
+        return {
+            'pipeline': self.pipeline,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'wall_seconds': round(time.perf_counter() - self.start_wall, 3),
+            'cpu_seconds': round(time.process_time() - self.start_cpu, 3),
+            'peak_rss_mb': self.peak_rss_mb,
+            'profile': self.profile,
+            'trace_memory': self.trace_memory,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'argv': sys.argv,
+            'counters': totals,
+            'phases': self.phases
+        }
+
+
+def start_run(pipeline, output_dir, profile=False, trace_memory=False):
+    """
+    Activa la instrumentación para este proceso.
+
+    Args:
+        pipeline: Nombre del pipeline ('scripts' o 'scripts_transaction')
+        output_dir: Directorio donde se escriben run_report.json y profiles/
+        profile: Si True, guarda estadísticas de cProfile por fase
+        trace_memory: Si True, mide el pico de tracemalloc por fase
+
+    Returns:
+        RunReport activo
+    """
+    global _active_run
+    _active_run = RunReport(pipeline, output_dir, profile=profile, trace_memory=trace_memory)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return _active_run
+
+
+def active_run():
+    """RunReport activo (o None)."""
+    return _active_run
+
+
+def count(name, n=1):
+    """Incrementa un contador de la fase en curso (sin efecto fuera de una fase)."""
+    run = _active_run
+    if run is not None and run.current is not None:
+        counters = run.current['counters']
+        counters[name] = counters.get(name, 0) + n
+
+
+def record_skipped(name):
+    """Registra una fase que no se ejecutó porque sus resultados estaban al día."""
+    if _active_run is not None:
+        _active_run.phases.append({'name': name, 'status': 'skipped', 'counters': {}})
+
+
+def add_phases(phases, **extra):
+    """Añade fases medidas en otro proceso (p. ej. un trabajo de --jobs)."""
+    if _active_run is not None:
+        for record in phases:
+            _active_run.phases.append({**record, **extra})
+
+
+def _profile_basename(name):
+    return name.replace('/', '__').replace(' ', '_')
+
+
+@contextmanager
+def phase(name):
+    """Mide una fase del pipeline (sin efecto si no hay instrumentación activa)."""
+    run = _active_run
+    if run is None or run.current is not None:
+        yield
+        return
+
+    record = {'name': name, 'status': 'ok', 'pid': os.getpid(), 'counters': {}}
+    run.current = record
+    if run.trace_memory and tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    # Sin reinicio, el pico sería el de toda la ejecución y no el de la fase
+    run.observe_peak_rss()
+    per_phase_rss = reset_peak_rss()
+    profiler = cProfile.Profile() if run.profile else None
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    except BaseException:
+        record['status'] = 'error'
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record['wall_seconds'] = round(time.perf_counter() - start_wall, 3)
+        record['cpu_seconds'] = round(time.process_time() - start_cpu, 3)
+        if per_phase_rss:
+            record['peak_rss_mb'] = peak_rss_mb()
+            run.observe_peak_rss(record['peak_rss_mb'])
+        if run.trace_memory and tracemalloc.is_tracing():
+            record['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        if profiler is not None:
+            record['profile_file'] = _dump_profile(profiler, run.output_dir, name)
+        run.current = None
+        run.phases.append(record)
+
+
+def _dump_profile(profiler, output_dir, name):
+    """Guarda las estadísticas de cProfile de una fase (.prof y resumen .txt)."""
+    profiles_dir = output_dir / "profiles"
+    profiles_dir.mkdir(parents=True, exist_ok=True)
+    prof_file = profiles_dir / f"{_profile_basename(name)}.prof"
+    profiler.dump_stats(prof_file)
+
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LINES)
+    with open(prof_file.with_suffix('.txt'), 'w', encoding='utf-8') as f:
+        f.write(summary.getvalue())
+    return str(prof_file)
+
+
+def stop_run():
+    """
+    Desactiva la instrumentación sin escribir el reporte.
+
+    Returns:
+        RunReport que estaba activo (o None)
+    """
+    global _active_run
+    run = _active_run
+    _active_run = None
+    if run is not None and run.trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return run
+
+
+def finish_run():
+    """
+    Escribe run_report.json y desactiva la instrumentación.
+
+    Returns:
+        Path del reporte (o None si no había instrumentación activa)
+    """
+    run = stop_run()
+    if run is None:
+        return None
+
+    run.output_dir.mkdir(parents=True, exist_ok=True)
+    report_file = run.output_dir / "run_report.json"
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(run.to_dict(), f, indent=2)
+    return report_file
+
+
+def print_phase_summary(report_file):
+    """Imprime un resumen de tiempos y memoria a partir de run_report.json."""
+    with open(report_file, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+
+    print("\n" + "=" * 80)
+    print("REPORTE DE EJECUCIÓN")
+    print("=" * 80)
+    print(f"   {'Fase':<36} {'Real':>8} {'CPU':>8} {'RSS MB':>8} {'Heap MB':>8}")
+    for record in report['phases']:
+        if record['status'] == 'skipped':
+            print(f"   {record['name']:<36} {'(al día)':>8}")
+            continue
+        heap = record.get('tracemalloc_peak_mb')
+        rss = record.get('peak_rss_mb')
+        print(f"   {record['name']:<36} {record['wall_seconds']:>7.1f}s {record['cpu_seconds']:>7.1f}s "
+              f"{rss if rss is not None else '-':>8} {heap if heap is not None else '-':>8}")
+    for name, value in report['counters'].items():
+        print(f"   - {name}: {value:,}")
+    print(f"   ✓ {report_file}")
@@ -5,19 +5,24 @@ Implementa fuzzy matching usando WRatio de rapidfuzz.
 """
 
 import pandas as pd
-import json
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 from rapidfuzz import fuzz
 import itertools
+from . import artifacts, checkpoint, instrumentation, work_queue
 
 # Configuración de matching
 SIMILARITY_THRESHOLD = 88  # Threshold de similitud (0-100)
 MIN_BLOCK_SIZE_FOR_MATCHING = 2  # Solo hacer matching en bloques con al menos 2 nombres
+# Similitud mínima entre cualquier par de un componente (validate_and_split_components)
+MIN_PAIRWISE_SIMILARITY = {'financial': 88, 'non_financial': 85}
+# Threshold para fusionar entidades con las mismas dos primeras palabras
+MERGE_SIMILARITY_THRESHOLD = 80
 
 
-def run_matching(financial_df, non_financial_df, financial_blocks, non_financial_blocks, base_dir=None, transaction_type='pledge'):
+def run_matching(financial_df, non_financial_df, financial_blocks, non_financial_blocks, base_dir=None, transaction_type='pledge',
+                 resume=False, queue_dir=None, local_workers=0):
     """
     Ejecuta fuzzy matching en los bloques.
     
@@ -28,6 +33,11 @@ def run_matching(financial_df, non_financial_df, financial_blocks, non_financial
         non_financial_blocks: Diccionario de bloques no financieros
         base_dir: Directorio base del proyecto
         transaction_type: Tipo de transacción ('pledge' o 'release')
+        resume: Si True, reutiliza los bloques terminados del checkpoint de una
+            ejecución interrumpida (results/intermediate/checkpoints/)
+        queue_dir: Directorio compartido de la cola de trabajo. Si se indica, los
+            bloques se reparten entre workers (ver modules/work_queue.py)
+        local_workers: Workers que se arrancan en esta máquina con queue_dir
         
     Returns:
         tuple: (financial_components, non_financial_components, financial_matches_df, non_financial_matches_df)
@@ -52,13 +62,30 @@ def run_matching(financial_df, non_financial_df, financial_blocks, non_financial
     financial_df = financial_df.reset_index(drop=True)
     non_financial_df = non_financial_df.reset_index(drop=True)
     
+    suffix = f"_{transaction_type}" if transaction_type else ""
+    financial_checkpoint = checkpoint.checkpoint_dir(results_dir, f"financial_matches{suffix}")
+    non_financial_checkpoint = checkpoint.checkpoint_dir(results_dir, f"non_financial_matches{suffix}")
+    
     # Encontrar matches
     print("1. Buscando matches con fuzzy matching...")
     print("\n   Financial entities:")
-    financial_matches = process_all_blocks(financial_df, financial_blocks, 'normalized_name', SIMILARITY_THRESHOLD)
+    if queue_dir is None:
+        financial_matches = process_all_blocks(financial_df, financial_blocks, 'normalized_name', SIMILARITY_THRESHOLD,
+                                               checkpoint_dir=financial_checkpoint, resume=resume)
+    else:
+        financial_matches = work_queue.run_queue_job(f"financial_matches{suffix}", financial_df, financial_blocks,
+                                                     queue_dir, threshold=SIMILARITY_THRESHOLD,
+                                                     local_workers=local_workers)
     
     print("\n   Non-financial entities:")
-    non_financial_matches = process_all_blocks(non_financial_df, non_financial_blocks, 'normalized_name', SIMILARITY_THRESHOLD)
+    if queue_dir is None:
+        non_financial_matches = process_all_blocks(non_financial_df, non_financial_blocks, 'normalized_name',
+                                                   SIMILARITY_THRESHOLD, checkpoint_dir=non_financial_checkpoint,
+                                                   resume=resume)
+    else:
+        non_financial_matches = work_queue.run_queue_job(f"non_financial_matches{suffix}", non_financial_df,
+                                                         non_financial_blocks, queue_dir,
+                                                         threshold=SIMILARITY_THRESHOLD, local_workers=local_workers)
     
     print(f"\n   ✓ Total matches encontrados:")
     print(f"     - Financial: {len(financial_matches):,} pares de matches")
@@ -76,7 +103,7 @@ def run_matching(financial_df, non_financial_df, financial_blocks, non_financial
     print("   Financial entities:")
     financial_components = validate_and_split_components(
         financial_components, financial_df, financial_matches, 'normalized_name', 
-        min_pairwise_similarity=88
+        min_pairwise_similarity=MIN_PAIRWISE_SIMILARITY['financial']
     )
     print(f"   ✓ {len(financial_components):,} grupos después de validación")
     
@@ -84,7 +111,7 @@ def run_matching(financial_df, non_financial_df, financial_blocks, non_financial
     print("\n2.1. Fusionando entidades relacionadas (mismo nombre base)...")
     print("   Financial entities:")
     financial_components_merged = merge_related_entities_by_first_two_words(
-        financial_components, financial_df, 'normalized_name', similarity_threshold=80
+        financial_components, financial_df, 'normalized_name', similarity_threshold=MERGE_SIMILARITY_THRESHOLD
     )
     print(f"   ✓ {len(financial_components_merged):,} grupos después de fusión")
     financial_components = financial_components_merged
@@ -98,14 +125,14 @@ def run_matching(financial_df, non_financial_df, financial_blocks, non_financial
     print("   Non-financial entities:")
     non_financial_components = validate_and_split_components(
         non_financial_components, non_financial_df, non_financial_matches, 'normalized_name',
-        min_pairwise_similarity=85
+        min_pairwise_similarity=MIN_PAIRWISE_SIMILARITY['non_financial']
     )
     print(f"   ✓ {len(non_financial_components):,} grupos después de validación")
     
     # Post-procesamiento para non-financial
     print("   Non-financial entities:")
     non_financial_components_merged = merge_related_entities_by_first_two_words(
-        non_financial_components, non_financial_df, 'normalized_name', similarity_threshold=80
+        non_financial_components, non_financial_df, 'normalized_name', similarity_threshold=MERGE_SIMILARITY_THRESHOLD
     )
     print(f"   ✓ {len(non_financial_components_merged):,} grupos después de fusión")
     non_financial_components = non_financial_components_merged
@@ -122,34 +149,34 @@ def run_matching(financial_df, non_financial_df, financial_blocks, non_financial
     non_financial_matches_df['name1'] = non_financial_matches_df['idx1'].apply(lambda x: non_financial_df.loc[x, 'normalized_name'])
     non_financial_matches_df['name2'] = non_financial_matches_df['idx2'].apply(lambda x: non_financial_df.loc[x, 'normalized_name'])
     
-    suffix = f"_{transaction_type}" if transaction_type else ""
-    output_file_financial_matches = results_dir / f"financial_matches{suffix}.csv"
-    output_file_non_financial_matches = results_dir / f"non_financial_matches{suffix}.csv"
-    
-    financial_matches_df.to_csv(output_file_financial_matches, index=False)
-    non_financial_matches_df.to_csv(output_file_non_financial_matches, index=False)
+    output_file_financial_matches = artifacts.save_table(financial_matches_df, results_dir, f"financial_matches{suffix}")
+    output_file_non_financial_matches = artifacts.save_table(
+        non_financial_matches_df, results_dir, f"non_financial_matches{suffix}"
+    )
     
     print(f"   ✓ Matches guardados:")
     print(f"     - {output_file_financial_matches}")
     print(f"     - {output_file_non_financial_matches}")
     
     # Guardar componentes (grupos)
-    financial_components_json = {str(i): [int(idx) for idx in comp] for i, comp in enumerate(financial_components)}
-    non_financial_components_json = {str(i): [int(idx) for idx in comp] for i, comp in enumerate(non_financial_components)}
-    
-    output_file_financial_components = results_dir / f"financial_components{suffix}.json"
-    output_file_non_financial_components = results_dir / f"non_financial_components{suffix}.json"
-    
-    with open(output_file_financial_components, 'w', encoding='utf-8') as f:
-        json.dump(financial_components_json, f, indent=2)
-    
-    with open(output_file_non_financial_components, 'w', encoding='utf-8') as f:
-        json.dump(non_financial_components_json, f, indent=2)
+    output_file_financial_components = artifacts.save_groups(
+        dict(enumerate(financial_components)), results_dir, f"financial_components{suffix}"
+    )
+    output_file_non_financial_components = artifacts.save_groups(
+        dict(enumerate(non_financial_components)), results_dir, f"non_financial_components{suffix}"
+    )
     
     print(f"   ✓ Componentes (grupos) guardados:")
     print(f"     - {output_file_financial_components}")
     print(f"     - {output_file_non_financial_components}")
     
+    # Los resultados ya están guardados: los checkpoints y trabajos de la cola dejan de hacer falta
+    checkpoint.remove_checkpoint(financial_checkpoint)
+    checkpoint.remove_checkpoint(non_financial_checkpoint)
+    if queue_dir is not None:
+        work_queue.remove_job(work_queue.job_dir(queue_dir, f"financial_matches{suffix}"))
+        work_queue.remove_job(work_queue.job_dir(queue_dir, f"non_financial_matches{suffix}"))
+    
     # Estadísticas
     print("\n4. Estadísticas de matching:")
     print("\n   Financial entities:")
@@ -176,55 +203,112 @@ def run_matching(financial_df, non_financial_df, financial_blocks, non_financial
     return financial_components, non_financial_components, financial_matches_df, non_financial_matches_df
 
 
-def calculate_similarity(name1, name2):
-    """Calcula similitud entre dos nombres usando WRatio."""
+def calculate_similarity(name1, name2, scorer=None):
+    """Calcula similitud entre dos nombres usando WRatio (u otro scorer de rapidfuzz)."""
     if pd.isna(name1) or pd.isna(name2):
         return 0.0
     
-    return fuzz.WRatio(str(name1), str(name2))
+    if scorer is None:
+        scorer = fuzz.WRatio
+    return scorer(str(name1), str(name2))
 
 
-def find_matches_in_block(df, block_indices, name_column='normalized_name', threshold=SIMILARITY_THRESHOLD):
-    """Encuentra matches dentro de un bloque."""
+def find_matches_in_block(df, block_indices, name_column='normalized_name', threshold=SIMILARITY_THRESHOLD,
+                          score_cache=None, names=None, scorer=None):
+    """
+    Encuentra matches dentro de un bloque.
+    
+    Si se pasa score_cache (dict (nombre1, nombre2) -> similitud), cada par de
+    nombres se puntúa una sola vez aunque aparezca en varios bloques o tipos.
+    names (dict índice -> nombre, de df[name_column].to_dict()) evita buscar cada
+    nombre con df.loc. scorer es una función de rapidfuzz.fuzz (None = WRatio);
+    la caché no distingue scorers, así que se usa una caché por scorer.
+    """
     matches = []
     
     if len(block_indices) < MIN_BLOCK_SIZE_FOR_MATCHING:
         return matches
     
+    if names is None:
+        names = {idx: df.loc[idx, name_column] for idx in block_indices}
+    
+    pairs_scored = 0
     for idx1, idx2 in itertools.combinations(block_indices, 2):
-        name1 = df.loc[idx1, name_column]
-        name2 = df.loc[idx2, name_column]
+        name1 = names[idx1]
+        name2 = names[idx2]
         
-        similarity = calculate_similarity(name1, name2)
+        if score_cache is None:
+            similarity = calculate_similarity(name1, name2, scorer)
+            pairs_scored += 1
+        else:
+            similarity = score_cache.get((name1, name2))
+            if similarity is None:
+                similarity = calculate_similarity(name1, name2, scorer)
+                score_cache[(name1, name2)] = similarity
+                pairs_scored += 1
         
         if similarity >= threshold:
             matches.append((idx1, idx2, similarity))
     
+    instrumentation.count('pairs_compared', len(block_indices) * (len(block_indices) - 1) // 2)
+    instrumentation.count('pairs_scored', pairs_scored)
+    instrumentation.count('pairs_accepted', len(matches))
     return matches
 
 
-def process_all_blocks(df, blocks, name_column='normalized_name', threshold=SIMILARITY_THRESHOLD):
-    """Procesa todos los bloques y encuentra matches."""
+def process_all_blocks(df, blocks, name_column='normalized_name', threshold=SIMILARITY_THRESHOLD, score_cache=None,
+                       scorer=None, checkpoint_dir=None, resume=False):
+    """
+    Procesa todos los bloques y encuentra matches (score_cache y scorer: ver find_matches_in_block).
+    
+    Con checkpoint_dir, los matches de los bloques terminados se confirman en disco
+    cada CHECKPOINT_INTERVAL_SECONDS (ver modules/checkpoint.py). Con resume=True,
+    los bloques del checkpoint no se vuelven a comparar: sus matches se reutilizan en
+    su posición, así que el resultado es el mismo que sin interrupción.
+    """
     all_matches = []
     blocks_processed = 0
     blocks_with_matches = 0
+    blocks_resumed = 0
     
     total_blocks = len(blocks)
     
     print(f"   Procesando {total_blocks:,} bloques...")
-    
-    for blocking_key, block_indices in blocks.items():
+    names = df[name_column].to_dict()
+    
+    store = None
+    if checkpoint_dir is not None:
+        fingerprint = checkpoint.blocks_fingerprint(blocks, names, threshold, scorer)
+        store = checkpoint.MatchCheckpoint(checkpoint_dir, fingerprint, total_blocks, resume=resume)
+        if store.completed_count:
+            print(f"   ✓ Reanudando: {store.completed_count:,} bloques ya procesados en {checkpoint_dir}")
+        elif store.discarded_reason:
+            print(f"   ℹ️  Sin reanudación ({store.discarded_reason}): se procesan todos los bloques")
+    
+    for position, (blocking_key, block_indices) in enumerate(blocks.items()):
         blocks_processed += 1
         
         if blocks_processed % 500 == 0:
             print(f"     Procesados: {blocks_processed:,}/{total_blocks:,} bloques ({100*blocks_processed/total_blocks:.1f}%)")
         
-        matches = find_matches_in_block(df, block_indices, name_column, threshold)
+        if store is not None and store.is_done(position):
+            matches = store.replayed[position]
+            blocks_resumed += 1
+        else:
+            matches = find_matches_in_block(df, block_indices, name_column, threshold, score_cache, names, scorer)
+            if store is not None:
+                store.add(position, matches)
         
         if matches:
             blocks_with_matches += 1
             all_matches.extend(matches)
     
+    if store is not None:
+        store.commit()
+    
+    instrumentation.count('blocks_processed', blocks_processed)
+    if blocks_resumed:
+        instrumentation.count('blocks_resumed', blocks_resumed)
     print(f"   ✓ Procesados {blocks_processed:,} bloques")
     print(f"   ✓ {blocks_with_matches:,} bloques con matches encontrados")
     
@@ -373,6 +457,7 @@ def validate_and_split_components(components, df, matches_list, name_column='nor
             for idx in isolated:
                 validated_components.append({idx})
     
+    instrumentation.count('components_split', split_count)
     if split_count > 0:
         print(f"   → {split_count} componentes divididos por similitud mínima baja")
     
@@ -465,6 +550,7 @@ def merge_related_entities_by_first_two_words(components, df, name_column='norma
                     
                     if similarities and sum(similarities) / len(similarities) >= similarity_threshold:
                         merged_components.append(merged_group)
+                        instrumentation.count('merges_performed', len(comp_groups) - 1)
                         continue
             
             # Si no se fusionó, agregar componentes individuales
@@ -492,14 +578,10 @@ if __name__ == "__main__":
     base_dir = Path(__file__).parent.parent.parent
     results_dir = base_dir / "results" / "intermediate"
     
-    financial_df = pd.read_csv(results_dir / "financial_normalized.csv")
-    non_financial_df = pd.read_csv(results_dir / "non_financial_normalized.csv")
-    
-    with open(results_dir / "financial_blocks.json", 'r', encoding='utf-8') as f:
-        financial_blocks = {k: [int(i) for i in v] for k, v in json.load(f).items()}
-    
-    with open(results_dir / "non_financial_blocks.json", 'r', encoding='utf-8') as f:
-        non_financial_blocks = {k: [int(i) for i in v] for k, v in json.load(f).items()}
+    financial_df = artifacts.load_table(results_dir, "financial_normalized")
+    non_financial_df = artifacts.load_table(results_dir, "non_financial_normalized")
+    financial_blocks = artifacts.load_blocks(results_dir, "financial_blocks")
+    non_financial_blocks = artifacts.load_blocks(results_dir, "non_financial_blocks")
     
     run_matching(financial_df, non_financial_df, financial_blocks, non_financial_blocks, base_dir, transaction_type=None)
 
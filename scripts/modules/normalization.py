@@ -9,6 +9,38 @@ import pandas as pd
 import re
 from pathlib import Path
 from datetime import datetime
+from . import artifacts
+
+# Roles funcionales que se eliminan de los nombres (Paso 2.2)
+FUNCTIONAL_ROLE_PATTERNS = [
+    r'\s+AS\s+ADMINISTRATIVE\s+AND\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+COLLATERAL\s+AND\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+NOTES\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+FIRST\s+LIEN\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+SECOND\s+LIEN\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+TERM\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+ABL\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+COLLATERAL\s+TRUSTEE\s*',
+    r'\s+AS\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+TRUSTEE\s*',
+    r'\s+AS\s+AGENT\s*',
+    r'\s+AS\s+THE\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+THE\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+THE\s+TRUSTEE\s*',
+    r'\s+AS\s+AGENT\s+FOR\s+[^,]*',
+    r'\s+AS\s+COLLATERAL\s+AGENT\s+FOR\s+[^,]*',
+    r'\s+AS\s+ADMINISTRATIVE\s+AGENT\s+FOR\s+[^,]*',
+    r'\s+AS\s+SERVICING\s+AGENT\s*',
+    r'\s+AS\s+SUCCESSOR\s+AGENT\s*',
+    r'\s+AS\s+SUCCESSOR\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+SUCCESSOR\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+NEW\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+DOMESTIC\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+CANADIAN\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+U\.S\.\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+US\s+COLLATERAL\s+AGENT\s*',
+]
 
 
 def normalize_names(financial_df, non_financial_df, base_dir=None, transaction_type='pledge'):
@@ -84,11 +116,10 @@ def normalize_names(financial_df, non_financial_df, base_dir=None, transaction_t
     # Guardar solo el resultado final con sufijo del tipo de transacción (si existe)
     print("\n4. Guardando resultados finales...")
     suffix = f"_{transaction_type}" if transaction_type else ""
-    output_file_financial = results_dir / f"financial_normalized{suffix}.csv"
-    output_file_non_financial = results_dir / f"non_financial_normalized{suffix}.csv"
-    
-    financial_normalized.to_csv(output_file_financial, index=False)
-    non_financial_normalized.to_csv(output_file_non_financial, index=False)
+    output_file_financial = artifacts.save_table(financial_normalized, results_dir, f"financial_normalized{suffix}")
+    output_file_non_financial = artifacts.save_table(
+        non_financial_normalized, results_dir, f"non_financial_normalized{suffix}"
+    )
     
     print(f"   ✓ {output_file_financial}")
     print(f"   ✓ {output_file_non_financial}")
@@ -162,37 +193,7 @@ def remove_functional_roles(name):
     
     cleaned = str(name)
     
-    role_patterns = [
-        r'\s+AS\s+ADMINISTRATIVE\s+AND\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+COLLATERAL\s+AND\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+NOTES\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+FIRST\s+LIEN\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+SECOND\s+LIEN\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+TERM\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+ABL\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+COLLATERAL\s+TRUSTEE\s*',
-        r'\s+AS\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+TRUSTEE\s*',
-        r'\s+AS\s+AGENT\s*',
-        r'\s+AS\s+THE\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+THE\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+THE\s+TRUSTEE\s*',
-        r'\s+AS\s+AGENT\s+FOR\s+[^,]*',
-        r'\s+AS\s+COLLATERAL\s+AGENT\s+FOR\s+[^,]*',
-        r'\s+AS\s+ADMINISTRATIVE\s+AGENT\s+FOR\s+[^,]*',
-        r'\s+AS\s+SERVICING\s+AGENT\s*',
-        r'\s+AS\s+SUCCESSOR\s+AGENT\s*',
-        r'\s+AS\s+SUCCESSOR\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+SUCCESSOR\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+NEW\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+DOMESTIC\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+CANADIAN\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+U\.S\.\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+US\s+COLLATERAL\s+AGENT\s*',
-    ]
-    
-    for pattern in role_patterns:
+    for pattern in FUNCTIONAL_ROLE_PATTERNS:
         cleaned = re.sub(pattern, ' ', cleaned, flags=re.IGNORECASE)
     
     cleaned = re.sub(r'\s+', ' ', cleaned)
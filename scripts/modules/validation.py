@@ -5,9 +5,12 @@ Implementa validación automática para identificar componentes problemáticos.
 """
 
 import pandas as pd
-import json
+import numpy as np
 from pathlib import Path
 from datetime import datetime
+from . import artifacts
+from . import grouping
+from . import entity_ids
 
 # Umbrales para validación
 LOW_SIMILARITY_THRESHOLD = 90.0
@@ -16,12 +19,15 @@ LARGE_GROUP_SIZE = 20
 HIGH_FREQUENCY_THRESHOLD = 1000
 
 
-def run_validation(financial_mapping, non_financial_mapping, financial_components, non_financial_components,
+def run_validation(financial_df, non_financial_df, financial_mapping, non_financial_mapping,
+                  financial_components, non_financial_components,
                   financial_matches_df, non_financial_matches_df, base_dir=None, transaction_type='pledge'):
     """
     Ejecuta validación automática.
     
     Args:
+        financial_df: DataFrame normalizado financiero (al que apuntan los componentes)
+        non_financial_df: DataFrame normalizado no financiero
         financial_mapping: DataFrame con mapeo financiero
         non_financial_mapping: DataFrame con mapeo no financiero
         financial_components: Lista de componentes financieros
@@ -49,13 +55,15 @@ def run_validation(financial_mapping, non_financial_mapping, financial_component
     # Validar componentes financieros
     print("1. Validando componentes financieros...")
     financial_validation, financial_problematic = validate_all_components(
-        financial_mapping, financial_components, financial_matches_df, 'normalized_name', 'frequency', 'financial'
+        financial_df, financial_mapping, financial_components, financial_matches_df,
+        'normalized_name', 'frequency', 'financial'
     )
     
     # Validar componentes no financieros
     print("2. Validando componentes no financieros...")
     non_financial_validation, non_financial_problematic = validate_all_components(
-        non_financial_mapping, non_financial_components, non_financial_matches_df, 'normalized_name', 'frequency', 'non_financial'
+        non_financial_df, non_financial_mapping, non_financial_components, non_financial_matches_df,
+        'normalized_name', 'frequency', 'non_financial'
     )
     
     # Guardar resultados
@@ -101,6 +109,22 @@ def run_validation(financial_mapping, non_financial_mapping, financial_component
     return financial_validation, non_financial_validation
 
 
+def component_issues(avg_sim, min_sim, size):
+    """Lista de problemas de un componente con matches internos (vacía si es válido)."""
+    issues = []
+    
+    if avg_sim < LOW_SIMILARITY_THRESHOLD:
+        issues.append(f'Similitud promedio baja: {avg_sim:.1f}%')
+    
+    if min_sim < MIN_SIMILARITY_THRESHOLD:
+        issues.append(f'Similitud mínima muy baja: {min_sim:.1f}%')
+    
+    if size > LARGE_GROUP_SIZE:
+        issues.append(f'Grupo muy grande: {size} nombres')
+    
+    return issues
+
+
 def validate_component_quality(df, component_indices, matches_df, name_column='normalized_name'):
     """Valida la calidad de un componente e identifica problemas potenciales."""
     if len(component_indices) == 1:
@@ -124,17 +148,7 @@ def validate_component_quality(df, component_indices, matches_df, name_column='n
     avg_sim = sum(similarities) / len(similarities)
     min_sim = min(similarities)
     
-    issues = []
-    
-    if avg_sim < LOW_SIMILARITY_THRESHOLD:
-        issues.append(f'Similitud promedio baja: {avg_sim:.1f}%')
-    
-    if min_sim < MIN_SIMILARITY_THRESHOLD:
-        issues.append(f'Similitud mínima muy baja: {min_sim:.1f}%')
-    
-    if len(component_indices) > LARGE_GROUP_SIZE:
-        issues.append(f'Grupo muy grande: {len(component_indices)} nombres')
-    
+    issues = component_issues(avg_sim, min_sim, len(component_indices))
     is_valid = len(issues) == 0
     
     return {
@@ -143,49 +157,82 @@ def validate_component_quality(df, component_indices, matches_df, name_column='n
     }
 
 
-def validate_all_components(mapping_df, components, matches_df, name_column='normalized_name',
+def validate_all_components(df, mapping_df, components, matches_df, name_column='normalized_name',
                            freq_column='frequency', entity_type='financial'):
     """
     Valida todos los componentes.
     
+    Las similitudes se agregan para todos los componentes a la vez con un único
+    groupby sobre los matches etiquetados con su componente
+    (grouping.calculate_all_component_stats). entity_id y standard_name de cada
+    componente se buscan en mapping_df por el original_name de su primer miembro
+    (df son los nombres normalizados a los que apuntan los componentes), así que
+    el mapeo puede estar reordenado o tener filas de más.
+    
+    Raises:
+        ValueError: si original_name se repite en el mapeo o a algún componente
+            le falta su fila
+    
     Returns:
         tuple: (validation_report, problematic_components)
     """
-    validation_results = []
-    problematic = []
-    
     print(f"   Validando {len(components):,} componentes...")
     
-    for component_id, component_indices in enumerate(components):
-        # Obtener índices del DataFrame desde el mapping
-        component_mapping = mapping_df[mapping_df['entity_id'] == f"{entity_type}_{component_id}"]
-        component_df_indices = component_mapping.index.tolist()
-        
-        if len(component_df_indices) == 0:
-            continue
-        
-        validation = validate_component_quality(
-            mapping_df, component_df_indices, matches_df, name_column
+    members, labels, sizes = grouping.component_labels(components)
+    
+    stats = grouping.calculate_all_component_stats(matches_df, members, labels, sizes)
+    avg_sim = stats['avg_similarity'].to_numpy()
+    min_sim = stats['min_similarity'].to_numpy()
+    
+    # Fila del mapeo del primer miembro de cada componente
+    mapping_names = pd.Index(mapping_df['original_name'])
+    if not mapping_names.is_unique:
+        raise ValueError(f"El mapeo de {entity_type} tiene original_name repetidos")
+    offsets = np.cumsum(sizes) - sizes
+    rows = mapping_names.get_indexer(df.loc[members[offsets], 'original_name'])
+    missing = np.flatnonzero(rows < 0)
+    if len(missing) > 0:
+        raise ValueError(
+            f"El mapeo de {entity_type} no tiene fila para {len(missing):,} componentes "
+            f"(p. ej. '{df.loc[members[offsets[missing[0]]], 'original_name']}')"
         )
-        
-        validation_results.append({
-            'component_id': component_id,
-            'size': len(component_indices),
-            'is_valid': validation['is_valid'],
-            'issues': '; '.join(validation['issues']) if validation['issues'] else None
+    component_ids = entity_ids.entity_number(
+        mapping_df['entity_id'].iloc[rows]
+    ).to_numpy(dtype=np.int64)
+    
+    multi = sizes > 1
+    no_matches = multi & np.isnan(avg_sim)
+    with np.errstate(invalid='ignore'):
+        flagged = multi & ~no_matches & (
+            (avg_sim < LOW_SIMILARITY_THRESHOLD) |
+            (min_sim < MIN_SIMILARITY_THRESHOLD) |
+            (sizes > LARGE_GROUP_SIZE)
+        )
+    is_valid = ~(no_matches | flagged)
+    
+    # Texto de los problemas solo para los componentes no válidos
+    issues = np.full(len(sizes), None, dtype=object)
+    issues[no_matches] = 'No hay matches dentro del componente'
+    for label in np.flatnonzero(flagged):
+        issues[label] = '; '.join(component_issues(avg_sim[label], min_sim[label], int(sizes[label])))
+    
+    validation_df = pd.DataFrame({
+        'component_id': component_ids,
+        'size': sizes,
+        'is_valid': is_valid,
+        'issues': issues
+    })
+    
+    invalid = np.flatnonzero(~is_valid)
+    if len(invalid) > 0:
+        problematic_df = pd.DataFrame({
+            'component_id': component_ids[invalid],
+            'size': sizes[invalid],
+            'standard_name': mapping_df['standard_name'].to_numpy()[rows[invalid]],
+            'issues': issues[invalid]
         })
-        
-        if not validation['is_valid']:
-            standard_name = component_mapping['standard_name'].iloc[0] if len(component_mapping) > 0 else None
-            problematic.append({
-                'component_id': component_id,
-                'size': len(component_indices),
-                'standard_name': standard_name,
-                'issues': '; '.join(validation['issues'])
-            })
-    
-    validation_df = pd.DataFrame(validation_results)
-    problematic_df = pd.DataFrame(problematic) if problematic else pd.DataFrame()
+    else:
+        problematic_df = pd.DataFrame()
     
     return validation_df, problematic_df
 
@@ -198,17 +245,16 @@ if __name__ == "__main__":
     
     financial_mapping = pd.read_csv(final_results_dir / "financial_entity_mapping.csv")
     non_financial_mapping = pd.read_csv(final_results_dir / "non_financial_entity_mapping.csv")
-    financial_matches_df = pd.read_csv(results_dir / "financial_matches.csv")
-    non_financial_matches_df = pd.read_csv(results_dir / "non_financial_matches.csv")
-    
-    with open(results_dir / "financial_components.json", 'r', encoding='utf-8') as f:
-        financial_components_json = json.load(f)
-        financial_components = [set(int(idx) for idx in comp) for comp in financial_components_json.values()]
-    
-    with open(results_dir / "non_financial_components.json", 'r', encoding='utf-8') as f:
-        non_financial_components_json = json.load(f)
-        non_financial_components = [set(int(idx) for idx in comp) for comp in non_financial_components_json.values()]
+    financial_matches_df = artifacts.load_table(results_dir, "financial_matches", columns=artifacts.MATCH_EDGE_COLUMNS)
+    non_financial_matches_df = artifacts.load_table(
+        results_dir, "non_financial_matches", columns=artifacts.MATCH_EDGE_COLUMNS
+    )
+    financial_components = artifacts.load_components(results_dir, "financial_components")
+    non_financial_components = artifacts.load_components(results_dir, "non_financial_components")
+    financial_df = artifacts.load_table(results_dir, "financial_normalized")
+    non_financial_df = artifacts.load_table(results_dir, "non_financial_normalized")
     
-    run_validation(financial_mapping, non_financial_mapping, financial_components, non_financial_components,
+    run_validation(financial_df, non_financial_df, financial_mapping, non_financial_mapping,
+                  financial_components, non_financial_components,
                   financial_matches_df, non_financial_matches_df, base_dir, transaction_type=None)
 
@@ -0,0 +1,423 @@
+"""
+Módulo de Cola de Trabajo para Matching Distribuido
+===================================================
+Reparte el matching de bloques entre procesos de cualquier máquina que vea un
+directorio compartido (NFS, disco de red o local), sin servicios externos.
+
+Cada trabajo (p. ej. 'financial_matches') es un directorio de la cola con:
+- job.json: huella de la entrada, threshold, scorer y número de unidades.
+- pending/: unidades de trabajo sin asignar. Cada unidad es un JSON con un rango
+  contiguo de bloques (posiciones, índices y nombres), autocontenido.
+- leased/: unidades asignadas. El nombre del archivo lleva el vencimiento del
+  lease y el worker: <unidad>.<vencimiento_ms>.<worker>.json.
+- done/: un segmento de matches por unidad (<unidad>.seg, formato de
+  modules/checkpoint.py).
+
+Todas las transiciones son os.rename, que es atómico: de todos los procesos que
+intentan tomar la misma unidad, solo uno lo consigue. Un worker renueva su lease
+renombrando la unidad con un vencimiento nuevo, desde un hilo en segundo plano
+(LeaseRenewer), así que un bloque que tarda más que el lease no lo deja vencer;
+cualquier proceso devuelve a
+pending/ las unidades con el lease vencido (worker caído). Si un worker lento
+termina una unidad que ya se reasignó, los dos escriben el mismo segmento, así
+que el resultado no cambia.
+
+El coordinador (run_queue_job) escribe las unidades, espera a que estén todas
+en done/ y devuelve los matches en el orden de los bloques: el resultado es el
+mismo que el de process_all_blocks.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+from pathlib import Path
+
+from rapidfuzz import fuzz
+
+from . import checkpoint, instrumentation, matching
+
+# Segundos de validez de un lease (se renueva a la mitad)
+LEASE_SECONDS = 300
+# Segundos entre comprobaciones de la cola
+POLL_SECONDS = 1.0
+# Pares de nombres por unidad de trabajo (aprox.; un bloque no se parte)
+UNIT_TARGET_PAIRS = 500_000
+
+JOB_FILE = "job.json"
+UNIT_NAME = "unit-{:06d}"
+
+
+def job_dir(queue_dir, name):
+    """Directorio del trabajo `name` (p. ej. 'financial_matches') en la cola."""
+    return Path(queue_dir) / name
+
+
+def remove_job(directory):
+    """Elimina un trabajo (cuando el coordinador guardó sus resultados)."""
+    directory = Path(directory)
+    if directory.exists():
+        shutil.rmtree(directory)
+
+
+def default_worker_id():
+    """Identificador de worker: host y pid (sin puntos, que separan campos del lease)."""
+    return re.sub(r'[^A-Za-z0-9_-]', '_', f"{socket.gethostname()}-{os.getpid()}")
+
+
+def _block_pairs(indices):
+    return len(indices) * (len(indices) - 1) // 2
+
+
+def split_units(blocks, target_pairs=None):
+    """
+    Divide los bloques en rangos contiguos de posiciones con ~target_pairs pares
+    (None = UNIT_TARGET_PAIRS).
+
+    Returns:
+        list: [(inicio, fin), ...] con fin exclusivo
+    """
+    if target_pairs is None:
+        target_pairs = UNIT_TARGET_PAIRS
+    units = []
+    start = 0
+    pairs = 0
+    for position, indices in enumerate(blocks.values()):
+        pairs += _block_pairs(indices)
+        if pairs >= target_pairs:
+            units.append((start, position + 1))
+            start = position + 1
+            pairs = 0
+    if start < len(blocks):
+        units.append((start, len(blocks)))
+    return units
+
+
+def _write_json_atomic(data, path, tmp_dir):
+    tmp_file = Path(tmp_dir) / f".{Path(path).name}.{default_worker_id()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+def _read_job(directory):
+    try:
+        with open(Path(directory) / JOB_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def create_job(directory, blocks, names, threshold, scorer=None, target_pairs=None):
+    """
+    Escribe las unidades de trabajo de un process_all_blocks en la cola.
+
+    Si el directorio ya tiene un trabajo con la misma huella (coordinador
+    reiniciado), se conserva con las unidades terminadas; si no, se reemplaza.
+
+    Returns:
+        dict: contenido de job.json
+    """
+    directory = Path(directory)
+    fingerprint = checkpoint.blocks_fingerprint(blocks, names, threshold, scorer)
+    job = _read_job(directory)
+    if job is not None and job['fingerprint'] == fingerprint:
+        return job
+    remove_job(directory)
+
+    for sub in ('pending', 'leased', 'done'):
+        (directory / sub).mkdir(parents=True, exist_ok=True)
+
+    scorer_name = getattr(scorer, '__name__', 'WRatio') if scorer is not None else 'WRatio'
+    block_items = list(blocks.values())
+    units = split_units(blocks, target_pairs)
+    for unit_id, (start, end) in enumerate(units):
+        unit = {
+            'unit': unit_id,
+            'threshold': threshold,
+            'scorer': scorer_name,
+            'positions': list(range(start, end)),
+            'blocks': [[int(i) for i in block_items[p]] for p in range(start, end)],
+            'names': [[names[i] for i in block_items[p]] for p in range(start, end)]
+        }
+        _write_json_atomic(unit, directory / 'pending' / f"{UNIT_NAME.format(unit_id)}.json", directory)
+
+    # job.json al final: un trabajo sin job.json está a medio escribir
+    job = {
+        'fingerprint': fingerprint,
+        'threshold': threshold,
+        'scorer': scorer_name,
+        'n_blocks': len(blocks),
+        'n_units': len(units),
+        'pairs': sum(_block_pairs(indices) for indices in block_items)
+    }
+    _write_json_atomic(job, directory / JOB_FILE, directory)
+    return job
+
+
+def _lease_name(unit_name, worker_id, lease_seconds):
+    expires_ms = int((time.time() + lease_seconds) * 1000)
+    return f"{unit_name}.{expires_ms}.{worker_id}.json"
+
+
+def _parse_lease(file_name):
+    """(unidad, vencimiento en segundos, worker) de un archivo de leased/."""
+    unit_name, expires_ms, worker_id, _ = file_name.split('.', 3)
+    return unit_name, int(expires_ms) / 1000, worker_id
+
+
+def release_expired(directory):
+    """Devuelve a pending/ las unidades con el lease vencido. Returns: número de unidades liberadas."""
+    directory = Path(directory)
+    released = 0
+    now = time.time()
+    for lease_file in sorted((directory / 'leased').glob('*.json')):
+        unit_name, expires, _ = _parse_lease(lease_file.name)
+        if expires > now:
+            continue
+        try:
+            os.rename(lease_file, directory / 'pending' / f"{unit_name}.json")
+            released += 1
+        except FileNotFoundError:
+            # Otro proceso la liberó o el worker renovó el lease
+            pass
+    return released
+
+
+def claim_unit(directory, worker_id, lease_seconds=LEASE_SECONDS):
+    """
+    Toma una unidad de pending/ con un lease de lease_seconds.
+
+    Returns:
+        Path del lease, o None si no hay unidades pendientes
+    """
+    directory = Path(directory)
+    for unit_file in sorted((directory / 'pending').glob('*.json')):
+        unit_name = unit_file.stem
+        lease_file = directory / 'leased' / _lease_name(unit_name, worker_id, lease_seconds)
+        try:
+            os.rename(unit_file, lease_file)
+        except FileNotFoundError:
+            # Otro worker la tomó primero
+            continue
+        if (directory / 'done' / f"{unit_name}.seg").exists():
+            # Unidad reasignada que su primer worker terminó después del vencimiento
+            lease_file.unlink(missing_ok=True)
+            continue
+        return lease_file
+    return None
+
+
+def renew_lease(lease_file, worker_id, lease_seconds=LEASE_SECONDS):
+    """
+    Renueva un lease renombrándolo con un vencimiento nuevo.
+
+    Returns:
+        Path del lease nuevo, o None si el lease se perdió (venció y se liberó)
+    """
+    unit_name, _, _ = _parse_lease(lease_file.name)
+    renewed = lease_file.parent / _lease_name(unit_name, worker_id, lease_seconds)
+    try:
+        os.rename(lease_file, renewed)
+    except FileNotFoundError:
+        return None
+    return renewed
+
+
+class LeaseRenewer:
+    """
+    Renueva un lease cada lease_seconds / 2 desde un hilo mientras se procesa la unidad.
+
+    Uso:
+        with LeaseRenewer(lease_file, worker_id, lease_seconds) as renewer:
+            ...                          # bloques de cualquier duración
+        lease_file = renewer.lease_file  # None si el lease se perdió
+    """
+
+    def __init__(self, lease_file, worker_id, lease_seconds=LEASE_SECONDS):
+        self.lease_file = lease_file
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{worker_id}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 2):
+            if self.lease_file is None:
+                return
+            # Si el lease se perdió se sigue: el segmento será idéntico al del otro worker
+            self.lease_file = renew_lease(self.lease_file, self.worker_id, self.lease_seconds)
+
+    def __enter__(self):
+        if self.lease_file is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def process_unit(directory, lease_file, worker_id, lease_seconds=LEASE_SECONDS):
+    """Calcula los matches de una unidad y escribe su segmento en done/."""
+    directory = Path(directory)
+    with open(lease_file, 'r', encoding='utf-8') as f:
+        unit = json.load(f)
+    scorer = getattr(fuzz, unit['scorer'])
+    unit_name = UNIT_NAME.format(unit['unit'])
+
+    block_matches = []
+    with LeaseRenewer(lease_file, worker_id, lease_seconds) as renewer:
+        for position, indices, block_names in zip(unit['positions'], unit['blocks'], unit['names']):
+            names = dict(zip(indices, block_names))
+            matches = matching.find_matches_in_block(None, indices, threshold=unit['threshold'], names=names,
+                                                     scorer=scorer)
+            block_matches.append((position, matches))
+    lease_file = renewer.lease_file
+
+    tmp_file = directory / 'done' / f".{unit_name}.{worker_id}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(checkpoint.encode_record(block_matches))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, directory / 'done' / f"{unit_name}.seg")
+    if lease_file is not None:
+        lease_file.unlink(missing_ok=True)
+
+
+def job_progress(directory):
+    """(unidades terminadas, unidades totales) de un trabajo; None si no tiene job.json."""
+    job = _read_job(directory)
+    if job is None:
+        return None
+    return len(list((Path(directory) / 'done').glob('*.seg'))), job['n_units']
+
+
+def run_worker(queue_dir, worker_id=None, lease_seconds=LEASE_SECONDS, exit_when_idle=False,
+               poll_seconds=POLL_SECONDS, jobs=None):
+    """
+    Procesa unidades de todos los trabajos de la cola.
+
+    Args:
+        queue_dir: Directorio compartido de la cola
+        worker_id: Identificador del worker (None = host-pid)
+        lease_seconds: Validez del lease de cada unidad
+        exit_when_idle: Si True, termina cuando todos los trabajos tienen todas
+            sus unidades en done/ (si no, espera trabajos nuevos indefinidamente)
+        poll_seconds: Espera entre comprobaciones cuando no hay unidades pendientes
+        jobs: Nombres de trabajos a procesar (None = todos)
+
+    Returns:
+        int: número de unidades procesadas
+    """
+    queue_dir = Path(queue_dir)
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    while True:
+        job_dirs = [queue_dir / name for name in jobs] if jobs else sorted(
+            p for p in queue_dir.glob('*') if p.is_dir())
+        claimed = False
+        idle = True
+        for directory in job_dirs:
+            progress = job_progress(directory)
+            if progress is None:
+                continue
+            if progress[0] < progress[1]:
+                idle = False
+            release_expired(directory)
+            lease_file = claim_unit(directory, worker_id, lease_seconds)
+            if lease_file is None:
+                continue
+            try:
+                process_unit(directory, lease_file, worker_id, lease_seconds)
+            except FileNotFoundError:
+                # El coordinador eliminó el trabajo (terminado o reemplazado)
+                continue
+            processed += 1
+            claimed = True
+            break
+        if not claimed:
+            if exit_when_idle and idle:
+                return processed
+            time.sleep(poll_seconds)
+
+
+def _local_worker(queue_dir, worker_id, jobs, lease_seconds):
+    run_worker(queue_dir, worker_id=worker_id, lease_seconds=lease_seconds, exit_when_idle=True, jobs=jobs)
+
+
+def run_queue_job(name, df, blocks, queue_dir, name_column='normalized_name', threshold=None, scorer=None,
+                  local_workers=0, lease_seconds=LEASE_SECONDS, poll_seconds=POLL_SECONDS):
+    """
+    Coordina el matching de unos bloques a través de la cola.
+
+    Escribe las unidades, arranca local_workers workers en esta máquina (0 = solo
+    workers externos: scripts/matching_worker.py), libera leases vencidos mientras
+    espera y une los segmentos. El trabajo se queda en la cola hasta remove_job.
+
+    Returns:
+        list: matches (idx1, idx2, similarity) en el mismo orden que process_all_blocks
+    """
+    if threshold is None:
+        threshold = matching.SIMILARITY_THRESHOLD
+    names = df[name_column].to_dict()
+    directory = job_dir(queue_dir, name)
+    job = create_job(directory, blocks, names, threshold, scorer)
+    done, total = job_progress(directory)
+    print(f"   Cola de trabajo: {directory} ({total:,} unidades, {job['pairs']:,} pares)")
+    if done:
+        print(f"   ✓ {done:,} unidades ya terminadas en la cola")
+
+    workers = []
+    context = multiprocessing.get_context('spawn')
+    for i in range(local_workers):
+        worker_id = f"{default_worker_id()}-local{i}"
+        process = context.Process(target=_local_worker, args=(str(queue_dir), worker_id, [name], lease_seconds))
+        process.start()
+        workers.append(process)
+    if not local_workers:
+        print(f"   ℹ️  Esperando workers: python scripts/matching_worker.py --queue-dir {queue_dir}")
+
+    last_done = done
+    try:
+        while done < total:
+            time.sleep(poll_seconds)
+            released = release_expired(directory)
+            if released:
+                print(f"   ⚠️ {released} unidades con lease vencido devueltas a la cola")
+            done, _ = job_progress(directory)
+            if done != last_done:
+                print(f"     Unidades terminadas: {done:,}/{total:,} ({100*done/total:.1f}%)")
+                last_done = done
+            if workers and not any(p.is_alive() for p in workers) and done < total:
+                raise RuntimeError(f"Los workers locales terminaron con {total - done} unidades sin procesar")
+    finally:
+        for process in workers:
+            process.join(timeout=lease_seconds)
+
+    # Unir los segmentos en el orden de los bloques
+    by_position = {}
+    for segment_file in sorted((directory / 'done').glob('*.seg')):
+        by_position.update(checkpoint.decode_records(segment_file.read_bytes()))
+    all_matches = []
+    blocks_with_matches = 0
+    for position in range(job['n_blocks']):
+        matches = by_position[position]
+        if matches:
+            blocks_with_matches += 1
+            all_matches.extend(matches)
+
+    instrumentation.count('pairs_compared', job['pairs'])
+    instrumentation.count('pairs_scored', job['pairs'])
+    instrumentation.count('pairs_accepted', len(all_matches))
+    instrumentation.count('blocks_processed', job['n_blocks'])
+    print(f"   ✓ Procesados {job['n_blocks']:,} bloques en {total:,} unidades")
+    print(f"   ✓ {blocks_with_matches:,} bloques con matches encontrados")
+    return all_matches
@@ -13,18 +13,23 @@ Uso:
     python scripts/pipeline.py --phase grouping   # Solo agrupación
     python scripts/pipeline.py --phase validation # Solo validación
     python scripts/pipeline.py --phase complete   # Solo completar mapeo
+    python scripts/pipeline.py --force            # Re-ejecuta todo aunque esté al día
+    python scripts/pipeline.py --resume           # Reanuda un matching interrumpido desde su checkpoint
+    python scripts/pipeline.py --queue-dir /shared/queue --local-workers 4  # Matching repartido entre workers
+
+Las fases se saltan si su manifiesto (results/manifests/) está al día.
 """
 
 import argparse
 import sys
 from pathlib import Path
 import pandas as pd
-import json
 
 # Agregar el directorio scripts al path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from modules import exploration, normalization, blocking, matching, grouping, validation, complete_mapping
+from modules import artifacts, dag, instrumentation
 
 
 def merge_csv_files(base_dir=None):
@@ -113,325 +118,274 @@ def merge_csv_files(base_dir=None):
     return merged_financial, merged_non_financial
 
 
-def run_pipeline_for_entity_type(entity_type, base_dir=None, skip_validation=True):
+# Fases del DAG en orden de ejecución ('grouping' se ejecuta junto con 'complete')
+DAG_PHASES = ['exploration', 'normalization', 'blocking', 'matching', 'complete', 'validation', 'database']
+
+
+def build_phases(base_dir, grouping_partitions=1, id_mode='sequential', resume=False, queue_dir=None, local_workers=0):
     """
-    Ejecuta el pipeline completo para un tipo de entidad (financial o non_financial).
+    Declara las fases del pipeline (datos fusionados) con sus entradas y salidas.
+    
+    Cada fase lee sus entradas desde disco, así que se puede ejecutar o saltar de
+    forma independiente. La agrupación no guarda archivos propios: se ejecuta en la
+    fase 'complete' y su artefacto es *_entity_mapping_complete.csv.
     
     Args:
-        entity_type: 'financial' o 'non_financial'
         base_dir: Directorio base del proyecto
-        skip_validation: Si True, omite la fase de validación (útil si usas Streamlit)
+        grouping_partitions: Número de particiones paralelas para la agrupación
+        id_mode: 'sequential' o 'stable' (reutiliza los entity_id de la ejecución anterior)
+        resume: Si True, el matching reutiliza los bloques de su checkpoint (no cambia el resultado)
+        queue_dir: Cola de trabajo compartida para repartir el matching entre workers (no cambia el resultado)
+        local_workers: Workers del matching que se arrancan en esta máquina con queue_dir
+        
+    Returns:
+        list: Lista de dag.Phase
     """
-    if base_dir is None:
-        base_dir = Path(__file__).parent.parent
-    
-    print("\n" + "=" * 80)
-    print(f"PROCESANDO ENTIDADES: {entity_type.upper()}")
-    print("=" * 80)
+    data_dir = base_dir / "original-data"
+    results_dir = base_dir / "results" / "intermediate"
+    final_results_dir = base_dir / "results" / "final"
+    validation_dir = base_dir / "results" / "validation"
+    modules_dir = Path(__file__).parent / "modules"
+    
+    original_files = [
+        data_dir / 'financial_entity_freq_pledge.csv',
+        data_dir / 'financial_entity_freq_release.csv',
+        data_dir / 'non_financial_entity_freq_pledge.csv',
+        data_dir / 'nonfinancial_entity_freq_release.csv'
+    ]
+    # Artefactos intermedios: Feather/Arrow si pyarrow está instalado, si no CSV/JSON
+    normalized_names = ["financial_normalized", "non_financial_normalized"]
+    blocks_names = ["financial_blocks", "non_financial_blocks"]
+    matches_names = ["financial_matches", "non_financial_matches"]
+    components_names = ["financial_components", "non_financial_components"]
+    normalized_files = [artifacts.table_file(results_dir, n) for n in normalized_names]
+    blocks_files = [artifacts.groups_file(results_dir, n) for n in blocks_names]
+    matches_files = [artifacts.table_file(results_dir, n) for n in matches_names]
+    components_files = [artifacts.groups_file(results_dir, n) for n in components_names]
+    complete_files = [
+        final_results_dir / "financial_entity_mapping_complete.csv",
+        final_results_dir / "non_financial_entity_mapping_complete.csv"
+    ]
+    
+    def run_exploration_phase():
+        exploration.run_exploration(base_dir)
     
-    # Merge CSV files at the beginning
-    merged_financial, merged_non_financial = merge_csv_files(base_dir)
+    def run_normalization_phase():
+        merged_financial, merged_non_financial = merge_csv_files(base_dir)
+        normalization.normalize_names(merged_financial, merged_non_financial, base_dir, transaction_type=None)
     
-    # Select the appropriate dataframe
-    if entity_type == 'financial':
-        entity_df = merged_financial
-        other_df = merged_non_financial
-    else:
-        entity_df = merged_non_financial
-        other_df = merged_financial
+    def load_normalized():
+        return (artifacts.load_table(results_dir, n) for n in normalized_names)
     
-    # Fase 2: Normalización
-    print("\n" + "=" * 80)
-    print(f"FASE 2: NORMALIZACIÓN ({entity_type.upper()})")
-    print("=" * 80)
-    if entity_type == 'financial':
-        entity_normalized, other_normalized = normalization.normalize_names(
-            entity_df, other_df, base_dir, transaction_type=None
-        )
-    else:
-        other_normalized, entity_normalized = normalization.normalize_names(
-            other_df, entity_df, base_dir, transaction_type=None
-        )
+    def load_match_edges():
+        return (artifacts.load_table(results_dir, n, columns=artifacts.MATCH_EDGE_COLUMNS) for n in matches_names)
     
-    # Fase 3: Blocking
-    print("\n" + "=" * 80)
-    print(f"FASE 3: BLOCKING ({entity_type.upper()})")
-    print("=" * 80)
-    if entity_type == 'financial':
-        entity_blocks, other_blocks = blocking.create_blocks(
-            entity_normalized, other_normalized, base_dir, transaction_type=None
-        )
-    else:
-        other_blocks, entity_blocks = blocking.create_blocks(
-            other_normalized, entity_normalized, base_dir, transaction_type=None
-        )
+    def load_components():
+        return (artifacts.load_components(results_dir, n) for n in components_names)
     
-    # Fase 4: Matching
-    print("\n" + "=" * 80)
-    print(f"FASE 4: FUZZY MATCHING ({entity_type.upper()})")
-    print("=" * 80)
-    if entity_type == 'financial':
-        entity_components, other_components, entity_matches_df, other_matches_df = matching.run_matching(
-            entity_normalized, other_normalized, entity_blocks, other_blocks, 
-            base_dir, transaction_type=None
-        )
-    else:
-        other_components, entity_components, other_matches_df, entity_matches_df = matching.run_matching(
-            other_normalized, entity_normalized, other_blocks, entity_blocks, 
-            base_dir, transaction_type=None
-        )
+    def run_blocking_phase():
+        financial_df, non_financial_df = load_normalized()
+        blocking.create_blocks(financial_df, non_financial_df, base_dir, transaction_type=None)
     
-    # Fase 5: Grouping
-    print("\n" + "=" * 80)
-    print(f"FASE 5: AGRUPACIÓN Y ASIGNACIÓN DE IDs ({entity_type.upper()})")
-    print("=" * 80)
-    if entity_type == 'financial':
-        entity_mapping, other_mapping, entity_review, other_review = grouping.run_grouping(
-            entity_normalized, other_normalized, entity_components, other_components,
-            entity_matches_df, other_matches_df, base_dir, transaction_type=None
-        )
-    else:
-        other_mapping, entity_mapping, other_review, entity_review = grouping.run_grouping(
-            other_normalized, entity_normalized, other_components, entity_components,
-            other_matches_df, entity_matches_df, base_dir, transaction_type=None
+    def run_matching_phase():
+        financial_df, non_financial_df = load_normalized()
+        financial_blocks, non_financial_blocks = (artifacts.load_blocks(results_dir, n) for n in blocks_names)
+        matching.run_matching(financial_df, non_financial_df, financial_blocks, non_financial_blocks,
+                              base_dir, transaction_type=None, resume=resume, queue_dir=queue_dir,
+                              local_workers=local_workers)
+    
+    def run_complete_phase():
+        financial_df, non_financial_df = load_normalized()
+        financial_matches_df, non_financial_matches_df = load_match_edges()
+        financial_components, non_financial_components = load_components()
+        financial_mapping, non_financial_mapping, _, _ = grouping.run_grouping(
+            financial_df, non_financial_df, financial_components, non_financial_components,
+            financial_matches_df, non_financial_matches_df, base_dir, transaction_type=None,
+            n_partitions=grouping_partitions, id_mode=id_mode
         )
-    
-    # Fase 6: Validation (Opcional - puede hacerse dinámicamente en Streamlit)
-    if not skip_validation:
-        print("\n" + "=" * 80)
-        print(f"FASE 6: VALIDACIÓN ({entity_type.upper()})")
-        print("=" * 80)
-        if entity_type == 'financial':
-            validation.run_validation(
-                entity_mapping, other_mapping, entity_components, other_components,
-                entity_matches_df, other_matches_df, base_dir, transaction_type=None
-            )
-        else:
-            validation.run_validation(
-                other_mapping, entity_mapping, other_components, entity_components,
-                other_matches_df, entity_matches_df, base_dir, transaction_type=None
-            )
-    
-    # Completar mapeo
-    print("\n" + "=" * 80)
-    print(f"COMPLETAR MAPEO ({entity_type.upper()})")
-    print("=" * 80)
-    if entity_type == 'financial':
         complete_mapping.run_complete_mapping(
-            financial_mapping=entity_mapping,
-            non_financial_mapping=other_mapping,
+            financial_mapping=financial_mapping,
+            non_financial_mapping=non_financial_mapping,
             base_dir=base_dir,
-            transaction_type=None
+            transaction_type=None,
+            id_mode=id_mode
         )
-    else:
-        complete_mapping.run_complete_mapping(
-            financial_mapping=other_mapping,
-            non_financial_mapping=entity_mapping,
-            base_dir=base_dir,
-            transaction_type=None
+    
+    def run_validation_phase():
+        # Cada componente se busca en el mapeo completo por el original_name de su primer miembro
+        financial_df, non_financial_df = load_normalized()
+        financial_mapping, non_financial_mapping = (pd.read_csv(p) for p in complete_files)
+        financial_matches_df, non_financial_matches_df = load_match_edges()
+        financial_components, non_financial_components = load_components()
+        validation.run_validation(
+            financial_df, non_financial_df, financial_mapping, non_financial_mapping,
+            financial_components, non_financial_components,
+            financial_matches_df, non_financial_matches_df, base_dir, transaction_type=None
         )
     
-    print(f"\n✓ Pipeline completado para {entity_type}")
+    def run_database_phase():
+        complete_mapping.update_database(base_dir, overwrite=True)
+    
+    return [
+        dag.Phase('exploration', run_exploration_phase,
+                  inputs=original_files,
+                  outputs=[base_dir / "results" / "exploration" / "basic_stats.txt",
+                           base_dir / "results" / "exploration" / "variations_analysis.txt"],
+                  code=[modules_dir / "exploration.py"]),
+        dag.Phase('normalization', run_normalization_phase,
+                  inputs=original_files,
+                  outputs=normalized_files,
+                  code=[Path(__file__), modules_dir / "normalization.py", modules_dir / "artifacts.py"]),
+        dag.Phase('blocking', run_blocking_phase,
+                  inputs=normalized_files,
+                  outputs=blocks_files,
+                  code=[modules_dir / "blocking.py", modules_dir / "artifacts.py"]),
+        dag.Phase('matching', run_matching_phase,
+                  inputs=normalized_files + blocks_files,
+                  outputs=matches_files + components_files,
+                  code=[modules_dir / "matching.py", modules_dir / "checkpoint.py", modules_dir / "work_queue.py",
+                        modules_dir / "artifacts.py"]),
+        dag.Phase('complete', run_complete_phase,
+                  inputs=normalized_files + matches_files + components_files,
+                  outputs=complete_files,
+                  code=[modules_dir / "grouping.py", modules_dir / "complete_mapping.py",
+                        modules_dir / "entity_ids.py", modules_dir / "artifacts.py"],
+                  params={'id_mode': id_mode},
+                  optional_outputs=[final_results_dir / "financial_entity_changes.csv",
+                                    final_results_dir / "non_financial_entity_changes.csv"]),
+        dag.Phase('validation', run_validation_phase,
+                  inputs=normalized_files + complete_files + matches_files + components_files,
+                  outputs=[validation_dir / "financial_validation_report.csv",
+                           validation_dir / "non_financial_validation_report.csv"],
+                  code=[modules_dir / "validation.py", modules_dir / "grouping.py", modules_dir / "artifacts.py"],
+                  optional_outputs=[validation_dir / "financial_problematic_components.csv",
+                                    validation_dir / "non_financial_problematic_components.csv"]),
+        dag.Phase('database', run_database_phase,
+                  inputs=complete_files,
+                  outputs=[base_dir / "database" / "entities.db"],
+                  code=[modules_dir / "complete_mapping.py", base_dir / "database_manager.py",
+                        base_dir / "database_connection.py", base_dir / "entity_stats.py",
+                        base_dir / "entity_pages.py", base_dir / "entity_search.py"]),
+    ]
 
 
-def run_full_pipeline(base_dir=None, skip_validation=True):
+def run_dag_phases(targets, base_dir=None, grouping_partitions=1, id_mode='sequential', force=False, resume=False,
+                   queue_dir=None, local_workers=0):
     """
-    Ejecuta todo el pipeline completo para ambos tipos de entidad (financial y non_financial).
-    Los datos de pledge y release se fusionan al inicio.
+    Ejecuta las fases objetivo y las que necesitan, saltando las que están al día.
     
-    Args:
-        base_dir: Directorio base del proyecto
-        skip_validation: Si True, omite la fase de validación (útil si usas Streamlit)
+    Los manifiestos se guardan en results/manifests/. Con resume=True, un matching
+    interrumpido continúa desde su checkpoint (results/intermediate/checkpoints/).
+    Con queue_dir, el matching se reparte entre workers a través de esa cola.
+    
+    Returns:
+        dict: nombre de fase -> 'ejecutada' u 'omitida'
     """
     if base_dir is None:
         base_dir = Path(__file__).parent.parent
     
-    print("=" * 80)
-    print("PIPELINE COMPLETO DE ESTANDARIZACIÓN DE NOMBRES")
-    print("=" * 80)
-    print()
+    phases = build_phases(base_dir, grouping_partitions=grouping_partitions, id_mode=id_mode, resume=resume,
+                          queue_dir=queue_dir, local_workers=local_workers)
+    store = dag.ArtifactStore(base_dir, base_dir / "results" / "manifests")
+    status = dag.run_dag(phases, store, targets=targets, force=force)
     
-    # Merge CSV files at the beginning
-    merged_financial, merged_non_financial = merge_csv_files(base_dir)
+    executed = [name for name, state in status.items() if state == 'ejecutada']
+    skipped = [name for name, state in status.items() if state == 'omitida']
+    print(f"\n✓ Fases ejecutadas: {', '.join(executed) if executed else 'ninguna'}")
+    if skipped:
+        print(f"✓ Fases al día (omitidas): {', '.join(skipped)}")
     
-    # Fase 1: Exploración (usando datos fusionados)
-    print("\n" + "=" * 80)
-    print("FASE 1: EXPLORACIÓN")
-    print("=" * 80)
-    exploration.run_exploration(base_dir)
+    return status
+
+
+def run_pipeline_for_entity_type(entity_type, base_dir=None, skip_validation=False, grouping_partitions=1,
+                                 id_mode='sequential', force=False, resume=False, queue_dir=None, local_workers=0):
+    """
+    Ejecuta el pipeline completo para un tipo de entidad (financial o non_financial).
     
-    # Process both entity types together
-    print("\n" + "=" * 80)
-    print("PROCESANDO AMBOS TIPOS DE ENTIDADES")
-    print("=" * 80)
+    Las fases procesan ambos tipos a la vez, así que llamar a esta función para
+    financial y después para non_financial no repite ninguna fase: la segunda
+    llamada encuentra los manifiestos al día.
     
-    # Fase 2: Normalización
+    Args:
+        entity_type: 'financial' o 'non_financial'
+        base_dir: Directorio base del proyecto
+        skip_validation: Si True, omite la fase de validación
+        grouping_partitions: Número de particiones paralelas para la fase de agrupación
+        id_mode: 'sequential' o 'stable' (reutiliza los entity_id de la ejecución anterior)
+        force: Si True, re-ejecuta las fases aunque estén al día
+        resume: Si True, un matching interrumpido continúa desde su checkpoint
+        queue_dir: Cola de trabajo compartida para repartir el matching entre workers
+        local_workers: Workers del matching que se arrancan en esta máquina con queue_dir
+    """
     print("\n" + "=" * 80)
-    print("FASE 2: NORMALIZACIÓN")
+    print(f"PROCESANDO ENTIDADES: {entity_type.upper()}")
     print("=" * 80)
-    financial_normalized, non_financial_normalized = normalization.normalize_names(
-        merged_financial, merged_non_financial, base_dir, transaction_type=None
-    )
     
-    # Fase 3: Blocking
-    print("\n" + "=" * 80)
-    print("FASE 3: BLOCKING")
-    print("=" * 80)
-    financial_blocks, non_financial_blocks = blocking.create_blocks(
-        financial_normalized, non_financial_normalized, base_dir, transaction_type=None
-    )
+    targets = ['complete'] if skip_validation else ['complete', 'validation']
+    run_dag_phases(targets, base_dir, grouping_partitions=grouping_partitions, id_mode=id_mode, force=force,
+                   resume=resume, queue_dir=queue_dir, local_workers=local_workers)
     
-    # Fase 4: Matching
-    print("\n" + "=" * 80)
-    print("FASE 4: FUZZY MATCHING")
-    print("=" * 80)
-    financial_components, non_financial_components, financial_matches_df, non_financial_matches_df = matching.run_matching(
-        financial_normalized, non_financial_normalized, financial_blocks, non_financial_blocks, 
-        base_dir, transaction_type=None
-    )
+    print(f"\n✓ Pipeline completado para {entity_type}")
+
+
+def run_full_pipeline(base_dir=None, skip_validation=False, grouping_partitions=1, id_mode='sequential',
+                      force=False, resume=False, queue_dir=None, local_workers=0):
+    """
+    Ejecuta todo el pipeline completo para ambos tipos de entidad (financial y non_financial).
+    Los datos de pledge y release se fusionan al inicio.
     
-    # Fase 5: Grouping
-    print("\n" + "=" * 80)
-    print("FASE 5: AGRUPACIÓN Y ASIGNACIÓN DE IDs")
-    print("=" * 80)
-    financial_mapping, non_financial_mapping, financial_review, non_financial_review = grouping.run_grouping(
-        financial_normalized, non_financial_normalized, financial_components, non_financial_components,
-        financial_matches_df, non_financial_matches_df, base_dir, transaction_type=None
-    )
+    Cada fase se ejecuta una sola vez y solo si sus entradas, su código o sus
+    parámetros cambiaron desde la última ejecución (ver modules/dag.py).
     
-    # Fase 6: Validation (Opcional)
-    if not skip_validation:
-        print("\n" + "=" * 80)
-        print("FASE 6: VALIDACIÓN")
-        print("=" * 80)
-        validation.run_validation(
-            financial_mapping, non_financial_mapping, financial_components, non_financial_components,
-            financial_matches_df, non_financial_matches_df, base_dir, transaction_type=None
-        )
-    
-    # Completar mapeo
-    print("\n" + "=" * 80)
-    print("COMPLETAR MAPEO")
+    Args:
+        base_dir: Directorio base del proyecto
+        skip_validation: Si True, omite la fase de validación
+        grouping_partitions: Número de particiones paralelas para la fase de agrupación
+        id_mode: 'sequential' o 'stable' (reutiliza los entity_id de la ejecución anterior)
+        force: Si True, re-ejecuta todas las fases aunque estén al día
+        resume: Si True, un matching interrumpido continúa desde su checkpoint
+        queue_dir: Cola de trabajo compartida para repartir el matching entre workers
+        local_workers: Workers del matching que se arrancan en esta máquina con queue_dir
+    """
     print("=" * 80)
-    complete_mapping.run_complete_mapping(
-        financial_mapping=financial_mapping,
-        non_financial_mapping=non_financial_mapping,
-        base_dir=base_dir,
-        transaction_type=None
-    )
-    
-    # Actualizar base de datos
-    print("\n" + "=" * 80)
-    print("ACTUALIZANDO BASE DE DATOS")
+    print("PIPELINE COMPLETO DE ESTANDARIZACIÓN DE NOMBRES")
     print("=" * 80)
-    complete_mapping.update_database(base_dir, overwrite=True)
+    print()
+    
+    targets = [name for name in DAG_PHASES if not (skip_validation and name == 'validation')]
+    run_dag_phases(targets, base_dir, grouping_partitions=grouping_partitions, id_mode=id_mode, force=force,
+                   resume=resume, queue_dir=queue_dir, local_workers=local_workers)
     
     print("\n" + "=" * 80)
     print("PIPELINE COMPLETADO EXITOSAMENTE")
     print("=" * 80)
-    print("✓ Todas las fases se ejecutaron correctamente")
+    print("✓ Todas las fases están al día")
     print("✓ Resultados finales en: results/final/")
     print("✓ Base de datos actualizada en: database/entities.db")
     print("=" * 80)
 
 
-def run_phase(phase_name, base_dir=None):
-    """Ejecuta una fase específica del pipeline usando datos fusionados."""
-    if base_dir is None:
-        base_dir = Path(__file__).parent.parent
-    
-    results_dir = base_dir / "results" / "intermediate"
-    final_results_dir = base_dir / "results" / "final"
-    data_dir = base_dir / "original-data"
-    
-    if phase_name == "exploration":
-        exploration.run_exploration(base_dir)
-    
-    elif phase_name == "normalization":
-        # Merge CSV files first
-        merged_financial, merged_non_financial = merge_csv_files(base_dir)
-        normalization.normalize_names(merged_financial, merged_non_financial, base_dir, transaction_type=None)
-    
-    elif phase_name == "blocking":
-        financial_df = pd.read_csv(results_dir / "financial_normalized.csv")
-        non_financial_df = pd.read_csv(results_dir / "non_financial_normalized.csv")
-        blocking.create_blocks(financial_df, non_financial_df, base_dir, transaction_type=None)
-    
-    elif phase_name == "matching":
-        financial_df = pd.read_csv(results_dir / "financial_normalized.csv")
-        non_financial_df = pd.read_csv(results_dir / "non_financial_normalized.csv")
-        
-        with open(results_dir / "financial_blocks.json", 'r', encoding='utf-8') as f:
-            financial_blocks = {k: [int(i) for i in v] for k, v in json.load(f).items()}
-        
-        with open(results_dir / "non_financial_blocks.json", 'r', encoding='utf-8') as f:
-            non_financial_blocks = {k: [int(i) for i in v] for k, v in json.load(f).items()}
-        
-        matching.run_matching(financial_df, non_financial_df, financial_blocks, non_financial_blocks, base_dir, transaction_type=None)
-    
-    elif phase_name == "grouping":
-        financial_df = pd.read_csv(results_dir / "financial_normalized.csv")
-        non_financial_df = pd.read_csv(results_dir / "non_financial_normalized.csv")
-        financial_matches_df = pd.read_csv(results_dir / "financial_matches.csv")
-        non_financial_matches_df = pd.read_csv(results_dir / "non_financial_matches.csv")
-        
-        with open(results_dir / "financial_components.json", 'r', encoding='utf-8') as f:
-            financial_components_json = json.load(f)
-            financial_components = [set(int(idx) for idx in comp) for comp in financial_components_json.values()]
-        
-        with open(results_dir / "non_financial_components.json", 'r', encoding='utf-8') as f:
-            non_financial_components_json = json.load(f)
-            non_financial_components = [set(int(idx) for idx in comp) for comp in non_financial_components_json.values()]
-        
-        grouping.run_grouping(
-            financial_df, non_financial_df, financial_components, non_financial_components,
-            financial_matches_df, non_financial_matches_df, base_dir, transaction_type=None
-        )
-    
-    elif phase_name == "validation":
-        financial_mapping = pd.read_csv(final_results_dir / "financial_entity_mapping.csv")
-        non_financial_mapping = pd.read_csv(final_results_dir / "non_financial_entity_mapping.csv")
-        financial_matches_df = pd.read_csv(results_dir / "financial_matches.csv")
-        non_financial_matches_df = pd.read_csv(results_dir / "non_financial_matches.csv")
-        
-        with open(results_dir / "financial_components.json", 'r', encoding='utf-8') as f:
-            financial_components_json = json.load(f)
-            financial_components = [set(int(idx) for idx in comp) for comp in financial_components_json.values()]
-        
-        with open(results_dir / "non_financial_components.json", 'r', encoding='utf-8') as f:
-            non_financial_components_json = json.load(f)
-            non_financial_components = [set(int(idx) for idx in comp) for comp in non_financial_components_json.values()]
-        
-        validation.run_validation(
-            financial_mapping, non_financial_mapping, financial_components, non_financial_components,
-            financial_matches_df, non_financial_matches_df, base_dir, transaction_type=None
-        )
+def run_phase(phase_name, base_dir=None, grouping_partitions=1, id_mode='sequential', force=False, resume=False,
+              queue_dir=None, local_workers=0):
+    """
+    Ejecuta una fase específica del pipeline usando datos fusionados.
     
-    elif phase_name == "complete":
-        # Try to load mappings from files if they exist
-        financial_mapping = None
-        non_financial_mapping = None
-        
-        mapping_file_financial = final_results_dir / "financial_entity_mapping.csv"
-        mapping_file_non_financial = final_results_dir / "non_financial_entity_mapping.csv"
-        
-        if mapping_file_financial.exists():
-            financial_mapping = pd.read_csv(mapping_file_financial)
-        
-        if mapping_file_non_financial.exists():
-            non_financial_mapping = pd.read_csv(mapping_file_non_financial)
-        
-        complete_mapping.run_complete_mapping(
-            financial_mapping=financial_mapping,
-            non_financial_mapping=non_financial_mapping,
-            base_dir=base_dir,
-            transaction_type=None
-        )
+    También ejecuta las fases anteriores que no estén al día; la fase se omite si
+    su manifiesto está al día, salvo con force=True. Con resume=True, un matching
+    interrumpido continúa desde su checkpoint; con queue_dir, se reparte entre
+    workers a través de esa cola.
+    """
+    # La agrupación no guarda artefactos propios: se ejecuta dentro de 'complete'
+    dag_phase = 'complete' if phase_name == 'grouping' else phase_name
     
-    else:
+    if dag_phase not in DAG_PHASES:
         print(f"Error: Fase desconocida: {phase_name}")
         print("Fases disponibles: exploration, normalization, blocking, matching, grouping, validation, complete")
         sys.exit(1)
+    
+    run_dag_phases([dag_phase], base_dir, grouping_partitions=grouping_partitions, id_mode=id_mode, force=force,
+                   resume=resume, queue_dir=queue_dir, local_workers=local_workers)
 
 
 def main():
@@ -449,6 +403,10 @@ Ejemplos de uso:
   python scripts/pipeline.py --phase grouping   # Solo agrupación
   python scripts/pipeline.py --phase validation # Solo validación
   python scripts/pipeline.py --phase complete   # Solo completar mapeo
+  python scripts/pipeline.py --force            # Re-ejecuta todo aunque esté al día
+  python scripts/pipeline.py --resume           # Reanuda un matching interrumpido
+  python scripts/pipeline.py --phase matching --queue-dir /shared/queue   # Matching con workers externos
+  python scripts/matching_worker.py --queue-dir /shared/queue             # Worker (en cualquier máquina)
         """
     )
     
@@ -458,10 +416,16 @@ Ejemplos de uso:
         help='Ejecutar solo una fase específica del pipeline'
     )
     
+    parser.add_argument(
+        '--skip-validation',
+        action='store_true',
+        help='Omitir la fase de validación (por defecto se ejecuta)'
+    )
+    
     parser.add_argument(
         '--with-validation',
         action='store_true',
-        help='Incluir fase de validación (por defecto se omite, útil si NO usas Streamlit)'
+        help='Incluir fase de validación (ya es el comportamiento por defecto, se mantiene por compatibilidad)'
     )
     
     parser.add_argument(
@@ -470,13 +434,70 @@ Ejemplos de uso:
         help='Ejecutar sin confirmación manual (útil para scripts automatizados)'
     )
     
+    parser.add_argument(
+        '--grouping-partitions',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Procesar la agrupación en N particiones paralelas (por defecto 1, sin paralelismo)'
+    )
+    
+    parser.add_argument(
+        '--stable-ids',
+        action='store_true',
+        help='Reutilizar los entity_id del mapeo anterior y guardar *_entity_changes.csv'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Guardar estadísticas de cProfile por fase en results/profiles/'
+    )
+    
+    parser.add_argument(
+        '--trace-memory',
+        action='store_true',
+        help='Medir el pico de memoria de Python por fase con tracemalloc (más lento)'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Re-ejecutar las fases aunque su manifiesto esté al día'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Reanudar un matching interrumpido: reutiliza los bloques ya confirmados en su checkpoint'
+    )
+    
+    parser.add_argument(
+        '--queue-dir',
+        type=Path,
+        metavar='DIR',
+        help='Repartir el matching entre workers a través de una cola en este directorio compartido '
+             '(workers: scripts/matching_worker.py)'
+    )
+    
+    parser.add_argument(
+        '--local-workers',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Con --queue-dir, arrancar N workers en esta máquina (por defecto 0, solo workers externos)'
+    )
+    
     args = parser.parse_args()
     
+    if args.local_workers and args.queue_dir is None:
+        parser.error('--local-workers requiere --queue-dir')
+    
     base_dir = Path(__file__).parent.parent
     
-    # Por defecto, omitir validación (útil si usas Streamlit)
-    # Usar --with-validation para incluirla
-    skip_val = not args.with_validation
+    # Por defecto se ejecuta la validación; usar --skip-validation para omitirla
+    skip_val = args.skip_validation
+    id_mode = 'stable' if args.stable_ids else 'sequential'
     
     # Solicitar confirmación manual antes de ejecutar
     if not args.yes:
@@ -485,7 +506,7 @@ Ejemplos de uso:
         else:
             print("\n⚠️  Se ejecutará el PIPELINE COMPLETO")
             if skip_val:
-                print("   (Omitiendo validación - usa --with-validation para incluirla)")
+                print("   (Omitiendo validación por --skip-validation)")
         
         print("\n¿Desea continuar? (yes/no): ", end='', flush=True)
         try:
@@ -498,14 +519,25 @@ Ejemplos de uso:
             sys.exit(0)
         print()
     
-    if args.phase:
-        print(f"Ejecutando fase: {args.phase}")
-        run_phase(args.phase, base_dir)
-    else:
-        print("Ejecutando pipeline completo...")
-        if skip_val:
-            print("(Omitiendo validación - usa --with-validation para incluirla)")
-        run_full_pipeline(base_dir, skip_validation=skip_val)
+    # Tiempos, memoria y contadores por fase en results/run_report.json
+    instrumentation.start_run('scripts', base_dir / "results", profile=args.profile,
+                              trace_memory=args.trace_memory)
+    try:
+        if args.phase:
+            print(f"Ejecutando fase: {args.phase}")
+            run_phase(args.phase, base_dir, grouping_partitions=args.grouping_partitions, id_mode=id_mode,
+                      force=args.force, resume=args.resume, queue_dir=args.queue_dir,
+                      local_workers=args.local_workers)
+        else:
+            print("Ejecutando pipeline completo...")
+            if skip_val:
+                print("(Omitiendo validación por --skip-validation)")
+            run_full_pipeline(base_dir, skip_validation=skip_val, grouping_partitions=args.grouping_partitions,
+                              id_mode=id_mode, force=args.force, resume=args.resume, queue_dir=args.queue_dir,
+                              local_workers=args.local_workers)
+    finally:
+        report_file = instrumentation.finish_run()
+    instrumentation.print_phase_summary(report_file)
 
 
 if __name__ == "__main__":
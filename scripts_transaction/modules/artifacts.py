@@ -0,0 +1,187 @@
+"""
+Módulo de Artefactos Intermedios
+================================
+Lee y escribe los artefactos intermedios (results*/intermediate) en formato columnar.
+
+- Tablas (*_normalized, *_matches): Feather/Arrow IPC con tipos, comprimido con
+  zstd. Se leen con memory map y solo las columnas pedidas.
+- Grupos (*_blocks, *_components): Arrow IPC sin comprimir con una columna
+  `key` y una columna `members` (lista de enteros); se leen con memory map y se
+  convierten a listas por los offsets de la lista, sin parsear cada índice.
+- Si pyarrow no está instalado se usan los formatos de texto de siempre
+  (CSV y JSON), con la misma interfaz.
+
+Los nombres se pasan sin extensión (p. ej. "financial_normalized"); la
+extensión depende del formato disponible.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+# Columnas de *_matches que usan agrupación, validación y mapeo completo
+MATCH_EDGE_COLUMNS = ['idx1', 'idx2', 'similarity']
+
+TABLE_COMPRESSION = 'zstd'
+
+
+def columnar_available():
+    """True si pyarrow está instalado y los artefactos se guardan en formato columnar."""
+    return pa is not None
+
+
+def _table_candidates(results_dir, name):
+    results_dir = Path(results_dir)
+    text_file = results_dir / f"{name}.csv"
+    if pa is None:
+        return [text_file]
+    return [results_dir / f"{name}.feather", text_file]
+
+
+def _groups_candidates(results_dir, name):
+    results_dir = Path(results_dir)
+    text_file = results_dir / f"{name}.json"
+    if pa is None:
+        return [text_file]
+    return [results_dir / f"{name}.arrow", text_file]
+
+
+def table_file(results_dir, name):
+    """Archivo en el que save_table guarda la tabla `name`."""
+    return _table_candidates(results_dir, name)[0]
+
+
+def groups_file(results_dir, name):
+    """Archivo en el que save_groups guarda los grupos `name`."""
+    return _groups_candidates(results_dir, name)[0]
+
+
+def find_table(results_dir, name):
+    """Archivo existente de la tabla `name` (columnar primero), o None."""
+    return next((p for p in _table_candidates(results_dir, name) if p.exists()), None)
+
+
+def find_groups(results_dir, name):
+    """Archivo existente de los grupos `name` (columnar primero), o None."""
+    return next((p for p in _groups_candidates(results_dir, name) if p.exists()), None)
+
+
+def _remove_stale(candidates, written):
+    # Un artefacto del otro formato quedaría desactualizado; se elimina
+    for path in candidates:
+        if path != written and path.exists():
+            path.unlink()
+
+
+def save_table(df, results_dir, name):
+    """
+    Guarda una tabla intermedia (sin el índice, como to_csv(index=False)).
+
+    Returns:
+        Path del archivo escrito
+    """
+    candidates = _table_candidates(results_dir, name)
+    output_file = candidates[0]
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    if pa is None:
+        df.to_csv(output_file, index=False)
+    else:
+        feather.write_feather(df.reset_index(drop=True), output_file, compression=TABLE_COMPRESSION)
+    _remove_stale(candidates, output_file)
+    return output_file
+
+
+def load_table(results_dir, name, columns=None):
+    """
+    Carga una tabla intermedia.
+
+    Args:
+        results_dir: Directorio de resultados intermedios
+        name: Nombre sin extensión
+        columns: Columnas a cargar (None = todas)
+
+    Returns:
+        DataFrame con índice 0..n-1
+    """
+    path = find_table(results_dir, name)
+    if path is None:
+        raise FileNotFoundError(f"No se encontró el artefacto '{name}' en {results_dir}")
+    if path.suffix == '.feather':
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+    return pd.read_csv(path, usecols=columns)
+
+
+def save_groups(groups, results_dir, name):
+    """
+    Guarda grupos de índices (bloques o componentes).
+
+    Args:
+        groups: dict clave -> iterable de índices enteros
+        results_dir: Directorio de resultados intermedios
+        name: Nombre sin extensión
+
+    Returns:
+        Path del archivo escrito
+    """
+    candidates = _groups_candidates(results_dir, name)
+    output_file = candidates[0]
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    if pa is None:
+        groups_json = {str(k): [int(i) for i in v] for k, v in groups.items()}
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(groups_json, f, indent=2)
+    else:
+        members = [np.fromiter(v, dtype=np.int64) for v in groups.values()]
+        sizes = np.fromiter((len(m) for m in members), dtype=np.int64, count=len(members))
+        offsets = np.zeros(len(members) + 1, dtype=np.int32)
+        np.cumsum(sizes, out=offsets[1:])
+        values = np.concatenate(members) if members else np.empty(0, dtype=np.int64)
+        table = pa.table({
+            'key': pa.array([str(k) for k in groups.keys()], type=pa.string()),
+            'members': pa.ListArray.from_arrays(pa.array(offsets), pa.array(values))
+        })
+        with pa.OSFile(str(output_file), 'wb') as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    _remove_stale(candidates, output_file)
+    return output_file
+
+
+def _load_groups(results_dir, name):
+    """Carga grupos como lista de (clave, lista de índices) en el orden guardado."""
+    path = find_groups(results_dir, name)
+    if path is None:
+        raise FileNotFoundError(f"No se encontró el artefacto '{name}' en {results_dir}")
+    if path.suffix == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            return [(k, [int(i) for i in v]) for k, v in json.load(f).items()]
+
+    with pa.memory_map(str(path), 'r') as source:
+        table = ipc.open_file(source).read_all()
+        if table.num_rows == 0:
+            return []
+        keys = table.column('key').to_pylist()
+        members = table.column('members').combine_chunks()
+        offsets = members.offsets.to_numpy()
+        offsets = offsets - offsets[0]
+        values = members.flatten().to_numpy().tolist()
+        return [(key, values[start:end]) for key, start, end in zip(keys, offsets[:-1], offsets[1:])]
+
+
+def load_blocks(results_dir, name):
+    """Carga bloques como dict clave -> lista de índices."""
+    return dict(_load_groups(results_dir, name))
+
+
+def load_components(results_dir, name):
+    """Carga componentes como lista de sets de índices."""
+    return [set(members) for _, members in _load_groups(results_dir, name)]
@@ -6,10 +6,10 @@ Crea bloques optimizados y guarda solo el resultado final.
 """
 
 import pandas as pd
-import json
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
+from . import artifacts
 
 # Palabras genéricas que no son distintivas
 GENERIC_WORDS = {
@@ -75,13 +75,7 @@ def create_blocks_single(entity_df, entity_type, base_dir=None):
     
     # Guardar bloques optimizados
     print("\n4. Guardando bloques optimizados...")
-    output_file = results_dir / f"{entity_type}_blocks.json"
-    
-    blocks_json = {str(k): [int(i) for i in v] for k, v in blocks_opt.items()}
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(blocks_json, f, indent=2)
-    
+    output_file = artifacts.save_groups(blocks_opt, results_dir, f"{entity_type}_blocks")
     print(f"   ✓ {output_file}")
     
     # Estadísticas
@@ -339,6 +333,6 @@ if __name__ == "__main__":
     base_dir = Path(__file__).parent.parent.parent
     results_dir = base_dir / "results_transaction" / "intermediate"
     
-    entity_df = pd.read_csv(results_dir / "financial_security_normalized.csv")
+    entity_df = artifacts.load_table(results_dir, "financial_security_normalized")
     create_blocks_single(entity_df, "financial_security", base_dir)
 
@@ -6,13 +6,15 @@ incluyendo los que no tienen matches (singletons).
 """
 
 import pandas as pd
-import json
+import numpy as np
 from pathlib import Path
 from datetime import datetime
+from . import artifacts
 from . import grouping
+from . import entity_ids
 
 
-def run_complete_mapping_single(entity_mapping=None, entity_type=None, base_dir=None):
+def run_complete_mapping_single(entity_mapping=None, entity_type=None, base_dir=None, id_mode='sequential'):
     """
     Completa el mapeo agregando nombres faltantes (singletons) para un tipo de entidad.
     
@@ -20,6 +22,8 @@ def run_complete_mapping_single(entity_mapping=None, entity_type=None, base_dir=
         entity_mapping: DataFrame con mapeo (si None, intenta cargar desde archivo)
         entity_type: Tipo de entidad ('financial_security', 'financial_release', etc.)
         base_dir: Directorio base del proyecto
+        id_mode: 'sequential' o 'stable' (los singletons conservan su ID anterior y se guarda
+                 {entity_type}_entity_changes.csv con las entidades que cambiaron)
         
     Returns:
         DataFrame con mapeo completo
@@ -58,19 +62,19 @@ def run_complete_mapping_single(entity_mapping=None, entity_type=None, base_dir=
     else:
         raise ValueError(f"Unknown entity_type: {entity_type}")
     
-    normalized_file = results_dir / f"{entity_type}_normalized.csv"
+    normalized_name = f"{entity_type}_normalized"
     
     if not original_file.exists():
         print(f"   ✗ Error: No se encontró el archivo original: {original_file}")
         return None
     
-    if not normalized_file.exists():
-        print(f"   ✗ Error: No se encontró el archivo normalizado: {normalized_file}")
+    if artifacts.find_table(results_dir, normalized_name) is None:
+        print(f"   ✗ Error: No se encontró el archivo normalizado: {artifacts.table_file(results_dir, normalized_name)}")
         return None
     
     # Cargar datos
     original_df = pd.read_csv(original_file)
-    normalized_df = pd.read_csv(normalized_file)
+    normalized_df = artifacts.load_table(results_dir, normalized_name)
     
     # Fix column names if needed
     if name_column == 'or_name' and 'or_name' not in original_df.columns:
@@ -92,15 +96,12 @@ def run_complete_mapping_single(entity_mapping=None, entity_type=None, base_dir=
         else:
             # Intentar generar desde componentes
             print("   ℹ️  Generando mapeo desde componentes...")
-            components_file = results_dir / f"{entity_type}_components.json"
-            matches_file = results_dir / f"{entity_type}_matches.csv"
+            components_name = f"{entity_type}_components"
+            matches_name = f"{entity_type}_matches"
             
-            if components_file.exists() and matches_file.exists():
-                with open(components_file, 'r', encoding='utf-8') as f:
-                    components_json = json.load(f)
-                    components = [set(int(idx) for idx in comp) for comp in components_json.values()]
-                
-                matches_df = pd.read_csv(matches_file)
+            if artifacts.find_groups(results_dir, components_name) and artifacts.find_table(results_dir, matches_name):
+                components = artifacts.load_components(results_dir, components_name)
+                matches_df = artifacts.load_table(results_dir, matches_name, columns=artifacts.MATCH_EDGE_COLUMNS)
                 entity_mapping, _ = grouping.process_components(
                     normalized_df, components, matches_df,
                     'normalized_name', 'frequency', entity_type
@@ -116,8 +117,8 @@ def run_complete_mapping_single(entity_mapping=None, entity_type=None, base_dir=
     
     # Identificar nombres faltantes
     print("\n2. Identificando nombres faltantes...")
-    mapped_original_names = set(entity_mapping['original_name'].str.upper().str.strip())
-    original_df['name_upper'] = original_df[name_column].str.upper().str.strip()
+    mapped_original_names = set(name_key(entity_mapping['original_name']))
+    original_df['name_upper'] = name_key(original_df[name_column])
     missing_df = original_df[~original_df['name_upper'].isin(mapped_original_names)].copy()
     
     print(f"   ✓ Nombres faltantes: {len(missing_df):,}")
@@ -127,48 +128,35 @@ def run_complete_mapping_single(entity_mapping=None, entity_type=None, base_dir=
     max_entity_id = entity_mapping['entity_id'].str.extract(rf'{entity_type}_(\d+)')[0].astype(float).max()
     next_entity_id = int(max_entity_id) + 1 if not pd.isna(max_entity_id) else 0
     
-    singleton_mappings = []
-    for idx, row in missing_df.iterrows():
-        original_name = row[name_column]
-        freq = row['freq']
-        
-        normalized_row = normalized_df[normalized_df['original_name'].str.upper().str.strip() == original_name.upper().strip()]
-        normalized_name = normalized_row.iloc[0]['normalized_name'] if len(normalized_row) > 0 else original_name.upper().strip()
-        standard_name = normalized_name
-        
-        singleton_mappings.append({
-            'entity_id': f'{entity_type}_{next_entity_id}',
-            'original_name': original_name,
-            'normalized_name': normalized_name,
-            'standard_name': standard_name,
-            'frequency': freq,
-            'component_size': 1,
-            'avg_similarity': None,
-            'min_similarity': None,
-            'needs_review': False
-        })
-        
-        next_entity_id += 1
+    singletons = build_singleton_mapping(missing_df, name_column, normalized_df, entity_type, next_entity_id)
     
-    print(f"   ✓ {len(singleton_mappings):,} singletons agregados")
+    print(f"   ✓ {len(singletons):,} singletons agregados")
+    
+    output_file = final_results_dir / f"{entity_type}_entity_mapping_complete.csv"
+    previous_mapping = None
+    if id_mode == 'stable':
+        previous_mapping = entity_ids.load_previous_mapping(output_file)
+        singletons = entity_ids.assign_singleton_ids(entity_mapping, singletons, previous_mapping, entity_type)
     
     # Combinar mapeos
     print("\n4. Combinando mapeos...")
     complete_mapping = pd.concat([
         entity_mapping,
-        pd.DataFrame(singleton_mappings)
+        singletons
     ], ignore_index=True)
     
     print(f"   ✓ Mapeo completo: {len(complete_mapping):,} nombres")
     
     # Guardar mapeo completo
     print("\n5. Guardando mapeo completo...")
-    output_file = final_results_dir / f"{entity_type}_entity_mapping_complete.csv"
     complete_mapping.to_csv(output_file, index=False)
     print(f"   ✓ {output_file}")
     print(f"     - Total nombres: {len(complete_mapping):,}")
     print(f"     - Entidades únicas: {complete_mapping['entity_id'].nunique():,}")
     print(f"     - Singletons: {len(complete_mapping[complete_mapping['component_size'] == 1]):,}")
+    if id_mode == 'stable':
+        _save_entity_changes(previous_mapping, complete_mapping,
+                             final_results_dir / f"{entity_type}_entity_changes.csv")
     
     # Estadísticas finales
     print("\n6. Estadísticas finales:")
@@ -189,6 +177,67 @@ def run_complete_mapping_single(entity_mapping=None, entity_type=None, base_dir=
     return complete_mapping
 
 
+def name_key(names):
+    """Clave de cruce de nombres: mayúsculas y sin espacios en los extremos."""
+    return names.str.upper().str.strip()
+
+
+def build_singleton_mapping(missing_df, name_column, normalized_df, entity_type, next_entity_id):
+    """
+    Construye las filas de mapeo de los nombres faltantes (singletons) en una sola operación.
+    
+    El normalized_name se toma de la primera fila de normalized_df con la misma clave
+    (name_key de original_name); si no existe, se usa la propia clave. Los entity_id
+    son consecutivos a partir de next_entity_id, en el orden de missing_df.
+    
+    Args:
+        missing_df: Nombres del archivo original que no están en el mapeo
+        name_column: Columna con el nombre en missing_df
+        normalized_df: DataFrame normalizado (original_name, normalized_name)
+        entity_type: Prefijo de los entity_id
+        next_entity_id: Primer número de entity_id libre
+        
+    Returns:
+        DataFrame con las columnas del mapeo de entidades
+    """
+    if len(missing_df) == 0:
+        return pd.DataFrame()
+    
+    keys = name_key(missing_df[name_column])
+    normalized_keys = name_key(normalized_df['original_name'])
+    first_rows = ~normalized_keys.duplicated(keep='first')
+    lookup = pd.Series(
+        normalized_df['normalized_name'].to_numpy()[first_rows.to_numpy()],
+        index=normalized_keys[first_rows].to_numpy()
+    )
+    found = keys.isin(lookup.index).to_numpy()
+    normalized_names = np.where(found, keys.map(lookup).to_numpy(dtype=object), keys.to_numpy(dtype=object))
+    
+    n = len(missing_df)
+    entity_numbers = np.arange(next_entity_id, next_entity_id + n)
+    return pd.DataFrame({
+        'entity_id': [f'{entity_type}_{number}' for number in entity_numbers],
+        'original_name': missing_df[name_column].to_numpy(),
+        'normalized_name': normalized_names,
+        'standard_name': normalized_names,
+        'frequency': missing_df['freq'].to_numpy(),
+        'component_size': np.ones(n, dtype=np.int64),
+        'avg_similarity': [None] * n,
+        'min_similarity': [None] * n,
+        'needs_review': np.zeros(n, dtype=bool)
+    })
+
+
+def _save_entity_changes(previous_mapping, complete_mapping, changes_file):
+    """Guarda las entidades añadidas, eliminadas o modificadas respecto al mapeo anterior."""
+    changes = entity_ids.diff_entity_mappings(previous_mapping, complete_mapping)
+    changes.to_csv(changes_file, index=False)
+    counts = changes['change'].value_counts()
+    print(f"   ✓ {changes_file}")
+    print(f"     - Añadidas: {counts.get('added', 0):,}, modificadas: {counts.get('modified', 0):,}, "
+          f"eliminadas: {counts.get('removed', 0):,}")
+
+
 def update_database(base_dir=None, overwrite=True):
     """
     Actualiza la base de datos con los mapeos completos de todas las entidades.
@@ -237,6 +286,9 @@ def update_database(base_dir=None, overwrite=True):
         else:
             print(f"\n{entity_type}: ⚠️ Archivo no encontrado: {csv_file}")
     
+    # Volcar el WAL al archivo: entities_by_transaction.db queda autocontenido para copiarlo
+    db.close()
+    
     print("\n" + "=" * 80)
     print("✓ Base de datos actualizada")
     print(f"✓ Ubicación: {db_path}")
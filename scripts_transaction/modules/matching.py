@@ -5,19 +5,59 @@ Implementa fuzzy matching usando WRatio de rapidfuzz.
 """
 
 import pandas as pd
-import json
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 from rapidfuzz import fuzz
 import itertools
+from . import artifacts, checkpoint, instrumentation
 
 # Configuración de matching
 SIMILARITY_THRESHOLD = 88  # Threshold de similitud (0-100)
 MIN_BLOCK_SIZE_FOR_MATCHING = 2  # Solo hacer matching en bloques con al menos 2 nombres
 
 
-def run_matching_single(entity_df, entity_blocks, entity_type, base_dir=None):
+class SharedScoreCache:
+    """
+    Caché de similitudes entre los tipos de un lado (modo de universo compartido).
+    
+    Se usa como el dict score_cache de find_matches_in_block, pero solo guarda los
+    pares cuyos dos nombres están en shared_names (los nombres normalizados comunes
+    a los tipos del lado): cualquier otro par no puede volver a aparecer en otro
+    tipo, así que guardarlo solo ocuparía memoria.
+    """
+    
+    def __init__(self, shared_names):
+        self.shared_names = frozenset(shared_names)
+        self.scores = {}
+        self.hits = 0
+    
+    @classmethod
+    def for_types(cls, normalized_dfs, name_column='normalized_name'):
+        """Caché para los DataFrames normalizados de los tipos de un lado."""
+        names = [set(df[name_column].dropna()) for df in normalized_dfs]
+        return cls(set.intersection(*names) if len(names) > 1 else set())
+    
+    def __len__(self):
+        return len(self.scores)
+    
+    def get(self, key):
+        similarity = self.scores.get(key)
+        if similarity is not None:
+            self.hits += 1
+        return similarity
+    
+    def __setitem__(self, key, similarity):
+        name1, name2 = key
+        if name1 in self.shared_names and name2 in self.shared_names:
+            self.scores[key] = similarity
+    
+    def clear(self):
+        """Libera los pares guardados (después del último tipo del lado)."""
+        self.scores = {}
+
+
+def run_matching_single(entity_df, entity_blocks, entity_type, base_dir=None, score_cache=None, resume=False):
     """
     Ejecuta fuzzy matching en los bloques para un solo tipo de entidad.
     
@@ -26,6 +66,9 @@ def run_matching_single(entity_df, entity_blocks, entity_type, base_dir=None):
         entity_blocks: Diccionario de bloques
         entity_type: Tipo de entidad ('financial_security', 'financial_release', etc.)
         base_dir: Directorio base del proyecto
+        score_cache: SharedScoreCache compartida entre tipos (modo de universo compartido)
+        resume: Si True, reutiliza los bloques terminados del checkpoint de una
+            ejecución interrumpida (results_transaction/intermediate/checkpoints/)
         
     Returns:
         tuple: (components, matches_df)
@@ -48,8 +91,14 @@ def run_matching_single(entity_df, entity_blocks, entity_type, base_dir=None):
     
     # Encontrar matches
     print("1. Buscando matches con fuzzy matching...")
-    matches = process_all_blocks(entity_df, entity_blocks, 'normalized_name', SIMILARITY_THRESHOLD)
+    hits_before = score_cache.hits if score_cache is not None else 0
+    matches_checkpoint = checkpoint.checkpoint_dir(results_dir, f"{entity_type}_matches")
+    matches = process_all_blocks(entity_df, entity_blocks, 'normalized_name', SIMILARITY_THRESHOLD, score_cache,
+                                 checkpoint_dir=matches_checkpoint, resume=resume)
     print(f"\n   ✓ Total matches encontrados: {len(matches):,} pares de matches")
+    if score_cache is not None:
+        print(f"   ✓ Pares reutilizados de la caché compartida: {score_cache.hits - hits_before:,} "
+              f"(la caché guarda {len(score_cache):,} pares de nombres comunes a ambos tipos)")
     
     # Crear grafo de matches y encontrar componentes conectados
     print("\n2. Creando grupos de nombres relacionados...")
@@ -82,19 +131,16 @@ def run_matching_single(entity_df, entity_blocks, entity_type, base_dir=None):
     matches_df['name1'] = matches_df['idx1'].apply(lambda x: entity_df.loc[x, 'normalized_name'])
     matches_df['name2'] = matches_df['idx2'].apply(lambda x: entity_df.loc[x, 'normalized_name'])
     
-    output_file_matches = results_dir / f"{entity_type}_matches.csv"
-    matches_df.to_csv(output_file_matches, index=False)
+    output_file_matches = artifacts.save_table(matches_df, results_dir, f"{entity_type}_matches")
     print(f"   ✓ Matches guardados: {output_file_matches}")
     
     # Guardar componentes (grupos)
-    components_json = {str(i): [int(idx) for idx in comp] for i, comp in enumerate(components)}
-    output_file_components = results_dir / f"{entity_type}_components.json"
-    
-    with open(output_file_components, 'w', encoding='utf-8') as f:
-        json.dump(components_json, f, indent=2)
-    
+    output_file_components = artifacts.save_groups(dict(enumerate(components)), results_dir, f"{entity_type}_components")
     print(f"   ✓ Componentes (grupos) guardados: {output_file_components}")
     
+    # Los resultados ya están guardados: el checkpoint deja de hacer falta
+    checkpoint.remove_checkpoint(matches_checkpoint)
+    
     # Estadísticas
     print("\n4. Estadísticas de matching:")
     print(f"     - Total matches: {len(matches):,}")
@@ -113,55 +159,113 @@ def run_matching_single(entity_df, entity_blocks, entity_type, base_dir=None):
     return components, matches_df
 
 
-def calculate_similarity(name1, name2):
-    """Calcula similitud entre dos nombres usando WRatio."""
+def calculate_similarity(name1, name2, scorer=None):
+    """Calcula similitud entre dos nombres usando WRatio (u otro scorer de rapidfuzz)."""
     if pd.isna(name1) or pd.isna(name2):
         return 0.0
     
-    return fuzz.WRatio(str(name1), str(name2))
+    if scorer is None:
+        scorer = fuzz.WRatio
+    return scorer(str(name1), str(name2))
 
 
-def find_matches_in_block(df, block_indices, name_column='normalized_name', threshold=SIMILARITY_THRESHOLD):
-    """Encuentra matches dentro de un bloque."""
+def find_matches_in_block(df, block_indices, name_column='normalized_name', threshold=SIMILARITY_THRESHOLD,
+                          score_cache=None, names=None, scorer=None):
+    """
+    Encuentra matches dentro de un bloque.
+    
+    Si se pasa score_cache (dict o SharedScoreCache (nombre1, nombre2) -> similitud),
+    cada par de nombres guardado se puntúa una sola vez aunque aparezca en varios
+    bloques o tipos.
+    names (dict índice -> nombre, de df[name_column].to_dict()) evita buscar cada
+    nombre con df.loc. scorer es una función de rapidfuzz.fuzz (None = WRatio);
+    la caché no distingue scorers, así que se usa una caché por scorer.
+    """
     matches = []
     
     if len(block_indices) < MIN_BLOCK_SIZE_FOR_MATCHING:
         return matches
     
+    if names is None:
+        names = {idx: df.loc[idx, name_column] for idx in block_indices}
+    
+    pairs_scored = 0
     for idx1, idx2 in itertools.combinations(block_indices, 2):
-        name1 = df.loc[idx1, name_column]
-        name2 = df.loc[idx2, name_column]
+        name1 = names[idx1]
+        name2 = names[idx2]
         
-        similarity = calculate_similarity(name1, name2)
+        if score_cache is None:
+            similarity = calculate_similarity(name1, name2, scorer)
+            pairs_scored += 1
+        else:
+            similarity = score_cache.get((name1, name2))
+            if similarity is None:
+                similarity = calculate_similarity(name1, name2, scorer)
+                score_cache[(name1, name2)] = similarity
+                pairs_scored += 1
         
         if similarity >= threshold:
             matches.append((idx1, idx2, similarity))
     
+    instrumentation.count('pairs_compared', len(block_indices) * (len(block_indices) - 1) // 2)
+    instrumentation.count('pairs_scored', pairs_scored)
+    instrumentation.count('pairs_accepted', len(matches))
     return matches
 
 
-def process_all_blocks(df, blocks, name_column='normalized_name', threshold=SIMILARITY_THRESHOLD):
-    """Procesa todos los bloques y encuentra matches."""
+def process_all_blocks(df, blocks, name_column='normalized_name', threshold=SIMILARITY_THRESHOLD, score_cache=None,
+                       scorer=None, checkpoint_dir=None, resume=False):
+    """
+    Procesa todos los bloques y encuentra matches (score_cache y scorer: ver find_matches_in_block).
+    
+    Con checkpoint_dir, los matches de los bloques terminados se confirman en disco
+    cada CHECKPOINT_INTERVAL_SECONDS (ver modules/checkpoint.py). Con resume=True,
+    los bloques del checkpoint no se vuelven a comparar: sus matches se reutilizan en
+    su posición, así que el resultado es el mismo que sin interrupción.
+    """
     all_matches = []
     blocks_processed = 0
     blocks_with_matches = 0
+    blocks_resumed = 0
     
     total_blocks = len(blocks)
     
     print(f"   Procesando {total_blocks:,} bloques...")
-    
-    for blocking_key, block_indices in blocks.items():
+    names = df[name_column].to_dict()
+    
+    store = None
+    if checkpoint_dir is not None:
+        fingerprint = checkpoint.blocks_fingerprint(blocks, names, threshold, scorer)
+        store = checkpoint.MatchCheckpoint(checkpoint_dir, fingerprint, total_blocks, resume=resume)
+        if store.completed_count:
+            print(f"   ✓ Reanudando: {store.completed_count:,} bloques ya procesados en {checkpoint_dir}")
+        elif store.discarded_reason:
+            print(f"   ℹ️  Sin reanudación ({store.discarded_reason}): se procesan todos los bloques")
+    
+    for position, (blocking_key, block_indices) in enumerate(blocks.items()):
         blocks_processed += 1
         
         if blocks_processed % 500 == 0:
             print(f"     Procesados: {blocks_processed:,}/{total_blocks:,} bloques ({100*blocks_processed/total_blocks:.1f}%)")
         
-        matches = find_matches_in_block(df, block_indices, name_column, threshold)
+        if store is not None and store.is_done(position):
+            matches = store.replayed[position]
+            blocks_resumed += 1
+        else:
+            matches = find_matches_in_block(df, block_indices, name_column, threshold, score_cache, names, scorer)
+            if store is not None:
+                store.add(position, matches)
         
         if matches:
             blocks_with_matches += 1
             all_matches.extend(matches)
     
+    if store is not None:
+        store.commit()
+    
+    instrumentation.count('blocks_processed', blocks_processed)
+    if blocks_resumed:
+        instrumentation.count('blocks_resumed', blocks_resumed)
     print(f"   ✓ Procesados {blocks_processed:,} bloques")
     print(f"   ✓ {blocks_with_matches:,} bloques con matches encontrados")
     
@@ -310,6 +414,7 @@ def validate_and_split_components(components, df, matches_list, name_column='nor
             for idx in isolated:
                 validated_components.append({idx})
     
+    instrumentation.count('components_split', split_count)
     if split_count > 0:
         print(f"   → {split_count} componentes divididos por similitud mínima baja")
     
@@ -402,6 +507,7 @@ def merge_related_entities_by_first_two_words(components, df, name_column='norma
                     
                     if similarities and sum(similarities) / len(similarities) >= similarity_threshold:
                         merged_components.append(merged_group)
+                        instrumentation.count('merges_performed', len(comp_groups) - 1)
                         continue
             
             # Si no se fusionó, agregar componentes individuales
@@ -429,10 +535,8 @@ if __name__ == "__main__":
     base_dir = Path(__file__).parent.parent.parent
     results_dir = base_dir / "results_transaction" / "intermediate"
     
-    entity_df = pd.read_csv(results_dir / "financial_security_normalized.csv")
-    
-    with open(results_dir / "financial_security_blocks.json", 'r', encoding='utf-8') as f:
-        entity_blocks = {k: [int(i) for i in v] for k, v in json.load(f).items()}
+    entity_df = artifacts.load_table(results_dir, "financial_security_normalized")
+    entity_blocks = artifacts.load_blocks(results_dir, "financial_security_blocks")
     
     run_matching_single(entity_df, entity_blocks, "financial_security", base_dir)
 
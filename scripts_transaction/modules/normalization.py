@@ -8,6 +8,38 @@ import pandas as pd
 import re
 from pathlib import Path
 from datetime import datetime
+from . import artifacts
+
+# Roles funcionales que se eliminan de los nombres (Paso 2.2)
+FUNCTIONAL_ROLE_PATTERNS = [
+    r'\s+AS\s+ADMINISTRATIVE\s+AND\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+COLLATERAL\s+AND\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+NOTES\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+FIRST\s+LIEN\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+SECOND\s+LIEN\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+TERM\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+ABL\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+COLLATERAL\s+TRUSTEE\s*',
+    r'\s+AS\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+TRUSTEE\s*',
+    r'\s+AS\s+AGENT\s*',
+    r'\s+AS\s+THE\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+THE\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+THE\s+TRUSTEE\s*',
+    r'\s+AS\s+AGENT\s+FOR\s+[^,]*',
+    r'\s+AS\s+COLLATERAL\s+AGENT\s+FOR\s+[^,]*',
+    r'\s+AS\s+ADMINISTRATIVE\s+AGENT\s+FOR\s+[^,]*',
+    r'\s+AS\s+SERVICING\s+AGENT\s*',
+    r'\s+AS\s+SUCCESSOR\s+AGENT\s*',
+    r'\s+AS\s+SUCCESSOR\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+SUCCESSOR\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+NEW\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+DOMESTIC\s+ADMINISTRATIVE\s+AGENT\s*',
+    r'\s+AS\s+CANADIAN\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+U\.S\.\s+COLLATERAL\s+AGENT\s*',
+    r'\s+AS\s+US\s+COLLATERAL\s+AGENT\s*',
+]
 
 
 def normalize_names_single(entity_df, entity_type, base_dir=None):
@@ -38,61 +70,21 @@ def normalize_names_single(entity_df, entity_type, base_dir=None):
     work_df = entity_df.copy()
     
     # Detectar columna de nombre desde el DataFrame
-    if 'ee_name' in work_df.columns:
-        name_column = 'ee_name'
-    elif 'or_name' in work_df.columns:
-        name_column = 'or_name'
-    else:
-        raise ValueError(f"No se encontró columna 'ee_name' ni 'or_name' en el DataFrame. Columnas disponibles: {list(work_df.columns)}")
-    
+    name_column = detect_name_column(work_df)
     print(f"   ℹ️  Usando columna: {name_column}")
     
-    # Paso 2.1: Limpieza básica
-    print("2.1. Aplicando limpieza básica...")
-    work_df['name_cleaned'] = work_df[name_column].apply(basic_cleaning)
-    print(f"   ✓ Limpieza básica aplicada")
-    
-    # Paso 2.2: Eliminación de roles funcionales
-    print("2.2. Eliminando roles funcionales...")
-    work_df['name_no_roles'] = work_df['name_cleaned'].apply(remove_functional_roles)
-    print(f"   ✓ Roles funcionales eliminados")
-    
-    # Paso 2.3: Normalización de sufijos legales
-    print("2.3. Normalizando sufijos legales...")
-    work_df['name_normalized_suffixes'] = work_df['name_no_roles'].apply(normalize_legal_suffixes)
-    print(f"   ✓ Sufijos legales normalizados")
-    
-    # Paso 2.4: Limpieza de elementos comunes
-    print("2.4. Limpiando elementos comunes...")
-    work_df['name_cleaned_common'] = work_df['name_normalized_suffixes'].apply(clean_common_elements)
-    print(f"   ✓ Elementos comunes limpiados")
-    
-    # Paso 2.5: Normalización final
-    print("2.5. Aplicando normalización final...")
-    work_df['name_normalized_final'] = work_df['name_cleaned_common'].apply(final_normalization)
-    print(f"   ✓ Normalización final aplicada")
+    work_df['name_normalized_final'] = apply_normalization_steps(work_df[name_column])
     
     # Crear versión simplificada para matching
     print("\n3. Creando versión simplificada para matching...")
-    # Asegurar que tenemos la columna 'freq'
-    if 'freq' not in work_df.columns:
-        # Buscar columna de frecuencia con nombre alternativo
-        freq_col = None
-        for col in ['freq', 'frequency', 'Frequency', 'Freq']:
-            if col in work_df.columns:
-                freq_col = col
-                break
-        if freq_col is None:
-            raise ValueError(f"No se encontró columna de frecuencia. Columnas disponibles: {list(work_df.columns)}")
-        work_df['freq'] = work_df[freq_col]
+    work_df['freq'] = work_df[detect_freq_column(work_df)]
     
     normalized = work_df[[name_column, 'freq', 'name_normalized_final']].copy()
     normalized.columns = ['original_name', 'frequency', 'normalized_name']
     
     # Guardar resultado final
     print("\n4. Guardando resultados finales...")
-    output_file = results_dir / f"{entity_type}_normalized.csv"
-    normalized.to_csv(output_file, index=False)
+    output_file = artifacts.save_table(normalized, results_dir, f"{entity_type}_normalized")
     print(f"   ✓ {output_file}")
     
     # Estadísticas
@@ -110,6 +102,118 @@ def normalize_names_single(entity_df, entity_type, base_dir=None):
     return normalized
 
 
+def normalize_shared_universe(entity_dfs, side, base_dir=None):
+    """
+    Normaliza una sola vez la unión de nombres de varios tipos de entidad.
+    
+    La normalización depende solo de cada nombre, así que se aplica a la unión
+    deduplicada de nombres del lado (financial o non_financial) y el resultado se
+    proyecta sobre cada tipo. Cada tipo conserva sus filas, su orden y sus
+    frecuencias, igual que con normalize_names_single.
+    
+    Args:
+        entity_dfs: Diccionario entity_type -> DataFrame (columna 'ee_name' o 'or_name')
+        side: 'financial' o 'non_financial' (solo para los mensajes)
+        base_dir: Directorio base del proyecto
+        
+    Returns:
+        dict: entity_type -> DataFrame normalizado
+    """
+    if base_dir is None:
+        base_dir = Path(__file__).parent.parent.parent
+    
+    results_dir = base_dir / "results_transaction" / "intermediate"
+    results_dir.mkdir(parents=True, exist_ok=True)
+    
+    print("=" * 80)
+    print(f"FASE 2: NORMALIZACIÓN COMPARTIDA ({side.upper()})")
+    print("=" * 80)
+    print(f"Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print()
+    
+    name_columns = {entity_type: detect_name_column(df) for entity_type, df in entity_dfs.items()}
+    universe = pd.Series(pd.unique(pd.concat(
+        [df[name_columns[entity_type]] for entity_type, df in entity_dfs.items()], ignore_index=True
+    )))
+    total_names = sum(len(df) for df in entity_dfs.values())
+    print(f"   ✓ Universo: {len(universe):,} nombres únicos (de {total_names:,} en {len(entity_dfs)} tipos)")
+    
+    lookup = pd.Series(apply_normalization_steps(universe).to_numpy(), index=universe.to_numpy())
+    
+    print("\n3. Proyectando sobre cada tipo de entidad...")
+    normalized_by_type = {}
+    for entity_type, df in entity_dfs.items():
+        names = df[name_columns[entity_type]]
+        normalized = pd.DataFrame({
+            'original_name': names.to_numpy(),
+            'frequency': df[detect_freq_column(df)].to_numpy(),
+            'normalized_name': names.map(lookup).to_numpy()
+        })
+        output_file = artifacts.save_table(normalized, results_dir, f"{entity_type}_normalized")
+        print(f"   ✓ {entity_type}: {len(normalized):,} nombres → {output_file}")
+        normalized_by_type[entity_type] = normalized
+    
+    print("\n" + "=" * 80)
+    print(f"✓ Normalización compartida completada para {side}")
+    print("=" * 80)
+    
+    return normalized_by_type
+
+
+def detect_name_column(df):
+    """Columna de nombre del DataFrame ('ee_name' u 'or_name')."""
+    if 'ee_name' in df.columns:
+        return 'ee_name'
+    if 'or_name' in df.columns:
+        return 'or_name'
+    raise ValueError(f"No se encontró columna 'ee_name' ni 'or_name' en el DataFrame. Columnas disponibles: {list(df.columns)}")
+
+
+def detect_freq_column(df):
+    """Columna de frecuencia del DataFrame."""
+    for col in ['freq', 'frequency', 'Frequency', 'Freq']:
+        if col in df.columns:
+            return col
+    raise ValueError(f"No se encontró columna de frecuencia. Columnas disponibles: {list(df.columns)}")
+
+
+def apply_normalization_steps(names):
+    """
+    Aplica los pasos de normalización a una serie de nombres.
+    
+    Returns:
+        Series con los nombres normalizados (mismo índice)
+    """
+    work_df = pd.DataFrame({'name': names})
+    
+    # Paso 2.1: Limpieza básica
+    print("2.1. Aplicando limpieza básica...")
+    work_df['name_cleaned'] = work_df['name'].apply(basic_cleaning)
+    print(f"   ✓ Limpieza básica aplicada")
+    
+    # Paso 2.2: Eliminación de roles funcionales
+    print("2.2. Eliminando roles funcionales...")
+    work_df['name_no_roles'] = work_df['name_cleaned'].apply(remove_functional_roles)
+    print(f"   ✓ Roles funcionales eliminados")
+    
+    # Paso 2.3: Normalización de sufijos legales
+    print("2.3. Normalizando sufijos legales...")
+    work_df['name_normalized_suffixes'] = work_df['name_no_roles'].apply(normalize_legal_suffixes)
+    print(f"   ✓ Sufijos legales normalizados")
+    
+    # Paso 2.4: Limpieza de elementos comunes
+    print("2.4. Limpiando elementos comunes...")
+    work_df['name_cleaned_common'] = work_df['name_normalized_suffixes'].apply(clean_common_elements)
+    print(f"   ✓ Elementos comunes limpiados")
+    
+    # Paso 2.5: Normalización final
+    print("2.5. Aplicando normalización final...")
+    work_df['name_normalized_final'] = work_df['name_cleaned_common'].apply(final_normalization)
+    print(f"   ✓ Normalización final aplicada")
+    
+    return work_df['name_normalized_final']
+
+
 def basic_cleaning(name):
     """Aplica limpieza básica (Paso 2.1)."""
     if pd.isna(name):
@@ -157,37 +261,7 @@ def remove_functional_roles(name):
     
     cleaned = str(name)
     
-    role_patterns = [
-        r'\s+AS\s+ADMINISTRATIVE\s+AND\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+COLLATERAL\s+AND\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+NOTES\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+FIRST\s+LIEN\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+SECOND\s+LIEN\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+TERM\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+ABL\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+COLLATERAL\s+TRUSTEE\s*',
-        r'\s+AS\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+TRUSTEE\s*',
-        r'\s+AS\s+AGENT\s*',
-        r'\s+AS\s+THE\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+THE\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+THE\s+TRUSTEE\s*',
-        r'\s+AS\s+AGENT\s+FOR\s+[^,]*',
-        r'\s+AS\s+COLLATERAL\s+AGENT\s+FOR\s+[^,]*',
-        r'\s+AS\s+ADMINISTRATIVE\s+AGENT\s+FOR\s+[^,]*',
-        r'\s+AS\s+SERVICING\s+AGENT\s*',
-        r'\s+AS\s+SUCCESSOR\s+AGENT\s*',
-        r'\s+AS\s+SUCCESSOR\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+SUCCESSOR\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+NEW\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+DOMESTIC\s+ADMINISTRATIVE\s+AGENT\s*',
-        r'\s+AS\s+CANADIAN\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+U\.S\.\s+COLLATERAL\s+AGENT\s*',
-        r'\s+AS\s+US\s+COLLATERAL\s+AGENT\s*',
-    ]
-    
-    for pattern in role_patterns:
+    for pattern in FUNCTIONAL_ROLE_PATTERNS:
         cleaned = re.sub(pattern, ' ', cleaned, flags=re.IGNORECASE)
     
     cleaned = re.sub(r'\s+', ' ', cleaned)
@@ -17,18 +17,38 @@ Uso:
     python scripts_transaction/pipeline.py --phase grouping   # Solo agrupación
     python scripts_transaction/pipeline.py --phase validation # Solo validación
     python scripts_transaction/pipeline.py --phase complete   # Solo completar mapeo
+    python scripts_transaction/pipeline.py --shared-universe  # Security y release comparten trabajo por lado
+    python scripts_transaction/pipeline.py --resume   # Reanuda un matching interrumpido desde su checkpoint
 """
 
 import argparse
+import contextlib
+import multiprocessing
+import os
 import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import pandas as pd
-import json
 
 # Agregar el directorio scripts_transaction al path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from modules import exploration, normalization, blocking, matching, grouping, validation, complete_mapping
+from modules import artifacts, instrumentation
+
+ENTITY_TYPES = ['financial_security', 'financial_release', 'non_financial_security', 'non_financial_release']
+
+# Tipos de entidad de cada lado (modo de universo compartido)
+SIDES = {
+    'financial': ['financial_security', 'financial_release'],
+    'non_financial': ['non_financial_security', 'non_financial_release'],
+}
+
+# Variables de entorno que limitan los hilos de las librerías numéricas en cada proceso
+THREAD_LIMIT_ENV_VARS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                         'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS']
 
 
 def load_csv_files(base_dir=None):
@@ -79,7 +99,8 @@ def load_csv_files(base_dir=None):
     return dataframes
 
 
-def run_pipeline_for_entity_type(entity_type, entity_df, base_dir=None, skip_validation=True):
+def run_pipeline_for_entity_type(entity_type, entity_df, base_dir=None, skip_validation=False, grouping_partitions=1,
+                                 id_mode='sequential', normalized_df=None, score_cache=None, resume=False):
     """
     Ejecuta el pipeline completo para un tipo de entidad.
     
@@ -88,6 +109,11 @@ def run_pipeline_for_entity_type(entity_type, entity_df, base_dir=None, skip_val
         entity_df: DataFrame con los datos
         base_dir: Directorio base del proyecto
         skip_validation: Si True, omite la fase de validación
+        grouping_partitions: Número de particiones paralelas para la fase de agrupación
+        id_mode: 'sequential' o 'stable' (reutiliza los entity_id de la ejecución anterior)
+        normalized_df: Nombres ya normalizados (modo de universo compartido); si None se normaliza aquí
+        score_cache: Caché de similitudes compartida con el otro tipo del mismo lado
+        resume: Si True, el matching continúa desde el checkpoint de una ejecución interrumpida
     """
     if base_dir is None:
         base_dir = Path(__file__).parent.parent
@@ -100,63 +126,279 @@ def run_pipeline_for_entity_type(entity_type, entity_df, base_dir=None, skip_val
     print(f"PROCESANDO: {entity_type.upper()}")
     print("=" * 80)
     
-    # Fase 2: Normalización
-    print("\n" + "=" * 80)
-    print(f"FASE 2: NORMALIZACIÓN ({entity_type.upper()})")
-    print("=" * 80)
-    entity_normalized = normalization.normalize_names_single(entity_df, entity_type, base_dir)
+    # Fase 2: Normalización (en modo de universo compartido ya viene hecha)
+    if normalized_df is None:
+        print("\n" + "=" * 80)
+        print(f"FASE 2: NORMALIZACIÓN ({entity_type.upper()})")
+        print("=" * 80)
+        with instrumentation.phase(f"{entity_type}/normalization"):
+            entity_normalized = normalization.normalize_names_single(entity_df, entity_type, base_dir)
+    else:
+        entity_normalized = normalized_df
     
     # Fase 3: Blocking
     print("\n" + "=" * 80)
     print(f"FASE 3: BLOCKING ({entity_type.upper()})")
     print("=" * 80)
-    entity_blocks = blocking.create_blocks_single(entity_normalized, entity_type, base_dir)
+    with instrumentation.phase(f"{entity_type}/blocking"):
+        entity_blocks = blocking.create_blocks_single(entity_normalized, entity_type, base_dir)
     
     # Fase 4: Matching
     print("\n" + "=" * 80)
     print(f"FASE 4: FUZZY MATCHING ({entity_type.upper()})")
     print("=" * 80)
-    entity_components, entity_matches_df = matching.run_matching_single(
-        entity_normalized, entity_blocks, entity_type, base_dir
-    )
+    with instrumentation.phase(f"{entity_type}/matching"):
+        entity_components, entity_matches_df = matching.run_matching_single(
+            entity_normalized, entity_blocks, entity_type, base_dir, score_cache=score_cache, resume=resume
+        )
     
     # Fase 5: Grouping
     print("\n" + "=" * 80)
     print(f"FASE 5: AGRUPACIÓN Y ASIGNACIÓN DE IDs ({entity_type.upper()})")
     print("=" * 80)
-    entity_mapping, entity_review = grouping.run_grouping_single(
-        entity_normalized, entity_components, entity_matches_df, entity_type, base_dir
-    )
+    with instrumentation.phase(f"{entity_type}/grouping"):
+        entity_mapping, entity_review = grouping.run_grouping_single(
+            entity_normalized, entity_components, entity_matches_df, entity_type, base_dir,
+            n_partitions=grouping_partitions, id_mode=id_mode
+        )
     
-    # Fase 6: Validation (Opcional)
+    # Fase 6: Validation (se omite con skip_validation)
     if not skip_validation:
         print("\n" + "=" * 80)
         print(f"FASE 6: VALIDACIÓN ({entity_type.upper()})")
         print("=" * 80)
-        validation.run_validation_single(
-            entity_mapping, entity_components, entity_matches_df, entity_type, base_dir
-        )
+        with instrumentation.phase(f"{entity_type}/validation"):
+            validation.run_validation_single(
+                entity_normalized, entity_mapping, entity_components, entity_matches_df, entity_type, base_dir
+            )
     
     # Completar mapeo
     print("\n" + "=" * 80)
     print(f"COMPLETAR MAPEO ({entity_type.upper()})")
     print("=" * 80)
-    complete_mapping.run_complete_mapping_single(
-        entity_mapping=entity_mapping,
-        entity_type=entity_type,
-        base_dir=base_dir
-    )
+    with instrumentation.phase(f"{entity_type}/complete"):
+        complete_mapping.run_complete_mapping_single(
+            entity_mapping=entity_mapping,
+            entity_type=entity_type,
+            base_dir=base_dir,
+            id_mode=id_mode
+        )
     
     print(f"\n✓ Pipeline completado para {entity_type}")
 
 
-def run_full_pipeline(base_dir=None, skip_validation=True):
+def run_shared_universe_side(side, dataframes, base_dir=None, skip_validation=False, grouping_partitions=1,
+                             id_mode='sequential', resume=False):
+    """
+    Ejecuta el pipeline de los tipos de un lado compartiendo el trabajo común.
+    
+    Los tipos security y release de un mismo lado comparten gran parte de sus nombres:
+    - La normalización se aplica una sola vez a la unión deduplicada de nombres y se
+      proyecta sobre cada tipo.
+    - El matching usa una caché de similitudes común (matching.SharedScoreCache),
+      así que un par de nombres presentes en ambos tipos se puntúa una sola vez. La
+      caché solo guarda esos pares y se libera después del último tipo.
+    
+    El blocking, los componentes y los mapeos siguen siendo por tipo (cada tipo solo
+    compara los pares de sus propios nombres), así que los cuatro
+    *_entity_mapping_complete.csv son idénticos a los del modo independiente.
+    
+    Args:
+        side: 'financial' o 'non_financial'
+        dataframes: Diccionario entity_type -> DataFrame (de load_csv_files)
+        base_dir: Directorio base del proyecto
+        skip_validation: Si True, omite la fase de validación
+        grouping_partitions: Número de particiones paralelas para la fase de agrupación
+        id_mode: 'sequential' o 'stable'
+        resume: Si True, el matching continúa desde el checkpoint de una ejecución interrumpida
+    """
+    if base_dir is None:
+        base_dir = Path(__file__).parent.parent
+    
+    entity_types = [entity_type for entity_type in SIDES[side] if dataframes.get(entity_type) is not None]
+    if not entity_types:
+        print(f"\n⚠️ No hay datos para {side}, saltando...")
+        return
+    
+    print("\n" + "=" * 80)
+    print(f"UNIVERSO COMPARTIDO: {side.upper()} ({', '.join(entity_types)})")
+    print("=" * 80)
+    
+    with instrumentation.phase(f"{side}/normalization"):
+        normalized_by_type = normalization.normalize_shared_universe(
+            {entity_type: dataframes[entity_type] for entity_type in entity_types}, side, base_dir
+        )
+    
+    score_cache = matching.SharedScoreCache.for_types([normalized_by_type[t] for t in entity_types])
+    print(f"   ✓ Nombres normalizados comunes a {', '.join(entity_types)}: {len(score_cache.shared_names):,}")
+    for entity_type in entity_types:
+        run_pipeline_for_entity_type(entity_type, dataframes[entity_type], base_dir, skip_validation=skip_validation,
+                                     grouping_partitions=grouping_partitions, id_mode=id_mode,
+                                     normalized_df=normalized_by_type[entity_type], score_cache=score_cache,
+                                     resume=resume)
+    score_cache.clear()
+
+
+def _run_job(job_name, target, kwargs, log_file, instrument=None):
+    """
+    Ejecuta un trabajo del pipeline en un proceso propio (modo --jobs).
+    
+    target es run_pipeline_for_entity_type (un tipo) o run_shared_universe_side
+    (un lado). Toda la salida se escribe en log_file. Si instrument es un dict
+    (opciones de instrumentation.start_run), las fases medidas se devuelven en el resumen.
+    
+    Returns:
+        dict: Resumen del trabajo (job, status, seconds, log_file, error, phases)
+    """
+    start = time.perf_counter()
+    summary = {'job': job_name, 'status': 'ok', 'log_file': str(log_file), 'error': None, 'phases': []}
+    if instrument is not None:
+        instrumentation.start_run(**instrument)
+    
+    with open(log_file, 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            target(**kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            summary['status'] = 'error'
+            summary['error'] = f"{type(e).__name__}: {e}"
+    
+    run = instrumentation.stop_run()
+    if run is not None:
+        summary['phases'] = run.phases
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def run_entity_type_jobs(dataframes, base_dir, jobs, skip_validation=False, grouping_partitions=1,
+                         id_mode='sequential', shared_universe=False, resume=False):
+    """
+    Ejecuta los pipelines de los tipos de entidad en procesos separados.
+    
+    Los tipos no comparten datos, así que se procesan en paralelo con hasta `jobs`
+    procesos. Con shared_universe cada trabajo es un lado (financial / non_financial)
+    y procesa sus dos tipos con el trabajo común compartido. Para no sobresuscribir
+    los núcleos, cada proceso recibe una parte de la CPU: se limitan los hilos de las
+    librerías numéricas y las particiones de la agrupación a cpu_count // jobs. La
+    salida de cada trabajo se guarda en results_transaction/logs/{trabajo}.log.
+    
+    Args:
+        dataframes: Diccionario entity_type -> DataFrame (de load_csv_files)
+        base_dir: Directorio base del proyecto
+        jobs: Número máximo de procesos simultáneos
+        skip_validation: Si True, omite la fase de validación
+        grouping_partitions: Particiones de la agrupación pedidas (se limitan al presupuesto por proceso)
+        id_mode: 'sequential' o 'stable'
+        shared_universe: Si True, un trabajo por lado en lugar de uno por tipo
+        resume: Si True, cada trabajo continúa su matching desde su propio checkpoint
+        
+    Returns:
+        list: Resúmenes de los trabajos, en el orden de ENTITY_TYPES
+    """
+    logs_dir = base_dir / "results_transaction" / "logs"
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    final_results_dir = base_dir / "results_transaction" / "final"
+    
+    # (nombre del trabajo, tipos que procesa, función, argumentos propios)
+    if shared_universe:
+        job_specs = []
+        for side, side_types in SIDES.items():
+            side_types = [entity_type for entity_type in side_types if dataframes.get(entity_type) is not None]
+            if side_types:
+                side_dataframes = {entity_type: dataframes[entity_type] for entity_type in side_types}
+                job_specs.append((side, side_types, run_shared_universe_side,
+                                  {'side': side, 'dataframes': side_dataframes}))
+    else:
+        job_specs = [
+            (entity_type, [entity_type], run_pipeline_for_entity_type,
+             {'entity_type': entity_type, 'entity_df': dataframes[entity_type]})
+            for entity_type in ENTITY_TYPES if dataframes.get(entity_type) is not None
+        ]
+    
+    jobs = max(1, min(jobs, len(job_specs)))
+    threads_per_job = max(1, (os.cpu_count() or 1) // jobs)
+    job_partitions = max(1, min(grouping_partitions, threads_per_job))
+    
+    print("\n" + "=" * 80)
+    print(f"EJECUTANDO {len(job_specs)} TRABAJOS EN {jobs} PROCESOS")
+    print("=" * 80)
+    print(f"   ✓ Hilos por proceso: {threads_per_job}")
+    if job_partitions != grouping_partitions:
+        print(f"   ℹ️  Particiones de agrupación limitadas a {job_partitions} por proceso")
+    print(f"   ✓ Logs: {logs_dir}")
+    
+    # Los procesos se crean con 'spawn' para que hereden los límites de hilos
+    # antes de importar numpy/pandas
+    run = instrumentation.active_run()
+    instrument = None
+    if run is not None:
+        instrument = {'pipeline': run.pipeline, 'output_dir': run.output_dir,
+                      'profile': run.profile, 'trace_memory': run.trace_memory}
+    common_kwargs = {'base_dir': base_dir, 'skip_validation': skip_validation,
+                     'grouping_partitions': job_partitions, 'id_mode': id_mode, 'resume': resume}
+    previous_env = {var: os.environ.get(var) for var in THREAD_LIMIT_ENV_VARS}
+    os.environ.update({var: str(threads_per_job) for var in THREAD_LIMIT_ENV_VARS})
+    summaries = {}
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [
+                executor.submit(_run_job, job_name, target, {**kwargs, **common_kwargs},
+                                logs_dir / f"{job_name}.log", instrument)
+                for job_name, _, target, kwargs in job_specs
+            ]
+            for future in as_completed(futures):
+                summary = future.result()
+                summaries[summary['job']] = summary
+                instrumentation.add_phases(summary['phases'], job=summary['job'])
+                mark = "✓" if summary['status'] == 'ok' else "✗"
+                print(f"   {mark} {summary['job']} terminado en {summary['seconds']:.1f}s")
+    finally:
+        for var, value in previous_env.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+    
+    # Resumen combinado
+    print("\n" + "=" * 80)
+    print("RESUMEN DE TRABAJOS")
+    print("=" * 80)
+    print(f"   {'Tipo':<24} {'Estado':<8} {'Tiempo':>8} {'Nombres':>9} {'Entidades':>10}")
+    ordered = [summaries[job_name] for job_name, _, _, _ in job_specs]
+    for summary, (_, job_types, _, _) in zip(ordered, job_specs):
+        for entity_type in job_types:
+            names = entities = '-'
+            mapping_file = final_results_dir / f"{entity_type}_entity_mapping_complete.csv"
+            if summary['status'] == 'ok' and mapping_file.exists():
+                mapping = pd.read_csv(mapping_file, usecols=['entity_id'])
+                names = f"{len(mapping):,}"
+                entities = f"{mapping['entity_id'].nunique():,}"
+            print(f"   {entity_type:<24} {summary['status']:<8} {summary['seconds']:>7.1f}s "
+                  f"{names:>9} {entities:>10}")
+    for summary in ordered:
+        if summary['status'] != 'ok':
+            print(f"\n   ✗ {summary['job']}: {summary['error']}")
+            print(f"     Ver log: {summary['log_file']}")
+    
+    return ordered
+
+
+def run_full_pipeline(base_dir=None, skip_validation=False, grouping_partitions=1, id_mode='sequential', jobs=1,
+                      shared_universe=False, resume=False):
     """
     Ejecuta todo el pipeline completo para los 4 tipos de entidad.
     
     Args:
         base_dir: Directorio base del proyecto
         skip_validation: Si True, omite la fase de validación
+        grouping_partitions: Número de particiones paralelas para la fase de agrupación
+        id_mode: 'sequential' o 'stable' (reutiliza los entity_id de la ejecución anterior)
+        jobs: Número de trabajos en paralelo (1 = secuencial)
+        shared_universe: Si True, security y release de cada lado comparten normalización
+            y similitudes (ver run_shared_universe_side)
+        resume: Si True, el matching de cada tipo continúa desde el checkpoint de una
+            ejecución interrumpida (results_transaction/intermediate/checkpoints/)
     """
     if base_dir is None:
         base_dir = Path(__file__).parent.parent
@@ -176,17 +418,29 @@ def run_full_pipeline(base_dir=None, skip_validation=True):
     # exploration.run_exploration(base_dir)  # Si se implementa
     
     # Procesar cada tipo de entidad
-    entity_types = ['financial_security', 'financial_release', 'non_financial_security', 'non_financial_release']
-    
-    for entity_type in entity_types:
-        entity_df = dataframes.get(entity_type)
-        run_pipeline_for_entity_type(entity_type, entity_df, base_dir, skip_validation=skip_validation)
+    if jobs > 1:
+        summaries = run_entity_type_jobs(dataframes, base_dir, jobs, skip_validation=skip_validation,
+                                         grouping_partitions=grouping_partitions, id_mode=id_mode,
+                                         shared_universe=shared_universe, resume=resume)
+        if any(summary['status'] != 'ok' for summary in summaries):
+            print("\n✗ Hay tipos de entidad con errores; no se actualiza la base de datos")
+            sys.exit(1)
+    elif shared_universe:
+        for side in SIDES:
+            run_shared_universe_side(side, dataframes, base_dir, skip_validation=skip_validation,
+                                     grouping_partitions=grouping_partitions, id_mode=id_mode, resume=resume)
+    else:
+        for entity_type in ENTITY_TYPES:
+            entity_df = dataframes.get(entity_type)
+            run_pipeline_for_entity_type(entity_type, entity_df, base_dir, skip_validation=skip_validation,
+                                         grouping_partitions=grouping_partitions, id_mode=id_mode, resume=resume)
     
     # Actualizar base de datos
     print("\n" + "=" * 80)
     print("ACTUALIZANDO BASE DE DATOS")
     print("=" * 80)
-    complete_mapping.update_database(base_dir, overwrite=True)
+    with instrumentation.phase("database"):
+        complete_mapping.update_database(base_dir, overwrite=True)
     
     print("\n" + "=" * 80)
     print("PIPELINE COMPLETADO EXITOSAMENTE")
@@ -197,8 +451,15 @@ def run_full_pipeline(base_dir=None, skip_validation=True):
     print("=" * 80)
 
 
-def run_phase(phase_name, base_dir=None):
-    """Ejecuta una fase específica del pipeline."""
+def run_phase(phase_name, base_dir=None, grouping_partitions=1, id_mode='sequential', shared_universe=False,
+              resume=False):
+    """
+    Ejecuta una fase específica del pipeline.
+    
+    Con shared_universe, la normalización se hace sobre la unión de nombres de cada
+    lado y el matching comparte la caché de similitudes entre los tipos de un lado.
+    Con resume, el matching continúa desde el checkpoint de una ejecución interrumpida.
+    """
     if base_dir is None:
         base_dir = Path(__file__).parent.parent
     
@@ -211,57 +472,69 @@ def run_phase(phase_name, base_dir=None):
     
     elif phase_name == "normalization":
         dataframes = load_csv_files(base_dir)
-        for entity_type, entity_df in dataframes.items():
-            if entity_df is not None:
-                normalization.normalize_names_single(entity_df, entity_type, base_dir)
+        if shared_universe:
+            for side, side_types in SIDES.items():
+                side_dataframes = {t: dataframes[t] for t in side_types if dataframes.get(t) is not None}
+                if side_dataframes:
+                    normalization.normalize_shared_universe(side_dataframes, side, base_dir)
+        else:
+            for entity_type, entity_df in dataframes.items():
+                if entity_df is not None:
+                    normalization.normalize_names_single(entity_df, entity_type, base_dir)
     
     elif phase_name == "blocking":
         dataframes = load_csv_files(base_dir)
         for entity_type in dataframes.keys():
-            normalized_file = results_dir / f"{entity_type}_normalized.csv"
-            if normalized_file.exists():
-                entity_df = pd.read_csv(normalized_file)
+            if artifacts.find_table(results_dir, f"{entity_type}_normalized"):
+                entity_df = artifacts.load_table(results_dir, f"{entity_type}_normalized")
                 blocking.create_blocks_single(entity_df, entity_type, base_dir)
     
     elif phase_name == "matching":
-        for entity_type in ['financial_security', 'financial_release', 'non_financial_security', 'non_financial_release']:
-            normalized_file = results_dir / f"{entity_type}_normalized.csv"
-            blocks_file = results_dir / f"{entity_type}_blocks.json"
-            if normalized_file.exists() and blocks_file.exists():
-                entity_df = pd.read_csv(normalized_file)
-                with open(blocks_file, 'r', encoding='utf-8') as f:
-                    blocks = {k: [int(i) for i in v] for k, v in json.load(f).items()}
-                matching.run_matching_single(entity_df, blocks, entity_type, base_dir)
+        for side_types in SIDES.values():
+            available = [entity_type for entity_type in side_types
+                         if artifacts.find_table(results_dir, f"{entity_type}_normalized")
+                         and artifacts.find_groups(results_dir, f"{entity_type}_blocks")]
+            entity_dfs = {entity_type: artifacts.load_table(results_dir, f"{entity_type}_normalized")
+                          for entity_type in available}
+            score_cache = matching.SharedScoreCache.for_types(list(entity_dfs.values())) if shared_universe else None
+            for entity_type in available:
+                blocks = artifacts.load_blocks(results_dir, f"{entity_type}_blocks")
+                matching.run_matching_single(entity_dfs.pop(entity_type), blocks, entity_type, base_dir,
+                                             score_cache=score_cache, resume=resume)
+            if score_cache is not None:
+                score_cache.clear()
     
     elif phase_name == "grouping":
         for entity_type in ['financial_security', 'financial_release', 'non_financial_security', 'non_financial_release']:
-            normalized_file = results_dir / f"{entity_type}_normalized.csv"
-            matches_file = results_dir / f"{entity_type}_matches.csv"
-            components_file = results_dir / f"{entity_type}_components.json"
-            if normalized_file.exists() and matches_file.exists() and components_file.exists():
-                entity_df = pd.read_csv(normalized_file)
-                matches_df = pd.read_csv(matches_file)
-                with open(components_file, 'r', encoding='utf-8') as f:
-                    components_json = json.load(f)
-                    components = [set(int(idx) for idx in comp) for comp in components_json.values()]
-                grouping.run_grouping_single(entity_df, components, matches_df, entity_type, base_dir)
+            normalized_name = f"{entity_type}_normalized"
+            matches_name = f"{entity_type}_matches"
+            components_name = f"{entity_type}_components"
+            if (artifacts.find_table(results_dir, normalized_name) and artifacts.find_table(results_dir, matches_name)
+                    and artifacts.find_groups(results_dir, components_name)):
+                entity_df = artifacts.load_table(results_dir, normalized_name)
+                matches_df = artifacts.load_table(results_dir, matches_name, columns=artifacts.MATCH_EDGE_COLUMNS)
+                components = artifacts.load_components(results_dir, components_name)
+                grouping.run_grouping_single(entity_df, components, matches_df, entity_type, base_dir,
+                                             n_partitions=grouping_partitions, id_mode=id_mode)
     
     elif phase_name == "validation":
         for entity_type in ['financial_security', 'financial_release', 'non_financial_security', 'non_financial_release']:
             mapping_file = final_results_dir / f"{entity_type}_entity_mapping.csv"
-            matches_file = results_dir / f"{entity_type}_matches.csv"
-            components_file = results_dir / f"{entity_type}_components.json"
-            if mapping_file.exists() and matches_file.exists() and components_file.exists():
+            normalized_name = f"{entity_type}_normalized"
+            matches_name = f"{entity_type}_matches"
+            components_name = f"{entity_type}_components"
+            if (mapping_file.exists() and artifacts.find_table(results_dir, normalized_name)
+                    and artifacts.find_table(results_dir, matches_name)
+                    and artifacts.find_groups(results_dir, components_name)):
                 mapping = pd.read_csv(mapping_file)
-                matches_df = pd.read_csv(matches_file)
-                with open(components_file, 'r', encoding='utf-8') as f:
-                    components_json = json.load(f)
-                    components = [set(int(idx) for idx in comp) for comp in components_json.values()]
-                validation.run_validation_single(mapping, components, matches_df, entity_type, base_dir)
+                entity_df = artifacts.load_table(results_dir, normalized_name)
+                matches_df = artifacts.load_table(results_dir, matches_name, columns=artifacts.MATCH_EDGE_COLUMNS)
+                components = artifacts.load_components(results_dir, components_name)
+                validation.run_validation_single(entity_df, mapping, components, matches_df, entity_type, base_dir)
     
     elif phase_name == "complete":
         for entity_type in ['financial_security', 'financial_release', 'non_financial_security', 'non_financial_release']:
-            complete_mapping.run_complete_mapping_single(entity_type=entity_type, base_dir=base_dir)
+            complete_mapping.run_complete_mapping_single(entity_type=entity_type, base_dir=base_dir, id_mode=id_mode)
     
     else:
         print(f"Error: Fase desconocida: {phase_name}")
@@ -284,6 +557,8 @@ Ejemplos de uso:
   python scripts_transaction/pipeline.py --phase grouping   # Solo agrupación
   python scripts_transaction/pipeline.py --phase validation # Solo validación
   python scripts_transaction/pipeline.py --phase complete   # Solo completar mapeo
+  python scripts_transaction/pipeline.py --shared-universe  # Security y release comparten trabajo por lado
+  python scripts_transaction/pipeline.py --resume   # Reanuda un matching interrumpido
         """
     )
     
@@ -293,10 +568,16 @@ Ejemplos de uso:
         help='Ejecutar solo una fase específica del pipeline'
     )
     
+    parser.add_argument(
+        '--skip-validation',
+        action='store_true',
+        help='Omitir la fase de validación (por defecto se ejecuta)'
+    )
+    
     parser.add_argument(
         '--with-validation',
         action='store_true',
-        help='Incluir fase de validación (por defecto se omite)'
+        help='Incluir fase de validación (ya es el comportamiento por defecto, se mantiene por compatibilidad)'
     )
     
     parser.add_argument(
@@ -305,11 +586,59 @@ Ejemplos de uso:
         help='Ejecutar sin confirmación manual'
     )
     
+    parser.add_argument(
+        '--grouping-partitions',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Procesar la agrupación en N particiones paralelas (por defecto 1, sin paralelismo)'
+    )
+    
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Procesar hasta N tipos de entidad en paralelo, con un log por tipo (por defecto 1)'
+    )
+    
+    parser.add_argument(
+        '--shared-universe',
+        action='store_true',
+        help='Normalizar la unión de nombres de cada lado una sola vez y compartir las similitudes '
+             'entre security y release (con --jobs, un trabajo por lado)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Guardar estadísticas de cProfile por fase en results_transaction/profiles/'
+    )
+    
+    parser.add_argument(
+        '--trace-memory',
+        action='store_true',
+        help='Medir el pico de memoria de Python por fase con tracemalloc (más lento)'
+    )
+    
+    parser.add_argument(
+        '--stable-ids',
+        action='store_true',
+        help='Reutilizar los entity_id del mapeo anterior y guardar {entity_type}_entity_changes.csv'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Reanudar un matching interrumpido: reutiliza los bloques ya confirmados en su checkpoint'
+    )
+    
     args = parser.parse_args()
     
     base_dir = Path(__file__).parent.parent
     
-    skip_val = not args.with_validation
+    skip_val = args.skip_validation
+    id_mode = 'stable' if args.stable_ids else 'sequential'
     
     # Solicitar confirmación manual antes de ejecutar
     if not args.yes:
@@ -318,7 +647,7 @@ Ejemplos de uso:
         else:
             print("\n⚠️  Se ejecutará el PIPELINE COMPLETO")
             if skip_val:
-                print("   (Omitiendo validación - usa --with-validation para incluirla)")
+                print("   (Omitiendo validación por --skip-validation)")
         
         print("\n¿Desea continuar? (yes/no): ", end='', flush=True)
         try:
@@ -331,14 +660,25 @@ Ejemplos de uso:
             sys.exit(0)
         print()
     
-    if args.phase:
-        print(f"Ejecutando fase: {args.phase}")
-        run_phase(args.phase, base_dir)
-    else:
-        print("Ejecutando pipeline completo...")
-        if skip_val:
-            print("(Omitiendo validación - usa --with-validation para incluirla)")
-        run_full_pipeline(base_dir, skip_validation=skip_val)
+    # Tiempos, memoria y contadores por fase en results_transaction/run_report.json
+    instrumentation.start_run('scripts_transaction', base_dir / "results_transaction", profile=args.profile,
+                              trace_memory=args.trace_memory)
+    try:
+        if args.phase:
+            print(f"Ejecutando fase: {args.phase}")
+            with instrumentation.phase(args.phase):
+                run_phase(args.phase, base_dir, grouping_partitions=args.grouping_partitions, id_mode=id_mode,
+                          shared_universe=args.shared_universe, resume=args.resume)
+        else:
+            print("Ejecutando pipeline completo...")
+            if skip_val:
+                print("(Omitiendo validación por --skip-validation)")
+            run_full_pipeline(base_dir, skip_validation=skip_val, grouping_partitions=args.grouping_partitions,
+                              id_mode=id_mode, jobs=args.jobs, shared_universe=args.shared_universe,
+                              resume=args.resume)
+    finally:
+        report_file = instrumentation.finish_run()
+    instrumentation.print_phase_summary(report_file)
 
 
 if __name__ == "__main__":
@@ -647,6 +647,12 @@ def initialize_session_state():
         st.session_state.groups_per_page = 25
     if 'last_filter_state' not in st.session_state:
         st.session_state.last_filter_state = None
+    if 'loaded_db_entity_type' not in st.session_state:
+        st.session_state.loaded_db_entity_type = None  # Entity type loaded from the database (Group View pages)
+    if 'page_cursors' not in st.session_state:
+        st.session_state.page_cursors = {}
+    if 'group_counts' not in st.session_state:
+        st.session_state.group_counts = {}
     if 'tab_switch_counter' not in st.session_state:
         st.session_state.tab_switch_counter = 0
     if 'pipeline_type' not in st.session_state:
@@ -673,6 +679,60 @@ def group_by_entity(df):
         })
     return dict(grouped)
 
+# Group View options -> load_entity_page sort keys and group filters
+GROUP_SORTS = {
+    'Total Frequency': 'total_frequency',
+    'Number of Names': 'names_count',
+    'Entity ID': 'entity_num'
+}
+GROUP_SIZE_FILTERS = {
+    'No Singletons (<2)': {'min_names': 2},
+    'All': {},
+    'Only Singletons (=1)': {'min_names': 1, 'max_names': 1},
+    'Large (>20)': {'min_names': 21},
+    'Medium (5-20)': {'min_names': 5, 'max_names': 20},
+    'Small (2-5)': {'min_names': 2, 'max_names': 4}
+}
+
+def reset_group_pages():
+    """Forget cached page cursors and group counts (after loading or saving data)"""
+    st.session_state.page_cursors = {}
+    st.session_state.group_counts = {}
+
+def count_database_groups(db, entity_type, filters):
+    """Number of groups matching the filters (cached until the data is reloaded or saved)"""
+    key = (entity_type, tuple(sorted(filters.items())))
+    if key not in st.session_state.group_counts:
+        st.session_state.group_counts[key] = db.count_entity_groups(entity_type, filters)
+    return st.session_state.group_counts[key]
+
+def load_database_page(db, entity_type, page_number, groups_per_page, filters, sort):
+    """
+    Load one page of groups from the database
+    
+    Uses the keyset cursor of the page when it is known (sequential navigation) and
+    otherwise skips from the nearest earlier page with an offset.
+    
+    Returns:
+        List of (entity_id, names) tuples in page order
+    """
+    key = (entity_type, tuple(sorted(filters.items())), sort, groups_per_page)
+    cursors = st.session_state.page_cursors.setdefault(key, {1: None})
+    known_page = max(page for page in cursors if page <= page_number)
+    groups, names, next_cursor = db.load_entity_page(
+        entity_type,
+        after=cursors[known_page],
+        limit=groups_per_page,
+        filters=filters,
+        sort=sort,
+        offset=(page_number - known_page) * groups_per_page
+    )
+    if next_cursor is not None:
+        cursors[page_number + 1] = next_cursor
+    
+    grouped = group_by_entity(names)
+    return [(entity_id, grouped[entity_id]) for entity_id in groups['entity_id']]
+
 def calculate_group_stats(group):
     """Calculate statistics for a group"""
     total_freq = sum(n['frequency'] for n in group)
@@ -849,7 +909,7 @@ def format_group_options(df, entity_ids, exclude_id=None, search_filter=""):
     return formatted_options, id_to_formatted_dict
 
 def save_changes(df, entity_type='financial', backup=False, use_database=True, 
-                pipeline_type='original', transaction_type=None):
+                pipeline_type='original', transaction_type=None, df_original=None):
     """
     Save changes to database or CSV
     
@@ -861,6 +921,8 @@ def save_changes(df, entity_type='financial', backup=False, use_database=True,
         use_database: If True, save to database. If False, save CSV
         pipeline_type: 'original' or 'transaction'
         transaction_type: 'security' or 'release' (only for transaction pipeline)
+        df_original: DataFrame as loaded. If given, only the rows that differ from it
+                     are written to the database
     """
     if pipeline_type == 'transaction':
         # Build full entity type
@@ -877,7 +939,10 @@ def save_changes(df, entity_type='financial', backup=False, use_database=True,
                 db = get_database('transaction')
                 if backup:
                     backup_path = db.backup_database()
-                db.update_entities(df, full_entity_type)
+                if df_original is not None:
+                    db.save_entity_changes(df_original, df, full_entity_type)
+                else:
+                    db.update_entities(df, full_entity_type)
                 return f"Changes saved to database: {DB_TRANSACTION_PATH.name}"
             except Exception as e:
                 logger.error(f"Error saving to database: {e}")
@@ -902,7 +967,10 @@ def save_changes(df, entity_type='financial', backup=False, use_database=True,
                 db = get_database('original')
                 if backup:
                     backup_path = db.backup_database()
-                db.update_entities(df, entity_type)
+                if df_original is not None:
+                    db.save_entity_changes(df_original, df, entity_type)
+                else:
+                    db.update_entities(df, entity_type)
                 return f"Changes saved to database: {DB_PATH.name}"
             except Exception as e:
                 logger.error(f"Error saving to database: {e}")
@@ -1003,13 +1071,17 @@ def main():
                     st.session_state.df_edited = df.copy()
                     st.session_state.changes_made = False
                     st.session_state.edit_history = []
+                    st.session_state.loaded_db_entity_type = None
+                    reset_group_pages()
                     if use_db:
                         db = get_database(st.session_state.pipeline_type)
                         if st.session_state.pipeline_type == 'transaction':
                             full_type = f"{entity_type_sel}_{st.session_state.transaction_type}"
                             stats = db.get_statistics(full_type)
                         else:
+                            full_type = entity_type_sel
                             stats = db.get_statistics(entity_type_sel)
+                        st.session_state.loaded_db_entity_type = (st.session_state.pipeline_type, full_type)
                         st.success(f"✓ Loaded {len(df):,} names from database")
                         st.info(f"📊 {stats['unique_entities']:,} unique entities in database")
                     else:
@@ -1039,14 +1111,28 @@ def main():
             if st.button("💾 Save Changes", type="primary", disabled=not st.session_state.changes_made):
                 with st.spinner("Saving changes..."):
                     try:
+                        if st.session_state.pipeline_type == 'transaction':
+                            save_type = (st.session_state.pipeline_type, f"{entity_type_sel}_{transaction_type_sel}")
+                        else:
+                            save_type = (st.session_state.pipeline_type, entity_type_sel)
+                        # Only rows loaded from this database table can be saved as a delta;
+                        # data loaded from CSV (or another type) rewrites the table
+                        db_delta = (st.session_state.use_database and
+                                    st.session_state.loaded_db_entity_type == save_type)
                         result = save_changes(
                             st.session_state.df_edited,
                             entity_type=entity_type_sel,
                             use_database=st.session_state.use_database,
                             pipeline_type=st.session_state.pipeline_type,
-                            transaction_type=transaction_type_sel
+                            transaction_type=transaction_type_sel,
+                            df_original=st.session_state.df_original if db_delta else None
                         )
+                        st.session_state.df_original = st.session_state.df_edited.copy()
+                        if st.session_state.use_database:
+                            # The table now holds exactly df_edited
+                            st.session_state.loaded_db_entity_type = save_type
                         st.session_state.changes_made = False
+                        reset_group_pages()
                         # Clear cache after saving
                         group_by_entity.clear()
                         
@@ -1219,6 +1305,16 @@ def main():
         st.info("👈 Please load data from the sidebar panel")
         return
     
+    # Without unsaved edits the database holds the same data as df_edited, so the
+    # Group View and Search can query it instead of scanning the DataFrame
+    loaded_db = st.session_state.loaded_db_entity_type
+    database_in_sync = (
+        st.session_state.use_database and
+        loaded_db is not None and
+        loaded_db[0] == st.session_state.pipeline_type and
+        not st.session_state.changes_made
+    )
+    
     # Tabs for different views
     # Determine which tab to show first (if Edit button was clicked)
     tab_labels = ["📋 Group View", "🔍 Search", "✏️ Edit Group", "📊 Statistics", "🔗 Patent Pairs"]
@@ -1453,60 +1549,71 @@ def main():
             st.session_state.current_page = 1
         st.session_state.last_filter_state = current_filter_state
         
-        # Group data (already has cache in the function)
-        grouped = group_by_entity(st.session_state.df_edited)
-        
-        # Filter groups
-        filtered_groups = {}
-        for entity_id, names in grouped.items():
-            stats = calculate_group_stats(names)
-            
-            # Filter by size
-            if filter_size == 'No Singletons (<2)' and stats['names_count'] < 2:
-                continue
-            elif filter_size == 'Only Singletons (=1)' and stats['names_count'] != 1:
-                continue
-            elif filter_size == 'Large (>20)' and stats['names_count'] <= 20:
-                continue
-            elif filter_size == 'Medium (5-20)' and not (5 <= stats['names_count'] <= 20):
-                continue
-            elif filter_size == 'Small (2-5)' and not (2 <= stats['names_count'] < 5):
-                continue
-            # When filter_size == 'All', no filtering is applied (show all groups including singletons)
-            
-            # Filter by review
-            if filter_review and not any(n.get('needs_review', False) for n in names):
-                continue
-            
-            # Quick search
+        if database_in_sync:
+            # Load only the visible page from the database
+            page_db = get_database(loaded_db[0])
+            page_filters = dict(GROUP_SIZE_FILTERS[filter_size])
+            if filter_review:
+                page_filters['needs_review'] = True
             if quick_search:
-                search_lower = quick_search.lower()
-                if (search_lower not in entity_id.lower() and 
-                    search_lower not in stats['standard_name'].lower()):
+                page_filters['search'] = quick_search
+            total_groups = count_database_groups(page_db, loaded_db[1], page_filters)
+        else:
+            # Group data (already has cache in the function)
+            grouped = group_by_entity(st.session_state.df_edited)
+            
+            # Filter groups
+            filtered_groups = {}
+            for entity_id, names in grouped.items():
+                stats = calculate_group_stats(names)
+                
+                # Filter by size
+                if filter_size == 'No Singletons (<2)' and stats['names_count'] < 2:
+                    continue
+                elif filter_size == 'Only Singletons (=1)' and stats['names_count'] != 1:
+                    continue
+                elif filter_size == 'Large (>20)' and stats['names_count'] <= 20:
+                    continue
+                elif filter_size == 'Medium (5-20)' and not (5 <= stats['names_count'] <= 20):
+                    continue
+                elif filter_size == 'Small (2-5)' and not (2 <= stats['names_count'] < 5):
+                    continue
+                # When filter_size == 'All', no filtering is applied (show all groups including singletons)
+                
+                # Filter by review
+                if filter_review and not any(n.get('needs_review', False) for n in names):
                     continue
+                
+                # Quick search
+                if quick_search:
+                    search_lower = quick_search.lower()
+                    if (search_lower not in entity_id.lower() and 
+                        search_lower not in stats['standard_name'].lower()):
+                        continue
+                
+                filtered_groups[entity_id] = names
             
-            filtered_groups[entity_id] = names
-        
-        # Sort groups
-        if sort_by == 'Total Frequency':
-            sorted_groups = sorted(
-                filtered_groups.items(),
-                key=lambda x: calculate_group_stats(x[1])['total_frequency'],
-                reverse=True
-            )
-        elif sort_by == 'Number of Names':
-            sorted_groups = sorted(
-                filtered_groups.items(),
-                key=lambda x: calculate_group_stats(x[1])['names_count'],
-                reverse=True
-            )
-        else:  # Sort by Entity ID
-            sorted_entity_ids = sort_entity_ids_numerically(list(filtered_groups.keys()))
-            sorted_groups = [(eid, filtered_groups[eid]) for eid in sorted_entity_ids]
+            # Sort groups
+            if sort_by == 'Total Frequency':
+                sorted_groups = sorted(
+                    filtered_groups.items(),
+                    key=lambda x: calculate_group_stats(x[1])['total_frequency'],
+                    reverse=True
+                )
+            elif sort_by == 'Number of Names':
+                sorted_groups = sorted(
+                    filtered_groups.items(),
+                    key=lambda x: calculate_group_stats(x[1])['names_count'],
+                    reverse=True
+                )
+            else:  # Sort by Entity ID
+                sorted_entity_ids = sort_entity_ids_numerically(list(filtered_groups.keys()))
+                sorted_groups = [(eid, filtered_groups[eid]) for eid in sorted_entity_ids]
+            total_groups = len(sorted_groups)
         
         # Pagination controls - moved to main content area
         groups_per_page = st.session_state.groups_per_page
-        total_pages = (len(sorted_groups) + groups_per_page - 1) // groups_per_page if len(sorted_groups) > 0 else 1
+        total_pages = (total_groups + groups_per_page - 1) // groups_per_page if total_groups > 0 else 1
         
         # Ensure current_page is within valid range
         if st.session_state.current_page > total_pages:
@@ -1533,7 +1640,7 @@ def main():
                 # Recalculate page number to stay on same relative position
                 if total_pages > 1:
                     relative_position = (page_number - 1) / total_pages
-                    new_total_pages = (len(sorted_groups) + new_groups_per_page - 1) // new_groups_per_page if len(sorted_groups) > 0 else 1
+                    new_total_pages = (total_groups + new_groups_per_page - 1) // new_groups_per_page if total_groups > 0 else 1
                     st.session_state.current_page = max(1, min(new_total_pages, int(relative_position * new_total_pages) + 1))
                 st.rerun()
         
@@ -1578,7 +1685,10 @@ def main():
                         st.rerun()
         
         # Calculate paginated groups
-        if total_pages > 1:
+        if database_in_sync:
+            paginated_groups = load_database_page(page_db, loaded_db[1], page_number, groups_per_page,
+                                                  page_filters, GROUP_SORTS[sort_by])
+        elif total_pages > 1:
             start_idx = (page_number - 1) * groups_per_page
             end_idx = start_idx + groups_per_page
             paginated_groups = sorted_groups[start_idx:end_idx]
@@ -1588,7 +1698,7 @@ def main():
         # Show information
         col_info1, col_info2, col_info3 = st.columns(3)
         with col_info1:
-            st.metric("Total Groups Found", f"{len(sorted_groups):,}")
+            st.metric("Total Groups Found", f"{total_groups:,}")
         with col_info2:
             st.metric("Showing Groups", f"{len(paginated_groups):,}")
         with col_info3:
@@ -1695,25 +1805,39 @@ def main():
                 if len(search_query) < 3:
                     st.warning("⚠️ Please enter at least 3 characters to search")
                 else:
+                    if database_in_sync:
+                        # FTS5 index: ranked entities (one extra to know if there are more)
+                        ranked = get_database(loaded_db[0]).search_entities(
+                            loaded_db[1], search_query, limit=max_entities + 1
+                        )
+                        df_search = df_search[df_search['entity_id'].isin(ranked['entity_id'])]
+                    
                     # Search in multiple columns (more efficient)
                     search_lower = search_query.lower()
                     mask = (
-                        df_search['original_name'].str.lower().str.contains(search_lower, na=False) |
-                        df_search['normalized_name'].str.lower().str.contains(search_lower, na=False) |
-                        df_search['entity_id'].str.lower().str.contains(search_lower, na=False) |
-                        df_search['standard_name'].str.lower().str.contains(search_lower, na=False)
+                        df_search['original_name'].str.lower().str.contains(search_lower, na=False, regex=False) |
+                        df_search['normalized_name'].str.lower().str.contains(search_lower, na=False, regex=False) |
+                        df_search['entity_id'].str.lower().str.contains(search_lower, na=False, regex=False) |
+                        df_search['standard_name'].str.lower().str.contains(search_lower, na=False, regex=False)
                     )
                     
                     results = df_search[mask]
                     
                     if len(results) > 0:
                         # Get all unique entity IDs from search results
-                        entity_ids_found = results['entity_id'].unique()
+                        if database_in_sync:
+                            entity_ids_found = ranked['entity_id'][ranked['entity_id'].isin(results['entity_id'])].values
+                        else:
+                            entity_ids_found = results['entity_id'].unique()
                         total_entities_found = len(entity_ids_found)
                         total_names_found = len(results)
                         
                         # Limit by number of entities, not names
-                        if total_entities_found > max_entities:
+                        if database_in_sync and total_entities_found > max_entities:
+                            st.warning(f"⚠️ Found more than {max_entities} entities, showing the {max_entities} best matches")
+                            entity_ids_found = entity_ids_found[:max_entities]
+                            results = results[results['entity_id'].isin(entity_ids_found)]
+                        elif total_entities_found > max_entities:
                             st.warning(f"⚠️ Found {total_entities_found:,} entities ({total_names_found:,} total names), showing only the first {max_entities} entities")
                             entity_ids_found = entity_ids_found[:max_entities]
                             # Filter results to only include names from the limited entities